@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""
+generators – skript och hjälpmoduler för frågebankerna.
+
+Skripten körs som vanligt (python3 generators/create_bank.py …) och importerar
+varandra som syskonmoduler. För att samma moduler ska gå att importera som
+paket (from generators.bank_io import read_json) läggs katalogen till i
+sys.path vid paketimport.
+"""
+import os as _os
+import sys as _sys
+
+_HERE = _os.path.dirname(_os.path.abspath(__file__))
+if _HERE not in _sys.path:
+    _sys.path.insert(0, _HERE)
+
+# En enda instans av I/O-kärnan (och dess tolkningscache) oavsett importsätt
+import bank_io as _bank_io  # noqa: E402
+_sys.modules.setdefault(__name__ + ".bank_io", _bank_io)
@@ -23,20 +23,16 @@ Argument:
 Output:
   Uppdaterar filen på plats och skriver hur många nya frågor som lades till.
 """
-import json, argparse, random, os, sys
+import argparse, random, os, sys
 from copy import deepcopy
 
-RNG = random.Random(42)
-
-def load_bank(path):
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+from bank_facets import facets_path, write_facets
+from bank_io import read_json, write_json
+from bank_offsets import offsets_path, write_offsets
+from bank_trace import add_trace_arg, span, start_trace
+from build_cache import BuildCache, add_cache_args, cache_args, helper_files
 
-def save_bank(path, data):
-    tmp = path + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, path)
+RNG = random.Random(42)
 
 def next_id(items, prefix="ma-"):
     """
@@ -191,39 +187,67 @@ def main():
     ap.add_argument("--retune-division", choices=["yes","no"], default="yes")
     ap.add_argument("--max-dividend", type=int, default=50)
     ap.add_argument("--allow-nine", choices=["yes","no"], default="yes")
+    add_cache_args(ap)
+    add_trace_arg(ap)
     args = ap.parse_args()
+    start_trace(args)
 
     path = args.bank
     if not os.path.exists(path):
         print(f"❌ Hittar inte fil: {path}")
         sys.exit(1)
 
-    data = load_bank(path)
-    items = data.get("items", [])
-    nid = next_id(items, "ma-")
+    # RNG har fast seed (42) – augmenteringen är deterministisk givet indatabanken
+    cache = BuildCache(
+        path,
+        script_files=[__file__, *helper_files()],
+        args=cache_args(args), seed=42, input_path=path,
+        cache_dir=args.cache_dir, enabled=not args.no_cache,
+    )
+    with span("cache") as sp:
+        state = cache.check()
+        sp.args["state"] = state or "miss"
+    if state:
+        print("♻️ Oförändrad – samma fingeravtryck som befintlig fil." if state == "fresh"
+              else "♻️ Återställd från byggcache.", path)
+        return
+
+    with span("id-scan") as sp:
+        data = read_json(path)
+        items = data.get("items", [])
+        nid = next_id(items, "ma-")
+        sp.count = len(items)
+        sp.args["next"] = nid
 
     # 1) Retune division
     removed = []
     if args.retune_division == "yes":
-        easy, hard = retune_division(
-            items,
-            max_dividend=args.max_dividend,
-            allow_nine=(args.allow_nine == "yes")
-        )
-        removed = [it for it in items if it not in easy]
-        items = easy
-        print(f"• Division retune: tog bort {len(removed)} svårare uppgifter.")
+        with span("retune-division") as sp:
+            easy, hard = retune_division(
+                items,
+                max_dividend=args.max_dividend,
+                allow_nine=(args.allow_nine == "yes")
+            )
+            removed = [it for it in items if it not in easy]
+            items = easy
+            print(f"• Division retune: tog bort {len(removed)} svårare uppgifter.")
+            sp.count = len(removed)
 
     # 2) Lägg till diagramfrågor
     to_add = max(0, int(args.add_diagrams))
     if to_add:
-        di = generate_diagram_items(to_add, nid)
-        items.extend(di)
-        print(f"• Lagt till {len(di)} diagramfrågor (bar-max / bar-compare).")
+        with span("generate:diagram", subject="matematik") as sp:
+            di = generate_diagram_items(to_add, nid)
+            items.extend(di)
+            print(f"• Lagt till {len(di)} diagramfrågor (bar-max / bar-compare).")
+            sp.count = len(di)
 
     # 3) Spara tillbaka
     data["items"] = items
-    save_bank(path, data)
+    write_json(path, data)
+    write_facets(path, data)
+    write_offsets(path)
+    cache.store([path, facets_path(path), offsets_path(path)])
     print(f"✅ Klart. Totalt i banken: {len(items)} frågor.")
     if removed:
         print("  (Tips: vill du spara borttagna till en egen fil kan vi utöka skriptet.)")
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bank_build.py – deklarativt bygge av alla banker från ett manifest.
+
+Manifestet (default generators/banks.build.json) beskriver varje bank:
+ämne, årskurs, nivå, antal, seed, augment-steg och utfil. Bygget löses upp i
+en beroendegraf per bank:
+
+    generate → augment[0] → augment[1] … → verify ─┐
+    generate → verify ──────────────────────────────┼→ index
+                                                    ┘
+Oberoende banker körs parallellt (egna processer). En bank vars indata
+(manifestpost + skript) och utfil är oförändrade sedan förra bygget hoppas över.
+
+Kör via banks_tool:
+  python3 generators/banks_tool.py build
+  python3 generators/banks_tool.py build --only ma-ak3 --jobs 2
+  python3 generators/banks_tool.py build --dry-run
+  python3 generators/banks_tool.py --trace build/trace.json build
+  python3 generators/banks_tool.py --max-memory 1G build
+
+Med --trace kör varje steg med egen --trace (.cache/build/trace/<nod>.jsonl)
+och stegens händelser slås ihop i förälderns spårfil. --max-memory och
+--mem-report skickas vidare till varje steg (budgeten gäller per process).
+"""
+import os, re, subprocess, sys, time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Tuple
+
+import bank_codec
+from bank_memory import MEMORY_EXIT
+from bank_trace import TRACE
+from build_cache import HELPER_FILES, sha1_file, sha1_json
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+MANIFEST_DEF = os.path.join(SCRIPT_DIR, "banks.build.json")
+STAMP_DIR_DEF = os.path.join(PROJECT_ROOT, ".cache", "build")
+BUILD_VERSION = 1
+
+GENERATORS = {
+    "create_bank": "create_bank.py",
+    "make_matematik_bank": "make_matematik_bank.py",
+    "make_svenska_bank": "make_svenska_bank.py",
+}
+
+def load_manifest(path: str) -> Dict[str, Any]:
+    m = bank_codec.load_file(path)
+    m.setdefault("banksDir", "public/banks")
+    names = [b.get("name") for b in m.get("banks", [])]
+    if any(not n for n in names):
+        raise ValueError("varje bank i manifestet behöver 'name'")
+    if len(set(names)) != len(names):
+        raise ValueError("dubbla bank-namn i manifestet")
+    for b in m["banks"]:
+        if b.get("generator", "create_bank") not in GENERATORS:
+            raise ValueError(f"{b['name']}: okänd generator '{b.get('generator')}'")
+        if not b.get("out"):
+            raise ValueError(f"{b['name']}: saknar 'out'")
+    return m
+
+def _flags(opts: Dict[str, Any]) -> List[str]:
+    out: List[str] = []
+    for k, v in (opts or {}).items():
+        if v is False or v is None:
+            continue
+        out.append(f"--{k}")
+        if v is not True:
+            out.append(str(v))
+    return out
+
+def _script(name: str) -> str:
+    return os.path.join(SCRIPT_DIR, name)
+
+def banks_dir_path(m: Dict[str, Any]) -> str:
+    banks_dir = m["banksDir"]
+    return banks_dir if os.path.isabs(banks_dir) else os.path.join(PROJECT_ROOT, banks_dir)
+
+def bank_out_path(m: Dict[str, Any], b: Dict[str, Any]) -> str:
+    return os.path.join(banks_dir_path(m), b["out"])
+
+def generate_cmd(m: Dict[str, Any], b: Dict[str, Any]) -> List[str]:
+    gen = b.get("generator", "create_bank")
+    out = bank_out_path(m, b)
+    cmd = [sys.executable, _script(GENERATORS[gen])]
+    if gen == "create_bank":
+        cmd += ["--subject", b["subject"], "--grade", str(b.get("grade", 3)),
+                "--bank-id", b["name"], "--label", b.get("label") or b["name"],
+                "--desc", b.get("desc", ""), "--level", b.get("level", "np")]
+    else:
+        cmd += ["--replace"]  # manifestbyggen är alltid från noll
+        if gen == "make_svenska_bank":
+            cmd += ["--level", b.get("level", "np")]
+    if b.get("seed") is not None:
+        cmd += ["--seed", str(b["seed"])]
+    cmd += ["--out", out]
+    cmd += _flags(b.get("counts"))
+    cmd += _flags(b.get("options"))
+    return cmd
+
+def augment_cmd(m: Dict[str, Any], b: Dict[str, Any], step: Dict[str, Any]) -> List[str]:
+    return [sys.executable, _script("augment_matematik_bank.py"), "--bank", bank_out_path(m, b)] + _flags(step)
+
+def verify_cmd(m: Dict[str, Any], b: Dict[str, Any]) -> List[str]:
+    return [sys.executable, _script("verify_banks.py"), bank_out_path(m, b)]
+
+def index_cmd(m: Dict[str, Any]) -> List[str]:
+    return [sys.executable, _script("banks_tool.py"), "--banks-dir", banks_dir_path(m), "index"]
+
+def bank_inputs_hash(b: Dict[str, Any]) -> str:
+    gen = GENERATORS[b.get("generator", "create_bank")]
+    files = [gen] + (["augment_matematik_bank.py"] if b.get("augment") else []) + list(HELPER_FILES)
+    return sha1_json({
+        "version": BUILD_VERSION,
+        "bank": b,
+        "scripts": {f: sha1_file(_script(f)) for f in files},
+    })
+
+def _stamp_path(stamp_dir: str, name: str) -> str:
+    return os.path.join(stamp_dir, f"{name}.json")
+
+def read_stamp(stamp_dir: str, name: str) -> Dict[str, Any]:
+    try:
+        return bank_codec.load_file(_stamp_path(stamp_dir, name))
+    except Exception:
+        return {}
+
+def write_stamp(stamp_dir: str, name: str, stamp: Dict[str, Any]):
+    os.makedirs(stamp_dir, exist_ok=True)
+    bank_codec.dump_file(_stamp_path(stamp_dir, name), stamp)
+
+def plan_graph(m: Dict[str, Any], only: List[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Bygg noder: {nod-id: {cmd, deps, bank}}. 'index' beror på alla verify-noder.
+    """
+    nodes: Dict[str, Dict[str, Any]] = {}
+    verify_nodes = []
+    for b in m["banks"]:
+        if only and b["name"] not in only:
+            continue
+        name = b["name"]
+        prev = f"generate:{name}"
+        nodes[prev] = {"cmd": generate_cmd(m, b), "deps": [], "bank": name}
+        for i, step in enumerate(b.get("augment") or []):
+            nid = f"augment:{name}:{i}"
+            nodes[nid] = {"cmd": augment_cmd(m, b, step), "deps": [prev], "bank": name}
+            prev = nid
+        vid = f"verify:{name}"
+        nodes[vid] = {"cmd": verify_cmd(m, b), "deps": [prev], "bank": name}
+        verify_nodes.append(vid)
+    if verify_nodes:
+        nodes["index"] = {"cmd": index_cmd(m), "deps": verify_nodes, "bank": None}
+    return nodes
+
+def _trace_path(stamp_dir: str, node_id: str) -> str:
+    return os.path.join(stamp_dir, "trace", re.sub(r"[^\w.-]+", "_", node_id) + ".jsonl")
+
+def _instrument_flags(trace_path: str = None) -> List[str]:
+    flags = ["--trace", trace_path] if trace_path else []
+    mem = TRACE.memory
+    if mem is not None:
+        flags += ["--max-memory", str(mem.budget)] if mem.budget else []
+        flags += ["--mem-report"] if TRACE.mem_report else []
+    return flags
+
+def _run(node_id: str, cmd: List[str], trace_path: str = None) -> Tuple[str, int, float, str]:
+    flags = _instrument_flags(trace_path)
+    if flags:
+        # direkt efter skriptet (banks_tool kräver dem före underkommandot)
+        cmd = cmd[:2] + flags + cmd[2:]
+    if trace_path and os.path.exists(trace_path):
+        os.remove(trace_path)
+    t0 = time.time()
+    p = subprocess.run(cmd, cwd=PROJECT_ROOT, capture_output=True, text=True)
+    dt = time.time() - t0
+    if trace_path:
+        TRACE.emit(f"node:{node_id}", "node", int(t0 * 1e6), int(dt * 1e6), {"rc": p.returncode})
+        TRACE.merge_file(trace_path, node=node_id)
+    return node_id, p.returncode, dt, (p.stdout or "") + (p.stderr or "")
+
+def run_build(manifest_path: str = MANIFEST_DEF, only: List[str] = None, jobs: int = None,
+              force: bool = False, dry_run: bool = False, stamp_dir: str = STAMP_DIR_DEF) -> int:
+    m = load_manifest(manifest_path)
+    nodes = plan_graph(m, only)
+    banks = {b["name"]: b for b in m["banks"]}
+
+    # Vilka banker är redan aktuella?
+    fresh = set()
+    inputs = {}
+    for name in {n["bank"] for n in nodes.values() if n["bank"]}:
+        b = banks[name]
+        inputs[name] = bank_inputs_hash(b)
+        st = read_stamp(stamp_dir, name)
+        if (not force and st.get("inputs") == inputs[name]
+                and st.get("output") and st.get("output") == sha1_file(bank_out_path(m, b))):
+            fresh.add(name)
+    index_path = os.path.join(banks_dir_path(m), "index.json")
+    if "index" in nodes and len(fresh) == len(inputs) and not force and os.path.isfile(index_path):
+        fresh.add(None)
+
+    if dry_run:
+        for nid, n in nodes.items():
+            mark = "✓ aktuell" if n["bank"] in fresh else "→ körs"
+            print(f"{mark:10} {nid:28} deps={n['deps']}")
+        return 0
+
+    state: Dict[str, str] = {}          # nod -> ok|fail|skip
+    for nid, n in nodes.items():
+        if n["bank"] in fresh:
+            state[nid] = "ok"
+    print(f"🏗️  {len(nodes)} noder, {len(fresh - {None})} banker aktuella, jobs={jobs or os.cpu_count()}")
+
+    failed = False
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as ex:
+        running = {}
+        while True:
+            for nid, n in nodes.items():
+                if nid in state or nid in running.values():
+                    continue
+                dep_states = [state.get(d) for d in n["deps"]]
+                if any(s in ("fail", "skip") for s in dep_states):
+                    state[nid] = "skip"
+                    print(f"⏭️  {nid} (beroende misslyckades)")
+                elif all(s == "ok" for s in dep_states):
+                    print(f"▶️  {nid}")
+                    tp = _trace_path(stamp_dir, nid) if TRACE.enabled else None
+                    running[ex.submit(_run, nid, n["cmd"], tp)] = nid
+            if not running:
+                break
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for fut in done:
+                nid = running.pop(fut)
+                _, rc, dt, output = fut.result()
+                if rc == 0:
+                    state[nid] = "ok"
+                    print(f"✅ {nid} ({dt:.1f}s)")
+                else:
+                    state[nid] = "fail"
+                    failed = True
+                    why = ", minnesbudget överskriden" if rc == MEMORY_EXIT else ""
+                    print(f"❌ {nid} (exit {rc}{why}, {dt:.1f}s)")
+                    # hela minnesfördelningen vid budgetfel
+                    for line in output.strip().splitlines()[-(40 if rc == MEMORY_EXIT else 15):]:
+                        print("   │", line)
+                n = nodes[nid]
+                if rc == 0 and nid.startswith("verify:"):
+                    b = banks[n["bank"]]
+                    write_stamp(stamp_dir, n["bank"], {
+                        "inputs": inputs[n["bank"]],
+                        "output": sha1_file(bank_out_path(m, b)),
+                    })
+
+    built = sum(1 for nid, s in state.items() if s == "ok" and nodes[nid]["bank"] not in fresh)
+    print(f"🏁 Klart: {built} steg körda, {len(fresh - {None})} banker oförändrade" + (" – med fel." if failed else "."))
+    return 1 if failed else 0
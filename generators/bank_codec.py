@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bank_codec.py – utbytbar JSON-kodek för banker.
+
+Använder orjson eller ujson om de finns installerade, annars stdlib json.
+Utdata har samma logiska innehåll och samma nyckelordning oavsett bakände:
+
+  • pretty  – som json.dump(..., ensure_ascii=False, indent=2)
+  • compact – som json.dump(..., ensure_ascii=False, separators=(",", ":"))
+
+Välj bakände manuellt med miljövariabeln BANKS_JSON_CODEC=orjson|ujson|stdlib.
+Klarar en snabb bakände inte ett värde (t.ex. heltal större än 64 bitar)
+används stdlib för just det anropet.
+
+Jämför bakändena på de riktiga bankerna:
+  python3 generators/bench_banks.py codec
+"""
+import json, os
+from typing import Any, Callable, Dict, Optional
+
+from bank_trace import span
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+# ----------------- bakändar -----------------
+
+def _std_loads(s):
+    return json.loads(s)
+
+def _std_dumps(obj: Any, pretty: bool) -> str:
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+def _orjson_loads(s):
+    return orjson.loads(s)
+
+def _orjson_dumps(obj: Any, pretty: bool) -> str:
+    opt = orjson.OPT_NON_STR_KEYS
+    if pretty:
+        opt |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, option=opt).decode("utf-8")
+
+def _ujson_loads(s):
+    return ujson.loads(s)
+
+def _ujson_dumps(obj: Any, pretty: bool) -> str:
+    if pretty:
+        # ujsons indrag skiljer sig i detaljer från stdlib – pretty går via stdlib
+        return _std_dumps(obj, True)
+    return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False)
+
+BACKENDS: Dict[str, Dict[str, Callable]] = {"stdlib": {"loads": _std_loads, "dumps": _std_dumps}}
+if orjson is not None:
+    BACKENDS["orjson"] = {"loads": _orjson_loads, "dumps": _orjson_dumps}
+if ujson is not None:
+    BACKENDS["ujson"] = {"loads": _ujson_loads, "dumps": _ujson_dumps}
+
+PREFERENCE = ("orjson", "ujson", "stdlib")
+
+def _pick(name: Optional[str] = None) -> str:
+    name = (name or os.environ.get("BANKS_JSON_CODEC") or "").strip().lower()
+    if name:
+        if name not in BACKENDS:
+            raise ValueError(f"JSON-kodek '{name}' finns inte (tillgängliga: {', '.join(BACKENDS)})")
+        return name
+    return next(n for n in PREFERENCE if n in BACKENDS)
+
+BACKEND = _pick()
+
+def use(name: str) -> str:
+    """Byt bakände i processen (t.ex. i benchmark). Returnerar föregående."""
+    global BACKEND
+    prev, BACKEND = BACKEND, _pick(name)
+    return prev
+
+# ----------------- API -----------------
+
+def loads(s) -> Any:
+    """Tolka JSON från str eller bytes."""
+    if BACKEND != "stdlib":
+        try:
+            return BACKENDS[BACKEND]["loads"](s)
+        except Exception:
+            pass  # stdlib avgör: giltig JSON tolkas, ogiltig ger json.JSONDecodeError
+    return _std_loads(s)
+
+def dumps(obj: Any, pretty: bool = True) -> str:
+    if BACKEND != "stdlib":
+        try:
+            return BACKENDS[BACKEND]["dumps"](obj, pretty)
+        except (TypeError, ValueError, OverflowError):
+            pass
+    return _std_dumps(obj, pretty)
+
+def load_file(path) -> Any:
+    with span("load", file=os.path.basename(str(path))) as sp:
+        with open(path, "rb") as f:
+            raw = f.read()
+        sp.count = len(raw)
+        return loads(raw)
+
+def write_text(path, text: str, tmp: str = None):
+    """Atomisk skrivning av färdig text (tmp, default <path>.tmp, + os.replace)."""
+    tmp = tmp or str(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def dump_file(path, obj: Any, pretty: bool = True, tmp: str = None):
+    """Atomisk skrivning (.tmp + os.replace)."""
+    name = os.path.basename(str(path))
+    with span("serialize", file=name, codec=BACKEND) as sp:
+        text = dumps(obj, pretty)
+        sp.count = len(text)
+    with span("write", file=name):
+        write_text(path, text, tmp)
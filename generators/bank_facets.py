@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bank_facets.py – liten sammanfattning (facetter) per bank.
+
+Skriver <bank>.facets.json bredvid bankfilen, t.ex.
+  public/banks/matematik.ak3.json  ->  public/banks/matematik.ak3.facets.json
+
+Innehåll: antal per område/typ/svårighet, fördelning av rätt svars-position,
+antal passager/frågor och bytestorlekar. Klienter och skript kan läsa den lilla
+filen i stället för att ladda och gå igenom hela banken.
+
+Filen skrivs om bara när bankens innehåll ändrats (sha1 sparas i "source").
+
+Kör fristående:
+  python3 generators/bank_facets.py public/banks/matematik.ak3.json [--force]
+"""
+import argparse, hashlib, json, os, sys
+from collections import Counter
+from typing import Any, Dict, Tuple
+
+import bank_codec
+from bank_io import iter_bank_records, sidecar_path  # noqa: F401 (återexport)
+from bank_trace import add_trace_arg, span, start_trace
+
+FACETS_VERSION = 1
+FACETS_SUFFIX = ".facets.json"
+# Filer som skrivs bredvid bankerna och alltså inte själva är banker
+SIDECAR_SUFFIXES = (FACETS_SUFFIX, ".exams.json", ".sampling.json", ".build.json", ".offsets.json", ".merge.json", ".hashes.json")
+
+def is_sidecar(path: str) -> bool:
+    return os.path.basename(path).endswith(SIDECAR_SUFFIXES)
+
+def facets_path(bank_path: str) -> str:
+    return sidecar_path(bank_path, FACETS_SUFFIX)
+
+def _sorted_counts(c: Counter) -> Dict[str, int]:
+    return {str(k): v for k, v in sorted(c.items(), key=lambda kv: (-kv[1], str(kv[0])))}
+
+def compute_facets(data: Dict[str, Any], raw: bytes, name: str = "") -> Dict[str, Any]:
+    by_area, by_type, by_diff = Counter(), Counter(), Counter()
+    positions, options_n, qs_per_passage = Counter(), Counter(), Counter()
+    bytes_by_type = Counter()
+    n_items = n_passages = n_questions = 0
+    words = []
+
+    for kind, rec, _ in iter_bank_records(data):
+        if kind == "passage":
+            n_passages += 1
+            qs_per_passage[len(rec.get("questions") or [])] += 1
+            words.append(len(str(rec.get("text") or "").split()))
+            continue
+        if kind == "item":
+            n_items += 1
+            t = rec.get("type") or "mc"
+            area = rec.get("area") or "okänd"
+        else:
+            n_questions += 1
+            t = rec.get("type") or "mc"
+            area = rec.get("area") or "läsförståelse"
+        by_area[area] += 1
+        by_type[t] += 1
+        by_diff[rec.get("difficulty") or "np"] += 1
+        opts = rec.get("options")
+        c = rec.get("correct")
+        if isinstance(opts, list) and isinstance(c, int) and not isinstance(c, bool):
+            positions[c] += 1
+            options_n[len(opts)] += 1
+        bytes_by_type[t] += len(bank_codec.dumps(rec, pretty=False).encode("utf-8"))
+
+    return {
+        "version": FACETS_VERSION,
+        "source": {
+            "file": name,
+            "sha1": hashlib.sha1(raw).hexdigest(),
+            "bytes": len(raw),
+        },
+        "subject": data.get("subject") or next((k for k in ("svenska", "matematik") if k in data), None),
+        "grade": data.get("grade"),
+        "counts": {
+            "items": n_items,
+            "passages": n_passages,
+            "passageQuestions": n_questions,
+            "questions": n_items + n_questions,
+        },
+        "byArea": _sorted_counts(by_area),
+        "byType": _sorted_counts(by_type),
+        "byDifficulty": _sorted_counts(by_diff),
+        "answerPositions": {str(k): positions[k] for k in sorted(positions)},
+        "optionCounts": {str(k): options_n[k] for k in sorted(options_n)},
+        "passages": {
+            "questionsPerPassage": {str(k): qs_per_passage[k] for k in sorted(qs_per_passage)},
+            "textWords": {
+                "min": min(words) if words else 0,
+                "max": max(words) if words else 0,
+                "avg": round(sum(words) / len(words), 1) if words else 0,
+            },
+        },
+        "bytes": {
+            "file": len(raw),
+            "compactByType": _sorted_counts(bytes_by_type),
+        },
+    }
+
+def read_facets(bank_path: str) -> Dict[str, Any]:
+    p = facets_path(bank_path)
+    if not os.path.isfile(p):
+        return {}
+    try:
+        with open(p, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def write_facets(bank_path: str, data: Dict[str, Any] = None, force: bool = False) -> Tuple[str, bool]:
+    """
+    Skriv/uppdatera facettfilen för en bank. Returnerar (sökväg, skrevs_om).
+    Om sha1 i befintlig facettfil matchar bankfilen görs inget.
+    """
+    with span("read", file=os.path.basename(bank_path)) as sp:
+        with open(bank_path, "rb") as f:
+            raw = f.read()
+        sp.count = len(raw)
+    out = facets_path(bank_path)
+    if not force:
+        old = read_facets(bank_path)
+        if old.get("version") == FACETS_VERSION and old.get("source", {}).get("sha1") == hashlib.sha1(raw).hexdigest():
+            return out, False
+    if data is None:
+        data = bank_codec.loads(raw)
+    with span("facets", file=os.path.basename(bank_path)):
+        facets = compute_facets(data, raw, os.path.basename(bank_path))
+    bank_codec.dump_file(out, facets)
+    return out, True
+
+def main():
+    ap = argparse.ArgumentParser(description="Skriv <bank>.facets.json för en eller flera banker")
+    ap.add_argument("banks", nargs="+", help="Bankfiler (.json)")
+    ap.add_argument("--force", action="store_true", help="Skriv om även om banken inte ändrats")
+    add_trace_arg(ap)
+    args = ap.parse_args()
+    start_trace(args)
+    for p in args.banks:
+        if not os.path.isfile(p):
+            print("⚠️ Hittar inte fil:", p)
+            sys.exit(1)
+        out, changed = write_facets(p, force=args.force)
+        print(("✅ Skrev " if changed else "ℹ️ Oförändrad: ") + out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bank_ids.py – innehållssignaturer och stabila hash-id:n för frågor.
+
+Löpnummer (ma-001, sv-p-012-q3) säger inget om innehållet: en omgenerering
+numrerar om allt och klienternas sparade usedIds (localStorage) pekar fel.
+Med id-schemat "hash" härleds id:t ur en kanonisk innehållssignatur:
+
+  ma-h3f9a2c1b   sv-h07c4e1d2   sv-p-h9b1e55a0   (passagefrågor: <passage-id>-q<n>)
+
+Samma fråga får alltså samma id i varje generering, och sammanslagning/dedupe
+blir mängdoperationer på hashar. 'h' efter prefixet gör att hash-id:n aldrig
+tolkas som löpnummer (ma-(\\d+)).
+
+Signaturen (sig_item) normaliserar text och sorterar svarsalternativ, så
+omkastade alternativ räknas som samma fråga. Rätt svar och övrigt innehåll
+(diagram, tabeller, tiles …) ingår; härledda fält (hint, explain, dscore …)
+gör det inte.
+
+Kollisioner: om två olika signaturer ger samma korta hash förlängs den senare
+med två hexsiffror åt gången tills id:t är ledigt.
+"""
+import hashlib, json, re
+from typing import Any, Dict, Iterable, Optional
+
+from bank_io import bank_sections
+from bank_text import normalize_text  # noqa: F401 (återexport)
+
+ID_SCHEMES = ("seq", "hash")
+HASH_LEN = 8
+# Fält som inte räknas som innehåll (härleds eller sätts efteråt)
+DERIVED_FIELDS = frozenset({"id", "hint", "explain", "hintRef", "difficulty", "topic", "dscore", "dfeat", "questions"})
+MC_TYPES = (None, "", "mc", "bar-max", "bar-compare")
+
+# ---------- signaturer ----------
+
+def sig_item(it: dict) -> str:
+    """Signature used to avoid duplicates / near-duplicates."""
+    t = it.get("type") or "mc"
+    area = it.get("area") or ""
+    q = normalize_text(it.get("q") or "")
+    # for mc, include sorted options to reduce repeated permutations
+    if t in MC_TYPES:
+        ops = [str(x) for x in (it.get("options") or [])]
+        ops = sorted([normalize_text(o) for o in ops])
+        return f"{t}|{area}|{q}|{'|'.join(ops)}"
+    # for dnd, include bucket labels
+    if t == "dnd":
+        b = [normalize_text(x.get('label','')) for x in (it.get('buckets') or [])]
+        return f"{t}|{area}|{q}|{'|'.join(b)}"
+    # charts: include labels
+    if t in ("bar-max","bar-compare"):
+        ch = it.get("chart") or {}
+        labs = [normalize_text(x) for x in (ch.get("labels") or [])]
+        return f"{t}|{area}|{q}|{'|'.join(labs)}"
+    return f"{t}|{area}|{q}"
+
+def content_sig(rec: Dict[str, Any], kind: str = "item") -> str:
+    """
+    Kanonisk signatur för hash-id: sig_item + rätt svar + resterande innehåll.
+    kind='passage' ger titel + text + frågornas signaturer (frågorna får id från passagen).
+    """
+    if kind == "passage":
+        qs = [content_sig(q) for q in (rec.get("questions") or []) if isinstance(q, dict)]
+        return "passage|" + "|".join([normalize_text(rec.get("title") or ""), normalize_text(rec.get("text") or "")] + qs)
+    s = sig_item(rec)
+    opts, c = rec.get("options"), rec.get("correct")
+    if isinstance(opts, list) and isinstance(c, int) and 0 <= c < len(opts):
+        s += "|=" + normalize_text(str(opts[c]))
+    rest = {k: v for k, v in rec.items()
+            if k not in DERIVED_FIELDS and k not in ("type", "area", "q", "options", "correct")}
+    if rest:
+        s += "|" + json.dumps(rest, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return s
+
+def content_hash(sig: str) -> str:
+    return hashlib.sha1(sig.encode("utf-8")).hexdigest()
+
+def record_hash(rec: Dict[str, Any], kind: str = "item") -> str:
+    return content_hash(content_sig(rec, kind))
+
+# ---------- tilldelning ----------
+
+def hash_id(prefix: str, h: str, taken) -> str:
+    """prefix + 'h' + kort hash, förlängd två hexsiffror i taget tills id:t inte finns i taken."""
+    n = HASH_LEN
+    while f"{prefix}h{h[:n]}" in taken and n < len(h):
+        n += 2
+    cand = f"{prefix}h{h[:n]}"
+    k = 2
+    while cand in taken:  # hela sha1 krockar – praktiskt omöjligt
+        cand = f"{prefix}h{h}-{k}"
+        k += 1
+    return cand
+
+class HashIds:
+    """
+    Håller id → innehållshash och innehållshash → id för en bank. Befintliga
+    poster (oavsett id-schema) registreras först så att dubbletter upptäcks –
+    som poster eller, om bara hashen finns (NDJSON-sidofilen), som {id: hash}.
+    """
+    def __init__(self, records: Iterable[Dict[str, Any]] = (), kind: str = "item",
+                 hashes: Dict[str, str] = None):
+        self.by_id: Dict[str, str] = {}
+        self.by_hash: Dict[str, str] = {}
+        for rec in records:
+            self.add_existing(rec, kind)
+        for _id, h in (hashes or {}).items():
+            self.add_hash(_id, h)
+
+    def add_existing(self, rec: Dict[str, Any], kind: str = "item"):
+        _id = rec.get("id")
+        if _id:
+            self.add_hash(str(_id), record_hash(rec, kind))
+
+    def add_hash(self, _id: str, h: str):
+        self.by_id[_id] = h
+        self.by_hash.setdefault(h, _id)
+
+    def __contains__(self, _id: str) -> bool:
+        return _id in self.by_id
+
+    def id_for(self, sig: str, prefix: str) -> str:
+        """Id för signaturen utan att registrera (med kollisionsförlängning)."""
+        h = content_hash(sig)
+        if h in self.by_hash:
+            return self.by_hash[h]
+        return hash_id(prefix, h, self.by_id)
+
+    def assign(self, rec: Dict[str, Any], prefix: str, kind: str = "item") -> Optional[str]:
+        """
+        Sätt rec['id'] till hash-id:t och registrera. Returnerar None (och
+        lämnar rec orörd) om samma innehåll redan finns i banken.
+        """
+        sig = content_sig(rec, kind)
+        if content_hash(sig) in self.by_hash:
+            return None
+        _id = self.id_for(sig, prefix)
+        self.add_hash(_id, content_hash(sig))
+        rec["id"] = _id
+        return _id
+
+def id_prefix(rec: Dict[str, Any], fallback: str) -> str:
+    """Prefix ur ett löpnummer-id: ma-001 -> 'ma-', sv-p-003 -> 'sv-p-'."""
+    m = re.match(r"^(.*-)\d+$", str(rec.get("id") or ""))
+    return m.group(1) if m else fallback
+
+def assign_hash_ids(data: Dict[str, Any], new: Iterable[Dict[str, Any]] = None,
+                    existing: Dict[str, Dict[str, str]] = None) -> int:
+    """
+    Byt löpnummer mot hash-id på bankens poster – alla, eller bara de i new.
+    Körs efter backfill så att signaturen bygger på färdiga poster.
+    Övriga poster i banken (och existing = {"items": {id: hash}, "passages": {...}},
+    redan skrivna NDJSON-rader ur bank_ndjson.content_hashes) behåller sina
+    id:n men räknas vid dubblett- och kollisionskontroll. Nya dubbletter tas
+    bort ur banken. Returnerar antal borttagna.
+    """
+    fresh = None if new is None else {id(r) for r in new}
+    is_new = lambda r: fresh is None or id(r) in fresh
+    dropped = 0
+    for sec in bank_sections(data):
+        for key, kind in (("items", "item"), ("passages", "passage")):
+            recs = sec.get(key)
+            if not recs:
+                continue
+            ids = HashIds([r for r in recs if not is_new(r)], kind, (existing or {}).get(key))
+            keep = []
+            for r in recs:
+                if not is_new(r):
+                    keep.append(r)
+                    continue
+                fallback = ("sv-p-" if kind == "passage" else str(r.get("topic") or "x")[:2] + "-")
+                if ids.assign(r, id_prefix(r, fallback), kind) is None:
+                    dropped += 1
+                    continue
+                if kind == "passage":
+                    for i, q in enumerate(r.get("questions", []) or [], start=1):
+                        q["id"] = f"{r['id']}-q{i}"
+                keep.append(r)
+            recs[:] = keep
+    return dropped
+
+def add_id_scheme_arg(ap):
+    ap.add_argument("--id-scheme", choices=ID_SCHEMES, default="seq",
+                    help="seq = löpnummer (ma-001), hash = stabilt id från innehållet (ma-h3f9a2c1b)")
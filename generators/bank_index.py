@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bank_index.py – låsta uppdateringar av public/banks/index.json.
+
+create_bank.py --update-index och banks_tool.py index gör läs-ändra-skriv på
+samma fil. Körs flera byggen parallellt (t.ex. en per årskurs) kan poster
+försvinna. Här sker varje uppdatering under ett exklusivt lås
+(<index>.lock, fcntl.flock där det finns, annars en O_EXCL-låsfil).
+
+Registreringar från parallella jobb slås ihop: varje jobb lägger sin post i
+<index>.pending/ och den som får låset skriver in alla väntande poster i en
+enda skrivning. Övriga jobb ser att deras post redan är med och skriver inget.
+
+  from bank_index import register_entry
+  register_entry(INDEX_PATH, {"id": "ma-ak3", "path": "matematik.ak3.json", ...})
+"""
+import os, time, uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List
+
+import bank_codec
+from bank_trace import span
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+LOCK_SUFFIX = ".lock"
+PENDING_SUFFIX = ".pending"
+LOCK_TIMEOUT = 60.0
+STALE_AFTER = 300.0   # O_EXCL-låsfil äldre än så räknas som kvarlämnad
+
+class IndexLockTimeout(RuntimeError):
+    pass
+
+@contextmanager
+def index_lock(index_path: str, timeout: float = LOCK_TIMEOUT):
+    """Exklusivt lås för index_path (blockerar upp till timeout sekunder)."""
+    lock_path = index_path + LOCK_SUFFIX
+    os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+    deadline = time.monotonic() + timeout
+    if fcntl is not None:
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() > deadline:
+                        raise IndexLockTimeout(f"kunde inte låsa {index_path} inom {timeout:.0f}s")
+                    time.sleep(0.02)
+            yield
+        finally:
+            os.close(fd)   # släpper flock
+        return
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            os.write(fd, str(os.getpid()).encode())
+            os.close(fd)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > STALE_AFTER:
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                continue
+            if time.monotonic() > deadline:
+                raise IndexLockTimeout(f"kunde inte låsa {index_path} inom {timeout:.0f}s")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+
+def read_index(index_path: str, default: Dict[str, Any] = None) -> Dict[str, Any]:
+    try:
+        return bank_codec.load_file(index_path)
+    except Exception:
+        return dict(default) if default is not None else {}
+
+def _write_index(index_path: str, idx: Dict[str, Any]):
+    # unik tmp-fil: låset skyddar, men en kvarlämnad .tmp ska aldrig delas
+    bank_codec.dump_file(index_path, idx, tmp=f"{index_path}.{os.getpid()}.tmp")
+
+def update_index_file(index_path: str, mutate: Callable[[Dict[str, Any]], Dict[str, Any]],
+                      default: Dict[str, Any] = None, timeout: float = LOCK_TIMEOUT) -> Dict[str, Any]:
+    """Läs, ändra och skriv index.json under lås. mutate får aktuell index och returnerar den nya."""
+    with span("index", file=os.path.basename(index_path)) as sp, index_lock(index_path, timeout):
+        idx = read_index(index_path, default)
+        idx = mutate(idx)
+        _write_index(index_path, idx)
+        sp.count = len(idx.get("entries") or idx.get("banks") or [])
+    return idx
+
+def merge_entries(entries: List[Dict[str, Any]], new: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Ersätt poster med samma id (fält för fält), lägg annars till sist."""
+    pos = {e.get("id"): i for i, e in enumerate(entries)}
+    for e in new:
+        i = pos.get(e.get("id"))
+        if i is None:
+            pos[e.get("id")] = len(entries)
+            entries.append(dict(e))
+        else:
+            entries[i].update(e)
+    return entries
+
+def _pending_dir(index_path: str) -> str:
+    return index_path + PENDING_SUFFIX
+
+def _drain_pending(index_path: str) -> List[Dict[str, Any]]:
+    d = _pending_dir(index_path)
+    if not os.path.isdir(d):
+        return []
+    out = []
+    for name in sorted(os.listdir(d)):
+        if not name.endswith(".json"):
+            continue
+        p = os.path.join(d, name)
+        try:
+            out.append(bank_codec.load_file(p))
+        except Exception:
+            pass
+        try:
+            os.remove(p)
+        except OSError:
+            pass
+    return out
+
+def register_entries(index_path: str, entries: List[Dict[str, Any]], timeout: float = LOCK_TIMEOUT) -> int:
+    """
+    Registrera poster i index.json["entries"]. Posterna köas först i
+    <index>.pending/ och skrivs sedan in – tillsammans med andra jobbs köade
+    poster – av den som får låset. Returnerar antal poster som skrevs in
+    av just detta anrop (0 om ett annat jobb redan tog med dem).
+    """
+    d = _pending_dir(index_path)
+    os.makedirs(d, exist_ok=True)
+    for e in entries:
+        # tidsstämpel först i namnet => poster slås in i registreringsordning
+        name = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.json"
+        bank_codec.dump_file(os.path.join(d, name), e, pretty=False)
+    with span("index", file=os.path.basename(index_path)) as sp, index_lock(index_path, timeout):
+        pending = _drain_pending(index_path)
+        sp.count = len(pending)
+        if not pending:
+            return 0
+        idx = read_index(index_path, {"entries": []})
+        current = idx.get("entries") or idx.get("banks") or []
+        idx["entries"] = merge_entries(current, pending)
+        _write_index(index_path, idx)
+    return len(pending)
+
+def register_entry(index_path: str, entry: Dict[str, Any], timeout: float = LOCK_TIMEOUT) -> int:
+    return register_entries(index_path, [entry], timeout)
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bank_io.py – gemensam kärna för att läsa, normalisera och skriva banker.
+
+Alla skript i generators/ läser och skriver banker härifrån i stället för egna
+read_json/load_json/read_existing/write_json-varianter:
+
+  • read_json(path)        – tolkad fil, cachad i processen på (sökväg, mtime, storlek)
+  • write_json(path, data) – atomisk skrivning; cachen uppdateras med det skrivna
+  • sidecar_path(bank, suffix) – <bank>.facets.json, .offsets.json … bredvid banken
+  • iter_bank_records, bank_sections, collect_ids – single-subject och legacy
+  • normalize_single_subject, read_legacy_bank
+  • ref_hints / expand_hint_ref – delade tipstexter i bankens "hints"-tabell
+  • backfill_start / mark_backfilled – backfill bara för poster efter markören
+
+Tolkning och serialisering går via bank_codec (orjson/ujson om installerat,
+annars stdlib json).
+
+Cachen gör att kedjade steg i samma körning (t.ex. banks_tool add → index)
+aldrig tolkar samma fil två gånger. Den håller bara de CACHE_MAX senast
+använda filerna, så en loop över många stora banker växer inte i minne;
+engångsläsare kan dessutom släppa filen direkt med forget(path). Objekten
+som returneras delas: den som ändrar i en inläst bank utan att skriva
+tillbaka den ska göra copy=True.
+
+Importeras som syskonmodul (python3 generators/x.py) eller som paket:
+  from generators.bank_io import read_json
+"""
+import copy as _copy
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import bank_codec
+
+LEGACY_SECTIONS = ("svenska", "matematik")
+HINTS_KEY = "hints"
+BACKFILL_KEY = "backfill"
+
+_MISSING = object()
+# abspath -> ((mtime_ns, size), data), äldst först
+_CACHE: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+CACHE_MAX = 2
+STATS = {"parses": 0, "hits": 0}
+
+# ----------------- fil-I/O -----------------
+
+def _stat_key(path: str) -> Tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+def _remember(p: str, key: Tuple[int, int], data: Any):
+    """Lägg sist i cachen och släpp de äldsta utöver CACHE_MAX."""
+    _CACHE[p] = (key, data)
+    while len(_CACHE) > CACHE_MAX:
+        del _CACHE[next(iter(_CACHE))]
+
+def read_json(path, default: Any = _MISSING, copy: bool = False) -> Any:
+    """
+    Läs och tolka JSON. Utan default kastas fel för saknad/trasig fil,
+    med default returneras default i de fallen.
+    """
+    p = os.path.abspath(str(path))
+    try:
+        key = _stat_key(p)
+    except OSError:
+        if default is _MISSING:
+            raise
+        return default
+    hit = _CACHE.pop(p, None)
+    if hit is not None and hit[0] == key:
+        STATS["hits"] += 1
+        data = hit[1]
+        _remember(p, key, data)
+    else:
+        try:
+            data = bank_codec.load_file(p)
+        except (OSError, ValueError):
+            if default is _MISSING:
+                raise
+            return default
+        STATS["parses"] += 1
+        _remember(p, key, data)
+    return _copy.deepcopy(data) if copy else data
+
+def write_json(path, data: Any, compact: bool = False):
+    """Atomisk skrivning (.tmp + os.replace). Cachen får det skrivna objektet."""
+    p = os.path.abspath(str(path))
+    os.makedirs(os.path.dirname(p), exist_ok=True)
+    bank_codec.dump_file(p, data, pretty=not compact)
+    _CACHE.pop(p, None)
+    _remember(p, _stat_key(p), data)
+
+def sidecar_path(bank_path: str, suffix: str) -> str:
+    """public/banks/x.json + ".facets.json" -> public/banks/x.facets.json"""
+    base = bank_path[:-len(".json")] if bank_path.endswith(".json") else bank_path
+    return base + suffix
+
+def forget(path=None):
+    """Töm cachen (helt eller för en fil)."""
+    if path is None:
+        _CACHE.clear()
+    else:
+        _CACHE.pop(os.path.abspath(str(path)), None)
+
+# ----------------- bankstruktur -----------------
+
+def is_legacy(data: Dict[str, Any]) -> bool:
+    return "items" not in data and "passages" not in data and any(
+        isinstance(data.get(k), dict) for k in LEGACY_SECTIONS)
+
+def bank_sections(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Single-subject: [data]. Legacy: [data['svenska'], data['matematik']] (de som finns)."""
+    if not is_legacy(data):
+        return [data]
+    return [data[k] for k in LEGACY_SECTIONS if isinstance(data.get(k), dict)]
+
+def iter_bank_records(data: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any], Optional[Dict[str, Any]]]]:
+    """
+    Gå igenom alla poster i en bank (single-subject eller legacy).
+    Ger (kind, post, passage) där kind är 'item', 'passage' eller 'question'.
+    """
+    for sec in bank_sections(data):
+        for it in sec.get("items", []) or []:
+            if isinstance(it, dict):
+                yield "item", it, None
+        for pa in sec.get("passages", []) or []:
+            if not isinstance(pa, dict):
+                continue
+            yield "passage", pa, None
+            for q in pa.get("questions", []) or []:
+                if isinstance(q, dict):
+                    yield "question", q, pa
+
+def collect_ids(data: Dict[str, Any]) -> List[str]:
+    """Alla id:n (items, passager och passagefrågor) i registreringsordning."""
+    return [rec["id"] for _, rec, _ in iter_bank_records(data) if "id" in rec]
+
+def ref_hints(data: Dict[str, Any], records: Iterable[Dict[str, Any]]) -> int:
+    """
+    Flytta hint/explain till bankens tabell data["hints"] = {ref: text} och sätt
+    post["hintRef"] = ref. Samma text får samma ref (även mot en befintlig
+    tabell). Bara poster där explain == hint byts ut. Returnerar antal poster.
+    """
+    table = data.setdefault(HINTS_KEY, {})
+    by_text = {t: r for r, t in table.items()}
+    n = len(table)
+    done = 0
+    for rec in records:
+        h = rec.get("hint")
+        if not isinstance(h, str) or rec.get("explain") != h:
+            continue
+        ref = by_text.get(h)
+        if ref is None:
+            n += 1
+            while f"s{n}" in table:
+                n += 1
+            ref = f"s{n}"
+            table[ref] = h
+            by_text[h] = ref
+        rec["hintRef"] = ref
+        del rec["hint"], rec["explain"]
+        done += 1
+    return done
+
+def expand_hint_ref(rec: Dict[str, Any], table: Optional[Dict[str, str]]) -> Tuple[Dict[str, Any], bool]:
+    """
+    -> (post med hint/explain ur tabellen, ok). Posten kopieras (grunt) om den
+    har hintRef; ok=False om referensen saknas i tabellen.
+    """
+    ref = rec.get("hintRef")
+    if ref is None:
+        return rec, True
+    text = (table or {}).get(ref)
+    if text is None:
+        return rec, False
+    out = {k: v for k, v in rec.items() if k != "hintRef"}
+    out.setdefault("hint", text)
+    out.setdefault("explain", text)
+    return out, True
+
+# ----------------- backfill-markör -----------------
+# Sektionen får {"v": version, "n": items, "p": passager, "last": [item-id, passage-id]}:
+# de första n items och p passager är redan backfyllda. Generatorerna lägger bara
+# till i slutet, så vid append behöver bara posterna efter markören gås igenom.
+# Kontrollen är O(1): markören gäller inte om versionen ändrats, listorna krympt
+# eller sista posten före markören bytt id (omsorterad bank) – då körs allt.
+# Poster som redigerats på plats före markören upptäcks inte; kör då med full=True
+# (--full-backfill).
+
+def _last_id(recs: List[Dict[str, Any]], n: int) -> Optional[str]:
+    return recs[n - 1].get("id") if n and isinstance(recs[n - 1], dict) else None
+
+def backfill_start(sec: Dict[str, Any], version: int, full: bool = False) -> Tuple[int, int]:
+    """-> (första item, första passage) som behöver backfill i sektionen."""
+    m = sec.get(BACKFILL_KEY)
+    if full or not isinstance(m, dict) or m.get("v") != version:
+        return 0, 0
+    items = sec.get("items") or []
+    passages = sec.get("passages") or []
+    n, p = m.get("n"), m.get("p")
+    if not isinstance(n, int) or not isinstance(p, int) or not (0 <= n <= len(items)) or not (0 <= p <= len(passages)):
+        return 0, 0
+    if list(m.get("last") or [None, None]) != [_last_id(items, n), _last_id(passages, p)]:
+        return 0, 0
+    return n, p
+
+def mark_backfilled(sec: Dict[str, Any], version: int):
+    """Sätt markören efter sektionens sista item och passage."""
+    items = sec.get("items") or []
+    passages = sec.get("passages") or []
+    sec[BACKFILL_KEY] = {"v": version, "n": len(items), "p": len(passages),
+                         "last": [_last_id(items, len(items)), _last_id(passages, len(passages))]}
+
+def normalize_single_subject(data: Dict[str, Any], fallback_subject: str = "", fallback_grade: Any = None) -> Dict[str, Any]:
+    """
+    Returnera single-subject struktur:
+    { version?, subject, grade, items:[], passages:[] }
+    """
+    if "subject" in data and "items" in data:
+        out = {
+            "version": data.get("version", "1.0"),
+            "subject": data.get("subject") or fallback_subject or "svenska",
+            "grade": data.get("grade", fallback_grade),
+            "items": data.get("items", []),
+            "passages": data.get("passages", []),
+        }
+        if data.get(HINTS_KEY):
+            out[HINTS_KEY] = data[HINTS_KEY]
+        return out
+    # legacy: svensk/matte i samma/lika struktur
+    if "svenska" in data or "matematik" in data:
+        # den här hjälpen används endast under migrering, inte i index
+        raise ValueError("normalize_single_subject: fick legacy-format – migrera först.")
+    # minimal fallback
+    return {
+        "version": data.get("version", "1.0"),
+        "subject": fallback_subject or data.get("subject") or "svenska",
+        "grade": data.get("grade", fallback_grade),
+        "items": data.get("items", []),
+        "passages": data.get("passages", []),
+    }
+
+def read_legacy_bank(path, section: str, passages: bool = False) -> Dict[str, Any]:
+    """
+    Läs en legacy-bank ({"bankVersion", section: {items[, passages]}}) och fyll i
+    saknade delar. Saknad eller trasig fil ger en tom bank.
+    """
+    data = read_json(path, default={})
+    if not isinstance(data, dict):
+        data = {}
+    data.setdefault("bankVersion", "1.0")
+    sec = data.setdefault(section, {})
+    sec.setdefault("items", [])
+    if passages:
+        sec.setdefault("passages", [])
+    return data
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bank_memory.py – minnesmätning per fas (tracemalloc) och minnesbudget.
+
+Stora svenska-körningar med många passager håller bank-dicten, den
+serialiserade strängen och kandidatlistorna i minnet samtidigt. Med
+
+  --mem-report         skrivs en tabell per fas vid körningens slut
+  --max-memory 512M    avbryts körningen (exit 3) när Python-heapen passerar
+                       budgeten, med fördelning per fas och största allokeringsställen
+                       (kontrolleras vid varje fasgräns och vid körningens slut)
+
+Faserna är desamma som i --trace (bank_trace.span). Med båda flaggorna får
+spårhändelserna också args.mem_peak / mem_start / mem_end (byte).
+
+Per fas mäts:
+  peak      högsta tracemalloc-nivå under fasen (inkl. det som fanns innan)
+  +peak     peak minus nivån när fasen startade (fasens egen topp)
+  kvar      nivå vid slut minus nivå vid start (det fasen lämnar kvar)
+
+tracemalloc ser bara Python-allokeringar; rapporten visar också processens
+maxRSS (resource) för att dimensionera byggcontainrar. Mätningen gör körningen
+märkbart långsammare och är därför bara påslagen med flaggorna ovan.
+"""
+import os, re, sys, threading, tracemalloc
+from typing import Dict, List, Optional
+
+MEMORY_EXIT = 3
+TOP_SITES = 10
+_UNITS = {"": 1, "B": 1, "K": 1 << 10, "KB": 1 << 10, "KIB": 1 << 10,
+          "M": 1 << 20, "MB": 1 << 20, "MIB": 1 << 20, "G": 1 << 30, "GB": 1 << 30, "GIB": 1 << 30}
+
+def parse_size(s: str) -> int:
+    """'512M', '1.5G', '800MB', '1048576' -> byte (binära enheter)."""
+    m = re.match(r"^\s*(\d+(?:\.\d+)?)\s*([a-zA-Z]*)\s*$", str(s))
+    if not m or m.group(2).upper() not in _UNITS:
+        raise ValueError(f"ogiltig storlek: {s!r} (t.ex. 512M, 2G)")
+    return int(float(m.group(1)) * _UNITS[m.group(2).upper()])
+
+def fmt_size(n: Optional[int]) -> str:
+    if n is None:
+        return "–"
+    sign = "-" if n < 0 else ""
+    n = abs(n)
+    for unit, div in (("GiB", 1 << 30), ("MiB", 1 << 20), ("KiB", 1 << 10)):
+        if n >= div:
+            return f"{sign}{n / div:.1f} {unit}"
+    return f"{sign}{n} B"
+
+def max_rss() -> Optional[int]:
+    """Processens högsta RSS i byte (None där resource saknas)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+class _Frame:
+    __slots__ = ("name", "start", "peak")
+
+    def __init__(self, name: str, start: int):
+        self.name, self.start, self.peak = name, start, start
+
+class MemoryTracker:
+    """
+    Håller en stack av öppna faser. tracemalloc har bara en global topp, så
+    vid varje fasgräns läses toppen av, förs vidare till den öppna fasen och
+    nollställs – då blir även nästlade faser rätt. Förutsätter att faserna
+    öppnas och stängs i samma tråd (som i generatorerna).
+    """
+    def __init__(self, budget: Optional[int] = None):
+        self.budget = budget
+        self.stack: List[_Frame] = []
+        self.phases: Dict[str, Dict[str, int]] = {}
+        self.order: List[str] = []
+        self.run_peak = 0
+        self._lock = threading.Lock()
+        self._failed = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+
+    def _sample(self) -> int:
+        """Aktuell nivå; toppen sedan förra avläsningen förs till öppen fas."""
+        cur, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        if self.stack:
+            top = self.stack[-1]
+            top.peak = max(top.peak, peak)
+        self.run_peak = max(self.run_peak, peak)
+        return cur
+
+    def enter(self, name: str) -> int:
+        with self._lock:
+            cur = self._sample()
+            self.stack.append(_Frame(name, cur))
+            return cur
+
+    def exit(self, name: str) -> Dict[str, int]:
+        with self._lock:
+            cur = self._sample()
+            fr = self.stack.pop() if self.stack else _Frame(name, cur)
+            if self.stack:
+                parent = self.stack[-1]
+                parent.peak = max(parent.peak, fr.peak)
+            st = self.phases.get(fr.name)
+            if st is None:
+                st = self.phases[fr.name] = {"calls": 0, "peak": 0, "growth": 0, "retained": 0}
+                self.order.append(fr.name)
+            st["calls"] += 1
+            st["peak"] = max(st["peak"], fr.peak)
+            st["growth"] = max(st["growth"], fr.peak - fr.start)
+            st["retained"] += cur - fr.start
+            return {"mem_start": fr.start, "mem_peak": fr.peak, "mem_end": cur}
+
+    def over(self, peak: int) -> bool:
+        return bool(self.budget) and peak > self.budget and not self._failed
+
+    # ---------- rapport ----------
+
+    def table(self) -> List[str]:
+        w = max([len(n) for n in self.order] + [4])
+        lines = [f"  {'fas':<{w}}  {'anrop':>5}  {'peak':>10}  {'+peak':>10}  {'kvar':>10}"]
+        for n in self.order:
+            st = self.phases[n]
+            lines.append(f"  {n:<{w}}  {st['calls']:>5}  {fmt_size(st['peak']):>10}  "
+                         f"{fmt_size(st['growth']):>10}  {fmt_size(st['retained']):>10}")
+        return lines
+
+    def summary(self) -> List[str]:
+        cur = self._sample() if tracemalloc.is_tracing() else 0
+        lines = [f"ℹ️ Minne per fas (tracemalloc), topp totalt {fmt_size(self.run_peak)}, "
+                 f"nu {fmt_size(cur)}, maxRSS {fmt_size(max_rss())}"
+                 + (f", budget {fmt_size(self.budget)}" if self.budget else "")]
+        return lines + self.table()
+
+    def report(self, out=None):
+        out = out or sys.stdout
+        for line in self.summary():
+            print(line, file=out)
+
+    def over_at_exit(self) -> bool:
+        """Toppen för hela körningen (även utanför faser) över budget?"""
+        if tracemalloc.is_tracing():
+            self._sample()
+        return self.over(self.run_peak)
+
+    def fail(self, phase: str, peak: int):
+        """Skriv fördelningen till stderr. Anroparen avslutar processen (MEMORY_EXIT)."""
+        self._failed = True
+        out = sys.stderr
+        print(f"❌ Minnesbudget överskriden i fasen '{phase}': {fmt_size(peak)} > {fmt_size(self.budget)}", file=out)
+        if self.stack:
+            print("   Öppna faser: " + " > ".join(f"{f.name} ({fmt_size(f.peak)})" for f in self.stack), file=out)
+        for line in self.table():
+            print("  " + line, file=out)
+        snap = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        print("   Största allokeringsställen just nu:", file=out)
+        for stat in snap.statistics("lineno")[:TOP_SITES]:
+            fr = stat.traceback[0]
+            print(f"     {fmt_size(stat.size):>10}  {os.path.basename(fr.filename)}:{fr.lineno}", file=out)
+        out.flush()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bank_merge.py – slå ihop N banker till en, med dedupe på innehållshash.
+
+  python3 generators/banks_tool.py merge public/banks/matematik.json public/banks/matematik.ak3.json \\
+      --out public/banks/matematik.merged.json
+
+Posterna strömmas: varje indatabank läses i block med bank_stream.iter_bank_stream
+(.ndjson rad för rad) och en post avkodas i taget, så varken filtexten eller hela
+banken ligger i minnet. Indata läses en fil åt gången: ett pass för meta (subject,
+grade, hints – de kan stå efter posterna) och ett per kind. Minnet växer bara med
+en hash och ett id per unik post, plus indatas hints-tabeller.
+Utdata skrivs post för post i samma format som write_json (indrag 2), först alla
+items, sedan alla passager. Till sist indexeras utdata (write_offsets), som läser
+den färdiga filen.
+
+  • Dubbletter: samma innehållssignatur (bank_ids.content_sig) som en tidigare
+    post → hoppas över. Första förekomsten (i argumentordning) vinner.
+  • Id-krockar: annat innehåll men redan använt id → nytt id ur innehållshashen
+    (ma-017 → ma-h3f9a2c1b, samma som --id-scheme hash), alltså samma
+    resultat vid varje körning.
+    Passagefrågor får nya id:n (<passage-id>-q<n>) om passagen döps om.
+  • Rapport: <out>.merge.json med antal per indatafil, omdöpningar och dubbletter.
+
+Indata kan vara single-subject, legacy (svenska.json/matematik.json) eller .ndjson.
+Delade tips (hintRef + "hints"-tabell) skrivs ut som vanliga hint/explain.
+"""
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import bank_codec
+from bank_ids import content_hash, content_sig, hash_id, id_prefix
+from bank_io import HINTS_KEY, expand_hint_ref, sidecar_path
+from bank_ndjson import is_ndjson, iter_ndjson, read_header
+from bank_offsets import write_offsets
+from bank_stream import SECTION, iter_bank_stream
+
+MERGE_SUFFIX = ".merge.json"
+MERGE_VERSION = 1
+
+def merge_report_path(out_path: str) -> str:
+    return sidecar_path(out_path, MERGE_SUFFIX)
+
+# ----------------- indata -----------------
+
+def _stream_meta(path: str) -> Dict[str, Any]:
+    """Toppnycklar utom items/passages (legacy: sektionens namn som "section")."""
+    meta: Dict[str, Any] = {}
+    for _, kind, val in iter_bank_stream(path):
+        if kind != "meta":
+            continue
+        key, v = val
+        if v is SECTION:
+            meta.setdefault("section", key)
+        else:
+            meta.setdefault(key, v)
+    return meta
+
+class BankInput:
+    """En indatabank: meta vid start, poster som ström (en kind åt gången)."""
+    def __init__(self, path: str):
+        self.path = path
+        self.ndjson = is_ndjson(path)
+        if self.ndjson:
+            head = read_header(path)
+            self.meta = dict(head.get("meta") or {})
+            if head.get("section"):
+                self.meta.setdefault("section", head["section"])
+        else:
+            self.meta = _stream_meta(path)
+        self.hints = self.meta.pop(HINTS_KEY, None) or {}
+
+    @property
+    def subject(self) -> str:
+        return str(self.meta.get("subject") or self.meta.get("section") or "")
+
+    @property
+    def grade(self) -> Any:
+        return self.meta.get("grade")
+
+    def records(self, kind: str) -> Iterator[Dict[str, Any]]:
+        if self.ndjson:
+            recs = iter_ndjson(self.path)
+        else:
+            recs = ((k, v) for _, k, v in iter_bank_stream(self.path))
+        for k, rec in recs:
+            if k == kind:
+                yield expand_hint_ref(rec, self.hints)[0]
+
+# ----------------- sammanslagning -----------------
+
+def _indent(text: str, pad: str) -> str:
+    return pad + text.replace("\n", "\n" + pad)
+
+class _ArrayWriter:
+    """Skriver en JSON-array element för element, med samma indrag som indent=2."""
+    def __init__(self, f, key: str, last: bool):
+        self.f, self.key, self.last, self.n = f, key, last, 0
+
+    def __enter__(self):
+        self.f.write(f'  "{self.key}": [')
+        return self
+
+    def add(self, rec: Dict[str, Any]):
+        self.f.write(("," if self.n else "") + "\n" + _indent(bank_codec.dumps(rec, pretty=True), "    "))
+        self.n += 1
+
+    def __exit__(self, *exc):
+        self.f.write(("\n  ]" if self.n else "]") + ("\n" if self.last else ",\n"))
+
+def merge_banks(paths: List[str], out_path: str, subject: str = None, grade: Any = None,
+                log: Callable[[str], None] = print) -> Dict[str, Any]:
+    """
+    Slå ihop banker i paths (i ordning) till out_path. Returnerar rapporten
+    (som också skrivs till <out>.merge.json).
+    """
+    inputs = [BankInput(p) for p in paths]
+    subjects = sorted({b.subject for b in inputs if b.subject})
+    if not subject:
+        if len(subjects) > 1:
+            raise ValueError(f"indata har olika ämnen ({', '.join(subjects)}) – ange --subject")
+        subject = subjects[0] if subjects else "svenska"
+    if grade is None:
+        grades = [b.grade for b in inputs if b.grade is not None]
+        grade = grades[0] if grades else None
+        if len(set(map(str, grades))) > 1:
+            log(f"⚠️ Olika årskurser i indata ({', '.join(sorted(set(map(str, grades))))}) – använder {grade}")
+
+    seen: Dict[bytes, str] = {}        # innehållshash -> id i utdata
+    used: set = set()                  # id:n i utdata
+    stats = [{"path": b.path, "subject": b.subject, "grade": b.grade,
+              "items": 0, "passages": 0, "kept": 0, "duplicates": 0, "renamed": 0} for b in inputs]
+    renames: List[Dict[str, str]] = []
+    duplicates: List[Dict[str, str]] = []
+
+    def take(i: int, kind: str, rec: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        st = stats[i]
+        st[kind + "s"] += 1
+        h = content_hash(content_sig(rec, kind))
+        key = bytes.fromhex(h)
+        rid = str(rec.get("id") or "")
+        if key in seen:
+            st["duplicates"] += 1
+            duplicates.append({"input": inputs[i].path, "id": rid, "keptAs": seen[key]})
+            return None
+        if not rid or rid in used:
+            new = hash_id(id_prefix(rec, (rid + "-") if rid else subject[:2] + "-"), h, used)
+            if rid:
+                st["renamed"] += 1
+                renames.append({"input": inputs[i].path, "from": rid, "to": new})
+            rec["id"] = rid = new
+            if kind == "passage":
+                for n, q in enumerate(rec.get("questions", []) or [], start=1):
+                    q["id"] = f"{rid}-q{n}"
+        used.add(rid)
+        seen[key] = rid
+        st["kept"] += 1
+        return rec
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    tmp = out_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("{\n" + f'  "subject": {bank_codec.dumps(subject)},\n'
+                + (f'  "grade": {bank_codec.dumps(grade)},\n' if grade is not None else ""))
+        for key, kind, last in (("items", "item", False), ("passages", "passage", True)):
+            with _ArrayWriter(f, key, last) as w:
+                for i, b in enumerate(inputs):
+                    for rec in b.records(kind):
+                        rec = take(i, kind, rec)
+                        if rec is not None:
+                            w.add(rec)
+        f.write("}")
+    os.replace(tmp, out_path)
+    write_offsets(out_path)
+
+    report = {
+        "version": MERGE_VERSION,
+        "out": out_path,
+        "subject": subject,
+        "grade": grade,
+        "inputs": stats,
+        "totals": {k: sum(s[k] for s in stats) for k in ("items", "passages", "kept", "duplicates", "renamed")},
+        "renames": renames,
+        "duplicates": duplicates,
+    }
+    rp = merge_report_path(out_path)
+    bank_codec.dump_file(rp, report, pretty=True)
+    return report
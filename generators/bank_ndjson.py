@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bank_ndjson.py – append-bart radformat (JSON Lines) för banker.
+
+I vanligt JSON-format måste hela banken läsas och skrivas om för att lägga
+till några frågor. I NDJSON-formatet (filändelse .ndjson) är varje post en rad:
+
+  {"format": "bank-ndjson", "version": 1, "section": "svenska", "fields": ["items", "passages"], "meta": {...}}
+  {"item": {...}}
+  {"passage": {...}}
+  {"checkpoint": {"items": 120, "passages": 6, "next": {"item": 121, "passage": 7}}}
+
+Första raden är ett huvud (section = legacy-nyckel eller null för
+single-subject-banker, fields = listor som fanns, meta = övriga toppnycklar).
+Efter varje skrivning läggs en checkpoint-rad till med antal och nästa lediga
+id, så att en generator i append-läge bara behöver läsa filens slut och skriva
+de nya raderna: O(nya poster).
+
+Med --id-scheme hash behövs också de skrivna posternas innehållshashar (för
+dubblett- och kollisionskontroll). De ligger i sidofilen <bank>.ndjson.hashes.json
+({id: hash} per kind) som gäller så länge filens storlek och mtime stämmer.
+Saknas den eller är den inaktuell (filen handredigerad) räknas den om med ett
+pass över filen; append_ndjson håller en aktuell sidofil i fas med nya rader.
+
+Appen läser vanligt JSON – konvertera innan publicering:
+  python3 generators/banks_tool.py convert build/svenska.ndjson public/banks/svenska.json
+  python3 generators/banks_tool.py convert public/banks/svenska.json build/svenska.ndjson
+"""
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import bank_codec
+from bank_ids import record_hash
+from bank_io import sidecar_path
+from bank_trace import span
+
+NDJSON_VERSION = 1
+NDJSON_FORMAT = "bank-ndjson"
+NDJSON_SUFFIX = ".ndjson"
+LEGACY_SECTIONS = ("svenska", "matematik")
+TAIL_BLOCK = 1 << 16
+HASHES_SUFFIX = ".hashes.json"
+HASHES_VERSION = 1
+
+def is_ndjson(path) -> bool:
+    return str(path).endswith(NDJSON_SUFFIX)
+
+def _line(obj: Dict[str, Any]) -> str:
+    return bank_codec.dumps(obj, pretty=False) + "\n"
+
+def _split_document(data: Dict[str, Any]) -> Tuple[Optional[str], Dict[str, Any], Dict[str, Any]]:
+    """-> (section, meta, sektion med items/passages)"""
+    if "items" not in data and "passages" not in data:
+        for k in LEGACY_SECTIONS:
+            if isinstance(data.get(k), dict):
+                meta = {mk: mv for mk, mv in data.items() if mk != k}
+                return k, meta, data[k]
+    meta = {k: v for k, v in data.items() if k not in ("items", "passages")}
+    return None, meta, data
+
+def write_ndjson(path: str, data: Dict[str, Any], next_ids: Dict[str, int] = None):
+    """Skriv hela banken i radformat (atomiskt)."""
+    section, meta, sec = _split_document(data)
+    items = sec.get("items", []) or []
+    passages = sec.get("passages", []) or []
+    fields = [k for k in ("items", "passages") if k in sec]
+    tmp = path + ".tmp"
+    with span("write", file=os.path.basename(path), format="ndjson") as sp, open(tmp, "w", encoding="utf-8") as f:
+        sp.count = len(items) + len(passages)
+        f.write(_line({"format": NDJSON_FORMAT, "version": NDJSON_VERSION, "section": section,
+                       "fields": fields, "meta": meta}))
+        for it in items:
+            f.write(_line({"item": it}))
+        for pa in passages:
+            f.write(_line({"passage": pa}))
+        f.write(_line({"checkpoint": {"items": len(items), "passages": len(passages), "next": next_ids or {}}}))
+    os.replace(tmp, path)
+
+def read_header(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        head = bank_codec.loads(f.readline() or "{}")
+    if head.get("format") != NDJSON_FORMAT:
+        raise ValueError(f"{path}: inte en {NDJSON_FORMAT}-fil")
+    return head
+
+def iter_ndjson(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Ger (kind, post) för varje item-/passage-rad."""
+    read_header(path)
+    with open(path, "r", encoding="utf-8") as f:
+        f.readline()
+        for ln, line in enumerate(f, start=2):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = bank_codec.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{ln}: ogiltig rad ({e})")
+            if "item" in rec:
+                yield "item", rec["item"]
+            elif "passage" in rec:
+                yield "passage", rec["passage"]
+
+def read_ndjson(path: str) -> Dict[str, Any]:
+    """Läs radformatet och bygg upp ett vanligt bankdokument."""
+    head = read_header(path)
+    items: List[Dict[str, Any]] = []
+    passages: List[Dict[str, Any]] = []
+    for kind, rec in iter_ndjson(path):
+        (items if kind == "item" else passages).append(rec)
+    section = head.get("section")
+    fields = head.get("fields") or ["items", "passages"]
+    sec: Dict[str, Any] = {"items": items}
+    if passages or "passages" in fields:
+        sec["passages"] = passages
+    data = dict(head.get("meta") or {})
+    if section:
+        data[section] = sec
+    else:
+        data.update(sec)
+    return data
+
+def last_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    """Läs filen bakifrån tills sista checkpoint-raden hittas (None om ingen finns)."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        buf = b""
+        while pos > 0:
+            step = min(TAIL_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+            lines = buf.split(b"\n")
+            # första raden kan vara avklippt om vi inte är vid filstart
+            for raw in reversed(lines if pos == 0 else lines[1:]):
+                if raw.startswith(b'{"checkpoint"'):
+                    return bank_codec.loads(raw)["checkpoint"]
+            buf = lines[0] if pos > 0 else b""
+    return None
+
+# ----------------- innehållshashar -----------------
+
+def hashes_path(path: str) -> str:
+    return sidecar_path(path, HASHES_SUFFIX)
+
+def read_hashes(path: str) -> Optional[Dict[str, Dict[str, str]]]:
+    """{"items": {id: hash}, "passages": {...}} om sidofilen hör till filen, annars None."""
+    try:
+        doc = bank_codec.load_file(hashes_path(path))
+        st = os.stat(path)
+    except (OSError, ValueError):
+        return None
+    if doc.get("version") != HASHES_VERSION or doc.get("bytes") != st.st_size \
+            or doc.get("mtime_ns") != st.st_mtime_ns:
+        return None
+    return {"items": doc.get("items") or {}, "passages": doc.get("passages") or {}}
+
+def write_hashes(path: str, hashes: Dict[str, Dict[str, str]]):
+    st = os.stat(path)
+    bank_codec.dump_file(hashes_path(path), {
+        "version": HASHES_VERSION, "bytes": st.st_size, "mtime_ns": st.st_mtime_ns,
+        "items": hashes.get("items") or {}, "passages": hashes.get("passages") or {},
+    }, pretty=False)
+
+def content_hashes(path: str) -> Dict[str, Dict[str, str]]:
+    """Innehållshashar för filens poster: ur sidofilen, annars ett pass över filen (och sidofilen skrivs)."""
+    hashes = read_hashes(path)
+    if hashes is not None:
+        return hashes
+    with span("hashes", file=os.path.basename(path)) as sp:
+        hashes = {"items": {}, "passages": {}}
+        for kind, rec in iter_ndjson(path):
+            if rec.get("id"):
+                hashes[kind + "s"].setdefault(str(rec["id"]), record_hash(rec, kind))
+        sp.count = len(hashes["items"]) + len(hashes["passages"])
+    write_hashes(path, hashes)
+    return hashes
+
+def append_ndjson(path: str, items: Iterable[Dict[str, Any]] = (), passages: Iterable[Dict[str, Any]] = (),
+                  next_ids: Dict[str, int] = None) -> Dict[str, Any]:
+    """
+    Lägg till poster i slutet av filen utan att läsa eller skriva om befintliga
+    rader. Returnerar den nya checkpointen.
+    """
+    read_header(path)
+    hashes = read_hashes(path)
+    prev = last_checkpoint(path)
+    if prev is None:
+        # handredigerad fil utan checkpoint: räkna en gång
+        counts = {"items": 0, "passages": 0}
+        for kind, _ in iter_ndjson(path):
+            counts[kind + "s"] += 1
+        prev = {**counts, "next": {}}
+    items, passages = list(items), list(passages)
+    cp = {
+        "items": prev.get("items", 0) + len(items),
+        "passages": prev.get("passages", 0) + len(passages),
+        "next": {**(prev.get("next") or {}), **(next_ids or {})},
+    }
+    with span("write", file=os.path.basename(path), format="ndjson", append=True) as sp, open(path, "a", encoding="utf-8") as f:
+        sp.count = len(items) + len(passages)
+        for it in items:
+            f.write(_line({"item": it}))
+        for pa in passages:
+            f.write(_line({"passage": pa}))
+        f.write(_line({"checkpoint": cp}))
+    if hashes is not None:
+        for kind, recs in (("item", items), ("passage", passages)):
+            for rec in recs:
+                if rec.get("id"):
+                    hashes[kind + "s"].setdefault(str(rec["id"]), record_hash(rec, kind))
+        write_hashes(path, hashes)
+    return cp
+
+def convert(src: str, dst: str, compact: bool = False) -> Tuple[int, int]:
+    """JSON -> NDJSON eller NDJSON -> JSON beroende på filändelser. Returnerar (items, passages)."""
+    if is_ndjson(src) == is_ndjson(dst):
+        raise ValueError("en av filerna ska vara .ndjson och den andra .json")
+    if is_ndjson(src):
+        data = read_ndjson(src)
+        bank_codec.dump_file(dst, data, pretty=not compact)
+    else:
+        data = bank_codec.load_file(src)
+        write_ndjson(dst, data)
+    _, _, sec = _split_document(data)
+    return len(sec.get("items", []) or []), len(sec.get("passages", []) or [])
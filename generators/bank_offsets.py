@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bank_offsets.py – byte-offsetindex per bank (<bank>.offsets.json).
+
+Granskning, stickprov och deltabyggen behöver ofta bara en enda fråga eller
+passage, men måste annars tolka hela banken. Offsetindexet mappar varje id
+till ett byteintervall [start, slut) i bankfilen:
+
+  {"items": {"ma-001": [123, 456]}, "passages": {...}, "questions": {"q-1": [s, e, "p-1"]}}
+
+BankReader minnesmappar banken och avkodar bara det intervall som efterfrågas,
+med en begränsad LRU-cache av avkodade poster. Indexet gäller bara om bankens
+storlek och mtime_ns stämmer (offsets_fresh, O(1) vid varje öppning); annars
+byggs det om, och get() kontrollerar att den avkodade posten har det
+efterfrågade id:t. Explicit ombyggnad (banks_tool index) jämför även sha1.
+
+  with BankReader("public/banks/matematik.ak3.json") as r:
+      it = r.get("ma-017")
+
+Kör fristående:
+  python3 generators/bank_offsets.py public/banks/svenska.ak3.json
+  python3 generators/bank_offsets.py public/banks/svenska.ak3.json --get sv-12
+"""
+import argparse, hashlib, json, mmap, os, sys
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import bank_codec
+from bank_io import sidecar_path
+from bank_trace import add_trace_arg, span, start_trace
+
+OFFSETS_VERSION = 1
+OFFSETS_SUFFIX = ".offsets.json"
+
+_WS = " \t\r\n"
+_decoder = json.JSONDecoder()
+
+def offsets_path(bank_path: str) -> str:
+    return sidecar_path(bank_path, OFFSETS_SUFFIX)
+
+# ----------------- positionsläsare -----------------
+# Bankfilen avkodas som latin-1: då är teckenindex == byteindex, och alla
+# JSON-strukturtecken är ASCII, så UTF-8-tecken inuti strängar stör inte.
+
+def _skip_ws(s: str, i: int) -> int:
+    while i < len(s) and s[i] in _WS:
+        i += 1
+    return i
+
+def _expect(s: str, i: int, ch: str) -> int:
+    i = _skip_ws(s, i)
+    if i >= len(s) or s[i] != ch:
+        raise ValueError(f"förväntade '{ch}' vid byte {i}")
+    return i + 1
+
+def _skip_value(s: str, i: int) -> Tuple[Any, int]:
+    return _decoder.raw_decode(s, _skip_ws(s, i))
+
+def _walk_object(s: str, i: int, on_key) -> int:
+    """Gå igenom objektets nycklar; on_key(nyckel, värdestart) returnerar värdets slut."""
+    i = _expect(s, i, "{")
+    i = _skip_ws(s, i)
+    if s[i] == "}":
+        return i + 1
+    while True:
+        key, i = _decoder.raw_decode(s, _skip_ws(s, i))
+        i = _expect(s, i, ":")
+        i = on_key(key, _skip_ws(s, i))
+        i = _skip_ws(s, i)
+        if s[i] == "}":
+            return i + 1
+        i = _expect(s, i, ",")
+
+def _walk_array(s: str, i: int, on_elem) -> int:
+    """on_elem(elementstart) returnerar elementets slut."""
+    i = _expect(s, i, "[")
+    i = _skip_ws(s, i)
+    if s[i] == "]":
+        return i + 1
+    while True:
+        i = _skip_ws(s, on_elem(_skip_ws(s, i)))
+        if s[i] == "]":
+            return i + 1
+        i = _expect(s, i, ",")
+
+def _id_of(raw: bytes, start: int, end: int) -> Optional[str]:
+    try:
+        rec = bank_codec.loads(raw[start:end])
+    except Exception:
+        return None
+    return rec.get("id") if isinstance(rec, dict) else None
+
+def compute_offsets(raw: bytes) -> Dict[str, Any]:
+    """Bygg offsetindexet direkt ur bankfilens bytes (single-subject eller legacy)."""
+    s = raw.decode("latin-1")
+    items: Dict[str, List[int]] = {}
+    passages: Dict[str, List[int]] = {}
+    questions: Dict[str, List[Any]] = {}
+
+    def item(start):
+        _, end = _skip_value(s, start)
+        iid = _id_of(raw, start, end)
+        if iid:
+            items[iid] = [start, end]
+        return end
+
+    def passage(start):
+        qspans = []
+
+        def question(qs):
+            _, qe = _skip_value(s, qs)
+            qspans.append((qs, qe))
+            return qe
+
+        def pkey(key, v):
+            if key == "questions" and s[v] == "[":
+                return _walk_array(s, v, question)
+            return _skip_value(s, v)[1]
+
+        if s[start] != "{":
+            return _skip_value(s, start)[1]
+        end = _walk_object(s, start, pkey)
+        pid = _id_of(raw, start, end)
+        if pid:
+            passages[pid] = [start, end]
+        for qs, qe in qspans:
+            qid = _id_of(raw, qs, qe)
+            if qid:
+                questions[qid] = [qs, qe, pid]
+        return end
+
+    def section(key, v):
+        if key == "items" and s[v] == "[":
+            return _walk_array(s, v, item)
+        if key == "passages" and s[v] == "[":
+            return _walk_array(s, v, passage)
+        if key in ("svenska", "matematik") and s[v] == "{":
+            return _walk_object(s, v, section)  # legacy-bank
+        return _skip_value(s, v)[1]
+
+    _walk_object(s, 0, section)
+    return {
+        "version": OFFSETS_VERSION,
+        "sha1": hashlib.sha1(raw).hexdigest(),
+        "bytes": len(raw),
+        "items": items,
+        "passages": passages,
+        "questions": questions,
+    }
+
+def scan_bank(raw: bytes) -> Tuple[Dict[str, Any], List[Tuple[str, int, int]]]:
+    """
+    -> (meta, spans). meta = toppnycklar utom items/passages (legacy: sektionens
+    namn som "section"), spans = (kind, start, slut) för varje item och passage i
+    filordning – även poster utan eller med dubblerat id.
+    """
+    s = raw.decode("latin-1")
+    meta: Dict[str, Any] = {}
+    spans: List[Tuple[str, int, int]] = []
+
+    def rec(kind):
+        def on_elem(start):
+            _, end = _skip_value(s, start)
+            spans.append((kind, start, end))
+            return end
+        return on_elem
+
+    def section(key, v):
+        if key == "items" and s[v] == "[":
+            return _walk_array(s, v, rec("item"))
+        if key == "passages" and s[v] == "[":
+            return _walk_array(s, v, rec("passage"))
+        if key in ("svenska", "matematik") and s[v] == "{":
+            meta.setdefault("section", key)
+            return _walk_object(s, v, section)  # legacy-bank
+        val, end = _skip_value(s, v)
+        if key not in meta:
+            # latin-1 → utf-8 för eventuella icke-ASCII-tecken i strängar
+            meta[key] = bank_codec.loads(raw[v:end]) if isinstance(val, (str, dict, list)) else val
+        return end
+
+    _walk_object(s, 0, section)
+    return meta, spans
+
+def read_offsets(bank_path: str) -> Dict[str, Any]:
+    p = offsets_path(bank_path)
+    if not os.path.isfile(p):
+        return {}
+    try:
+        with open(p, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def offsets_fresh(bank_path: str, idx: Dict[str, Any], raw=None, full: bool = False) -> bool:
+    """
+    Hör indexet till filens nuvarande innehåll? Kräver samma version, storlek
+    och mtime_ns. Med full=True jämförs även sha1 (raw = filens bytes eller
+    mmap, annars läses filen).
+    """
+    st = os.stat(bank_path)
+    if idx.get("version") != OFFSETS_VERSION or idx.get("bytes") != st.st_size \
+            or idx.get("mtime_ns") != st.st_mtime_ns:
+        return False
+    if not full:
+        return True
+    if raw is None:
+        with open(bank_path, "rb") as f:
+            raw = f.read()
+    return idx.get("sha1") == hashlib.sha1(raw).hexdigest()
+
+def write_offsets(bank_path: str) -> str:
+    """Skriv <bank>.offsets.json (kompakt JSON) bredvid banken."""
+    with span("read", file=os.path.basename(bank_path)) as sp:
+        with open(bank_path, "rb") as f:
+            raw = f.read()
+            mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+        sp.count = len(raw)
+    with span("offsets", file=os.path.basename(bank_path)) as sp:
+        idx = compute_offsets(raw)
+        idx["mtime_ns"] = mtime_ns
+        sp.count = len(idx["items"]) + len(idx["passages"])
+        out = offsets_path(bank_path)
+        bank_codec.dump_file(out, idx, pretty=False)
+    return out
+
+# ----------------- läsare -----------------
+
+class BankReader:
+    """
+    Slumpmässig åtkomst till enskilda poster via offsetindexet.
+    Saknas indexet, eller hör det inte till filens innehåll (offsets_fresh),
+    byggs det om i minnet (och skrivs till disk om write=True).
+    """
+    def __init__(self, bank_path: str, cache_size: int = 256, write: bool = False):
+        self.path = bank_path
+        self.cache_size = max(0, int(cache_size))
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._f = open(bank_path, "rb")
+        size = os.fstat(self._f.fileno()).st_size
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.write = write
+        idx = read_offsets(bank_path)
+        if not offsets_fresh(bank_path, idx):
+            idx = self._rebuild()
+        self.index = idx
+        self.hits = self.misses = 0
+
+    def _rebuild(self) -> Dict[str, Any]:
+        if self.write:
+            write_offsets(self.path)
+            return read_offsets(self.path)
+        return compute_offsets(bytes(self._mm))
+
+    def _span(self, rid: str) -> Optional[List[Any]]:
+        for kind in ("items", "passages", "questions"):
+            span = self.index.get(kind, {}).get(rid)
+            if span:
+                return span
+        return None
+
+    def __contains__(self, rid: str) -> bool:
+        return self._span(rid) is not None
+
+    def ids(self, kind: str = "items") -> List[str]:
+        return list(self.index.get(kind, {}))
+
+    def raw(self, rid: str) -> Optional[bytes]:
+        span = self._span(rid)
+        return self._mm[span[0]:span[1]] if span else None
+
+    def get(self, rid: str) -> Optional[Dict[str, Any]]:
+        rec = self._cache.get(rid)
+        if rec is not None:
+            self._cache.move_to_end(rid)
+            self.hits += 1
+            return rec
+        if self._span(rid) is None:
+            return None
+        rec = self._decode(rid)
+        if rec is None or rec.get("id") != rid:
+            # indexet pekar fel (banken skriven om efter kontrollen) – bygg om en gång
+            self.index = self._rebuild()
+            self._cache.clear()
+            rec = self._decode(rid)
+            if rec is None or rec.get("id") != rid:
+                return None
+        self.misses += 1
+        if self.cache_size:
+            self._cache[rid] = rec
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return rec
+
+    def _decode(self, rid: str) -> Optional[Dict[str, Any]]:
+        data = self.raw(rid)
+        if data is None:
+            return None
+        try:
+            rec = bank_codec.loads(data)
+        except ValueError:
+            return None
+        return rec if isinstance(rec, dict) else None
+
+    def passage_of(self, qid: str) -> Optional[str]:
+        span = self.index.get("questions", {}).get(qid)
+        return span[2] if span else None
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def main():
+    ap = argparse.ArgumentParser(description="Skriv <bank>.offsets.json eller läs enskilda poster via id")
+    ap.add_argument("banks", nargs="+", help="Bankfiler (.json)")
+    ap.add_argument("--get", action="append", default=[], help="Skriv ut posten med detta id (kan upprepas)")
+    add_trace_arg(ap)
+    args = ap.parse_args()
+    start_trace(args)
+    for p in args.banks:
+        if not os.path.isfile(p):
+            print("⚠️ Hittar inte fil:", p)
+            sys.exit(1)
+        if not args.get:
+            idx_path = write_offsets(p)
+            idx = read_offsets(p)
+            print(f"✅ Skrev {idx_path}: {len(idx['items'])} items, {len(idx['passages'])} passager, {len(idx['questions'])} passagefrågor")
+            continue
+        with span("get", file=os.path.basename(p)) as sp, BankReader(p) as r:
+            sp.count = len(args.get)
+            for rid in args.get:
+                rec = r.get(rid)
+                if rec is None:
+                    print(f"⚠️ {rid}: finns inte i {os.path.basename(p)}")
+                else:
+                    print(json.dumps(rec, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bank_plan.py – exakta kvoter per område (--plan) för svenska-generatorerna.
+
+Som make_matematik_bank --plan, men för svenska:
+
+  --plan "stavning=40,grammatik=40,ordförståelse=30,context=30,dnd-ordklasser=5,dnd-prepositioner=3,passages=6"
+
+  • MC-områden: stavning, grammatik, ordförståelse, context (context bara i create_bank)
+  • DnD-typer:  dnd-ordklasser (substantiv/verb/adjektiv), dnd-prepositioner
+  • passages:   antal läsförståelsepassager
+
+Utan --plan delas --items jämnt på MC-områdena, --dnd 60/40 på DnD-typerna
+(samma andel som slumpvalet i gen_dnd) och --passages används som det är.
+Planens antal är exakta: nämns något MC-område i planen får övriga MC-områden
+0 och --items ignoreras (samma för DnD-typerna och --dnd). Saknas en grupp helt
+i planen används standardfördelningen ovan för den gruppen.
+
+QuotaScheduler växlar mellan områdena så att alla kvoter fylls i samma takt
+(lägsta andel fylld väljs först) och ett fullt område väljs aldrig igen – inga
+försök går till spillo på områden som redan är klara. Avvisas ett försök
+(unikhetsvakten) står området kvar och väljs igen; efter streak avslag i rad
+räknas området som uttömt och hoppas över.
+"""
+from typing import Dict, List, Optional, Sequence
+
+SV_MC_AREAS = ("stavning", "grammatik", "ordförståelse", "context")
+SV_DND_AREAS = ("dnd-ordklasser", "dnd-prepositioner")
+SV_PLAN_AREAS = SV_MC_AREAS + SV_DND_AREAS + ("passages",)
+DND_SPLIT = {"dnd-ordklasser": 0.6, "dnd-prepositioner": 0.4}
+# Planområde -> frågornas "area" (för samplingsindexet)
+PLAN_ITEM_AREA = {"context": "grammatik", "dnd-ordklasser": "grammatik", "dnd-prepositioner": "grammatik"}
+
+def split_exact(total: int, weights: Dict[str, float]) -> Dict[str, int]:
+    """Fördela total heltal enligt vikter (största rest), summan blir exakt total."""
+    total = max(0, int(total))
+    wsum = sum(weights.values())
+    if not weights or wsum <= 0:
+        return {k: 0 for k in weights}
+    raw = {k: total * w / wsum for k, w in weights.items()}
+    out = {k: int(v) for k, v in raw.items()}
+    rest = total - sum(out.values())
+    for k in sorted(raw, key=lambda k: (out[k] - raw[k], list(raw).index(k)))[:rest]:
+        out[k] += 1
+    return out
+
+def parse_sv_plan(plan: str, items: int, dnd: int, passages: int,
+                  areas: Sequence[str] = SV_PLAN_AREAS) -> Dict[str, int]:
+    """-> {område: antal} för alla områden i areas (ordning som areas). ValueError vid fel."""
+    mc = [a for a in areas if a in SV_MC_AREAS]
+    dn = [a for a in areas if a in SV_DND_AREAS]
+    given: Dict[str, int] = {}
+    for part in (plan or "").split(","):
+        if not part.strip():
+            continue
+        k, _, v = part.partition("=")
+        k = k.strip()
+        if k not in areas:
+            raise ValueError(f"okänt område i --plan: {k} (giltiga: {', '.join(areas)})")
+        try:
+            given[k] = max(0, int(v.strip()))
+        except ValueError:
+            raise ValueError(f"ogiltigt antal för {k} i --plan: {v.strip()!r}")
+
+    out: Dict[str, int] = {a: 0 for a in areas}
+    mc_given = {a: n for a, n in given.items() if a in mc}
+    out.update(mc_given if mc_given else split_exact(items, {a: 1.0 for a in mc}))
+    dnd_given = {a: n for a, n in given.items() if a in dn}
+    out.update(dnd_given if dnd_given else split_exact(dnd, {a: DND_SPLIT[a] for a in dn}))
+    if "passages" in out:
+        out["passages"] = given.get("passages", max(0, passages))
+    return out
+
+def plan_mix(quotas: Dict[str, int]) -> Dict[str, float]:
+    """Kvoter per frågeområde (area) för samplingsindexets "plan"-mix."""
+    mix: Dict[str, float] = {}
+    for a, n in quotas.items():
+        if a == "passages" or n <= 0:
+            continue
+        area = PLAN_ITEM_AREA.get(a, a)
+        mix[area] = mix.get(area, 0.0) + n
+    return mix
+
+class QuotaScheduler:
+    """
+    Nästa område = det med lägst andel fylld (done/kvot), lika → planens ordning.
+    O(antal områden) per val; antalet områden är litet.
+    """
+    def __init__(self, quotas: Dict[str, int], streak: int = None):
+        self.quotas = {a: n for a, n in quotas.items() if n > 0}
+        self.done = {a: 0 for a in self.quotas}
+        self.tries = {a: 0 for a in self.quotas}
+        self.streak = {a: 0 for a in self.quotas}
+        self.streak_limit = streak
+        self.exhausted: List[str] = []
+        self._open = list(self.quotas)
+
+    def next(self) -> Optional[str]:
+        best, best_r = None, 2.0
+        for a in self._open:
+            r = self.done[a] / self.quotas[a]
+            if r < best_r:
+                best, best_r = a, r
+        return best
+
+    def record(self, area: str, ok: bool = True):
+        self.tries[area] += 1
+        if ok:
+            self.done[area] += 1
+            self.streak[area] = 0
+            if self.done[area] >= self.quotas[area]:
+                self._open.remove(area)
+            return
+        self.streak[area] += 1
+        if self.streak_limit and self.streak[area] >= self.streak_limit:
+            self._open.remove(area)
+            self.exhausted.append(area)
+
+    @property
+    def finished(self) -> bool:
+        return not self._open
+
+    def shortfall(self) -> Dict[str, int]:
+        return {a: self.quotas[a] - self.done[a] for a in self.quotas if self.done[a] < self.quotas[a]}
+
+    def report(self, label: str):
+        """Skriv vilka kvoter som inte fylldes."""
+        short = self.shortfall()
+        if not short:
+            return
+        print(f"⚠️ {label}: {sum(short.values())} frågor saknas mot planen.")
+        for a in short:
+            why = "uttömt (inga nya unika)" if a in self.exhausted else "försöksbudgeten tog slut"
+            print(f"   • {a}: {self.done[a]}/{self.quotas[a]} efter {self.tries[a]} försök – {why}")
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bank_sampling.py – samplingsindex per bank (<bank>.sampling.json).
+
+drawWithoutReplacement/drawWeighted i src/lib/draw.js filtrerar och blandar
+hela frågelistan vid varje dragning. Samplingsindexet innehåller i stället:
+  • id-listor grupperade per område, typ och svårighet
+  • alias-tabeller (Vose) för viktade områdesblandningar, t.ex. parse_plan i
+    make_matematik_bank.py eller create_bank.py:s generatorsannolikheter
+
+Med alias-tabellen väljs ett område i O(1) och en fråga ur områdets id-lista
+i O(1), så en balanserad omgång på k frågor kostar O(k). Appen läser inte
+indexet ännu (sidorna drar med adaptiva vikter via drawWeighted); det är till
+för verktyg och klienter som vill dra direkt ur indexet.
+
+Kör fristående:
+  python3 generators/bank_sampling.py public/banks/matematik.ak3.json
+"""
+import argparse, hashlib, os, sys
+from typing import Any, Dict, List
+
+import bank_codec
+from bank_facets import iter_bank_records
+from bank_io import sidecar_path
+from bank_trace import add_trace_arg, span, start_trace
+
+SAMPLING_VERSION = 1
+SAMPLING_SUFFIX = ".sampling.json"
+
+def sampling_path(bank_path: str) -> str:
+    return sidecar_path(bank_path, SAMPLING_SUFFIX)
+
+def alias_table(weights: Dict[str, float]) -> Dict[str, Any]:
+    """
+    Vose alias-metod. Returnerar {keys, prob, alias} där prob[i] är sannolikheten
+    att behålla keys[i] och alias[i] är index att byta till annars.
+    Dragning: i = floor(rand*n); return keys[i] if rand2 < prob[i] else keys[alias[i]]
+    """
+    keys = [k for k in sorted(weights) if weights[k] > 0]
+    n = len(keys)
+    if n == 0:
+        return {"keys": [], "prob": [], "alias": []}
+    total = float(sum(weights[k] for k in keys))
+    scaled = [weights[k] * n / total for k in keys]
+    prob = [0.0] * n
+    alias = [0] * n
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large:
+        s, l = small.pop(), large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] = scaled[l] + scaled[s] - 1.0
+        (small if scaled[l] < 1.0 else large).append(l)
+    for i in large + small:
+        prob[i] = 1.0
+        alias[i] = i
+    return {"keys": keys, "prob": [round(p, 6) for p in prob], "alias": alias}
+
+def build_sampling_index(data: Dict[str, Any], mixes: Dict[str, Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Bygg samplingsindexet. mixes = {namn: {område: vikt}}; "observed" (faktisk
+    fördelning i banken) läggs alltid till. Områden utan frågor i banken tas bort
+    ur en blandning så att dragningen aldrig hamnar på en tom lista.
+    """
+    by_area: Dict[str, List[str]] = {}
+    by_type: Dict[str, List[str]] = {}
+    by_diff: Dict[str, List[str]] = {}
+    passages: List[str] = []
+    for kind, rec, _ in iter_bank_records(data):
+        rid = rec.get("id")
+        if not rid or kind == "question":
+            continue
+        if kind == "passage":
+            passages.append(rid)
+            continue
+        by_area.setdefault(rec.get("area") or "okänd", []).append(rid)
+        by_type.setdefault(rec.get("type") or "mc", []).append(rid)
+        by_diff.setdefault(rec.get("difficulty") or "np", []).append(rid)
+
+    all_mixes = {"observed": {a: float(len(ids)) for a, ids in by_area.items()}}
+    for name, mix in (mixes or {}).items():
+        all_mixes[name] = {a: float(w) for a, w in mix.items() if a in by_area}
+    return {
+        "version": SAMPLING_VERSION,
+        "byArea": {k: by_area[k] for k in sorted(by_area)},
+        "byType": {k: by_type[k] for k in sorted(by_type)},
+        "byDifficulty": {k: by_diff[k] for k in sorted(by_diff)},
+        "passages": passages,
+        "mixes": {name: {"weights": mix, **alias_table(mix)} for name, mix in all_mixes.items()},
+    }
+
+def write_sampling(bank_path: str, data: Dict[str, Any] = None, mixes: Dict[str, Dict[str, float]] = None) -> str:
+    """Skriv <bank>.sampling.json (kompakt JSON) bredvid banken."""
+    with span("read", file=os.path.basename(bank_path)) as sp:
+        with open(bank_path, "rb") as f:
+            raw = f.read()
+        sp.count = len(raw)
+        if data is None:
+            data = bank_codec.loads(raw)
+    with span("sampling", file=os.path.basename(bank_path)):
+        idx = build_sampling_index(data, mixes)
+        idx["sha1"] = hashlib.sha1(raw).hexdigest()
+        out = sampling_path(bank_path)
+        bank_codec.dump_file(out, idx, pretty=False)
+    return out
+
+def parse_mix(s: str) -> Dict[str, float]:
+    """'addition=2,division=1' -> {'addition': 2.0, 'division': 1.0}"""
+    out: Dict[str, float] = {}
+    for part in (s or "").split(","):
+        if not part.strip():
+            continue
+        k, v = part.split("=")
+        out[k.strip()] = float(v.strip())
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="Skriv <bank>.sampling.json (id-listor + alias-tabeller)")
+    ap.add_argument("banks", nargs="+", help="Bankfiler (.json)")
+    ap.add_argument("--mix", action="append", default=[], help="Namngiven viktning, t.ex. 'np=addition=2,division=1'")
+    add_trace_arg(ap)
+    args = ap.parse_args()
+    start_trace(args)
+    mixes = {}
+    for m in args.mix:
+        name, _, rest = m.partition("=")
+        mixes[name] = parse_mix(rest)
+    for p in args.banks:
+        if not os.path.isfile(p):
+            print("⚠️ Hittar inte fil:", p)
+            sys.exit(1)
+        print("✅ Skrev", write_sampling(p, mixes=mixes))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bank_stream.py – läs en bank post för post direkt från disk (konstant minne).
+
+read_json tolkar hela filen till ett enda objekt; för stora banker betyder det
+att både texten och alla poster ligger i minnet samtidigt. iter_bank_stream
+läser filen i block och avkodar en post (item eller passage med frågor) i
+taget, så minnet begränsas av blockstorleken plus den största posten:
+
+  for sec, kind, val in iter_bank_stream("public/banks/svenska.ak3.json"):
+      if kind == "item": ...                 # val = posten
+      elif kind == "passage": ...            # val = passagen (med questions)
+      elif kind == "meta": key, value = val  # övriga nycklar (subject, hints …)
+
+sec är None för single-subject-bankens nycklar och "svenska"/"matematik" för
+poster i en legacy-sektion. Sektionen själv anmäls som ("meta", (namn, SECTION))
+innan dess poster. items/passages som inte är listor ges som vanliga meta-värden.
+
+Används av verify_banks --stream.
+"""
+import json
+from typing import Any, Iterator, Optional, Tuple
+
+from bank_io import LEGACY_SECTIONS
+
+CHUNK = 1 << 20
+SECTION = object()  # markör: nyckeln är en legacy-sektion som strömmas
+
+_WS = " \t\r\n"
+_decoder = json.JSONDecoder()
+
+class _Reader:
+    """Textbuffert över filen; avkodade värden släpps när de lästs förbi."""
+    def __init__(self, f, chunk: int = CHUNK):
+        self.f, self.chunk = f, chunk
+        self.buf, self.pos, self.eof = "", 0, False
+
+    def _fill(self, need: int) -> bool:
+        if self.eof:
+            return False
+        if self.pos > len(self.buf) // 2:
+            self.buf, self.pos = self.buf[self.pos:], 0
+        data = self.f.read(max(self.chunk, need))
+        if not data:
+            self.eof = True
+            return False
+        self.buf += data
+        return True
+
+    def peek(self) -> str:
+        """Nästa tecken som inte är blanksteg ('' vid filslut)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill(self.chunk):
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, ch: str):
+        if self.peek() != ch:
+            raise ValueError(f"förväntade '{ch}' i bankfilen")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Avkoda nästa JSON-värde; läser mer tills värdet är komplett."""
+        self.peek()
+        need = self.chunk
+        while True:
+            try:
+                val, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill(need):
+                    need *= 2
+                    continue
+                raise
+            # ett tal kan fortsätta i nästa block
+            if end == len(self.buf) and not self.eof and self._fill(need):
+                need *= 2
+                continue
+            self.pos = end
+            return val
+
+def _iter_object(r: _Reader) -> Iterator[str]:
+    """Ger nycklarna i ett objekt; anroparen läser (eller strömmar) värdet."""
+    r.expect("{")
+    if r.peek() == "}":
+        r.pos += 1
+        return
+    while True:
+        key = r.value()
+        r.expect(":")
+        yield key
+        ch = r.peek()
+        r.pos += 1
+        if ch == "}":
+            return
+        if ch != ",":
+            raise ValueError("förväntade ',' eller '}' i bankfilen")
+
+def _iter_array(r: _Reader) -> Iterator[Any]:
+    r.expect("[")
+    if r.peek() == "]":
+        r.pos += 1
+        return
+    while True:
+        yield r.value()
+        ch = r.peek()
+        r.pos += 1
+        if ch == "]":
+            return
+        if ch != ",":
+            raise ValueError("förväntade ',' eller ']' i bankfilen")
+
+def _iter_section(r: _Reader, sec: Optional[str], top: bool) -> Iterator[Tuple[Optional[str], str, Any]]:
+    for key in _iter_object(r):
+        ch = r.peek()
+        if key in ("items", "passages") and ch == "[":
+            kind = key[:-1]
+            for rec in _iter_array(r):
+                yield sec, kind, rec
+        elif top and key in LEGACY_SECTIONS and ch == "{":
+            yield sec, "meta", (key, SECTION)
+            yield from _iter_section(r, key, False)
+        else:
+            yield sec, "meta", (key, r.value())
+
+def iter_bank_stream(path: str, chunk: int = CHUNK) -> Iterator[Tuple[Optional[str], str, Any]]:
+    """-> (sektion, kind, värde) i filordning, se modulens docstring."""
+    with open(path, "r", encoding="utf-8") as f:
+        r = _Reader(f, chunk)
+        yield from _iter_section(r, None, True)
+        if r.peek():
+            raise ValueError("extra data efter bankobjektet")
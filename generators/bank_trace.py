@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bank_trace.py – strukturerad spårning per fas (--trace FILE).
+
+Alla generator- och verktygsskript tar --trace FILE. Då skrivs en händelse per
+fas (load, id-scan, generatorloopar, unikhetskontroller, backfill, serialize,
+write, index …) med varaktighet och antal poster:
+
+  --trace build/trace.json    Chrome trace-format – öppna i chrome://tracing
+                              eller https://ui.perfetto.dev
+  --trace build/trace.jsonl   en JSON-händelse per rad
+
+Händelserna är Chrome "complete events" (ph "X", ts/dur i mikrosekunder,
+ts räknat från epoch så att spår från flera processer kan slås ihop – bygget
+i bank_build samlar stegens spår i förälderns fil).
+
+I koden:
+  from bank_trace import span
+  with span("generate:mc") as sp:
+      ...
+      sp.count = len(items)
+
+Utan --trace är span() en billig no-op.
+
+Samma faser används för minnesmätning (--mem-report, --max-memory 512M),
+se bank_memory.py.
+"""
+import atexit, json, os, sys, threading, time
+from typing import Any, Dict, List, Optional
+
+from bank_memory import MEMORY_EXIT, MemoryTracker, max_rss, parse_size
+
+TRACE_VERSION = 1
+
+class Span:
+    __slots__ = ("name", "cat", "args", "count", "_t0", "_ts")
+
+    def __init__(self, name: str, cat: str, args: Dict[str, Any]):
+        self.name, self.cat, self.args = name, cat, args
+        self.count: Optional[int] = None
+
+class _NullSpan:
+    """Delad no-op när spårning är avstängd (attribut får sättas men ignoreras)."""
+    count = None
+
+    @property
+    def args(self) -> Dict[str, Any]:
+        return {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, k, v):
+        pass
+
+    def flush(self, **args):
+        pass
+
+_NULL = _NullSpan()
+
+def _now_us() -> int:
+    return time.time_ns() // 1000
+
+class Accumulator:
+    """
+    Summerar många korta anrop (t.ex. unikhetskontroll per kandidat) till en
+    enda händelse: dur = summan, args.calls = antal anrop.
+    """
+    def __init__(self, tracer: "Tracer", name: str, cat: str):
+        self.tracer, self.name, self.cat = tracer, name, cat
+        self.calls = 0
+        self.total = 0.0
+        self.ts: Optional[int] = None
+        self._t0 = 0.0
+
+    def __enter__(self):
+        if self.ts is None:
+            self.ts = _now_us()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.total += time.perf_counter() - self._t0
+        self.calls += 1
+        return False
+
+    def flush(self, **args):
+        if self.tracer.enabled and self.calls:
+            self.tracer.emit(self.name, self.cat, self.ts, int(self.total * 1e6),
+                             {"calls": self.calls, **args})
+        self.calls, self.total, self.ts = 0, 0.0, None
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.path: Optional[str] = None
+        self.name = os.path.basename(sys.argv[0] or "python")
+        self.events: List[Dict[str, Any]] = []
+        self.memory: Optional[MemoryTracker] = None
+        self.mem_report = False
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._t0_us = 0
+        self._t0 = 0.0
+        self._written = False
+        self._registered = False
+
+    # ---------- start/stopp ----------
+
+    @property
+    def active(self) -> bool:
+        return self.enabled or self.memory is not None
+
+    def _register(self, name: str = None):
+        self.name = name or self.name
+        if not self._registered:
+            self._registered = True
+            self._t0_us = _now_us()
+            self._t0 = time.perf_counter()
+            atexit.register(self.finish)
+
+    def start(self, path: str, name: str = None):
+        self.enabled = True
+        self.path = path
+        self._register(name)
+
+    def start_memory(self, budget: int = None, report: bool = False, name: str = None):
+        """Slå på tracemalloc-mätning per fas (och ev. budget i byte)."""
+        self.memory = MemoryTracker(budget)
+        self.mem_report = report
+        self.memory.start()
+        self._register(name)
+
+    def finish(self):
+        """Körs vid processens slut: spårfil, minnesrapport och budgetkontroll."""
+        mem = self.memory
+        over = mem is not None and mem.over_at_exit()
+        self.write()
+        if mem is not None and self.mem_report:
+            mem.report()
+        if over:
+            mem.fail("(hela körningen)", mem.run_peak)
+            os._exit(MEMORY_EXIT)
+
+    def write(self):
+        """Skriv spåret (körs automatiskt vid processens slut)."""
+        if not self.enabled or self._written or not self.path:
+            return
+        self._written = True
+        args = {"argv": sys.argv[1:]}
+        if self.memory is not None:
+            args.update(mem_peak=self.memory.run_peak, max_rss=max_rss())
+        self.emit(self.name, "run", self._t0_us, int((time.perf_counter() - self._t0) * 1e6), args)
+        meta = {"name": "process_name", "ph": "M", "pid": self.pid, "tid": 0, "args": {"name": self.name}}
+        events = [meta] + sorted(self.events, key=lambda e: (e.get("ts", 0), -e.get("dur", 0)))
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        from bank_codec import dumps, write_text  # bank_codec importerar span härifrån
+        if self.path.endswith(".jsonl"):
+            text = "".join(dumps(e, pretty=False) + "\n" for e in events)
+        else:
+            text = dumps({"traceEvents": events, "displayTimeUnit": "ms",
+                          "otherData": {"version": TRACE_VERSION, "tool": self.name}}, pretty=False)
+        write_text(self.path, text)
+
+    # ---------- händelser ----------
+
+    def emit(self, name: str, cat: str, ts: int, dur: int, args: Dict[str, Any] = None, tid: int = None):
+        e = {"name": name, "cat": cat, "ph": "X", "ts": ts, "dur": max(0, dur),
+             "pid": self.pid, "tid": tid if tid is not None else threading.get_ident() % 100000,
+             "args": args or {}}
+        with self._lock:
+            self.events.append(e)
+
+    def span(self, name: str, cat: str = "phase", **args):
+        if not self.enabled and self.memory is None:
+            return _NULL
+        return _SpanCtx(self, Span(name, cat, dict(args)))
+
+    def accumulator(self, name: str, cat: str = "aggregate"):
+        if not self.enabled:
+            return _NULL
+        return Accumulator(self, name, cat)
+
+    def merge_file(self, path: str, **args) -> int:
+        """Lägg till händelser från en annan process spårfil (t.ex. ett byggsteg)."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                if path.endswith(".jsonl"):
+                    events = [json.loads(line) for line in f if line.strip()]
+                else:
+                    events = json.load(f).get("traceEvents", [])
+        except (OSError, ValueError):
+            return 0
+        with self._lock:
+            for e in events:
+                if args and e.get("cat") == "run":
+                    e.setdefault("args", {}).update(args)
+                self.events.append(e)
+        return len(events)
+
+class _SpanCtx:
+    __slots__ = ("tracer", "sp")
+
+    def __init__(self, tracer: Tracer, sp: Span):
+        self.tracer, self.sp = tracer, sp
+
+    def __enter__(self) -> Span:
+        sp = self.sp
+        if self.tracer.memory is not None:
+            self.tracer.memory.enter(sp.name)
+        sp._ts = _now_us()
+        sp._t0 = time.perf_counter()
+        return sp
+
+    def __exit__(self, exc_type, *exc):
+        sp = self.sp
+        tracer = self.tracer
+        dur = int((time.perf_counter() - sp._t0) * 1e6)
+        mem = tracer.memory
+        usage = mem.exit(sp.name) if mem is not None else None
+        if tracer.enabled:
+            if sp.count is not None:
+                sp.args["count"] = sp.count
+            if exc_type is not None:
+                sp.args["error"] = exc_type.__name__
+            if usage:
+                sp.args.update(usage)
+            tracer.emit(sp.name, sp.cat, sp._ts, dur, sp.args)
+        if usage and mem.over(usage["mem_peak"]):
+            mem.fail(sp.name, usage["mem_peak"])
+            raise SystemExit(MEMORY_EXIT)
+        return False
+
+TRACE = Tracer()
+span = TRACE.span
+accumulator = TRACE.accumulator
+
+def _size_arg(s: str) -> int:
+    try:
+        return parse_size(s)
+    except ValueError as e:
+        import argparse
+        raise argparse.ArgumentTypeError(str(e))
+
+def add_trace_arg(ap):
+    ap.add_argument("--trace", default=None, metavar="FILE",
+                    help="Skriv spår per fas (Chrome trace .json eller JSON-rader .jsonl)")
+    ap.add_argument("--mem-report", action="store_true",
+                    help="Skriv minnesanvändning per fas (tracemalloc) vid slutet")
+    ap.add_argument("--max-memory", type=_size_arg, default=None, metavar="SIZE",
+                    help=f"Avbryt (exit {MEMORY_EXIT}) med fördelning per fas om Python-heapen passerar SIZE, t.ex. 512M")
+
+def start_trace(args, name: str = None):
+    """Slå på spårning om --trace angavs och minnesmätning om --mem-report/--max-memory."""
+    path = getattr(args, "trace", None)
+    if path and not TRACE.enabled:
+        TRACE.start(path, name)
+    budget = getattr(args, "max_memory", None)
+    report = getattr(args, "mem_report", False)
+    if (budget or report) and TRACE.memory is None:
+        TRACE.start_memory(budget, report, name)
@@ -3,7 +3,7 @@
 
 """
 banks_tool.py – hanterar banks/:
-- Bygger/uppdaterar public/banks/index.json
+- Bygger/uppdaterar public/banks/index.json (och <bank>.facets.json per bank)
 - Migrerar legacy-filer (svenska.json, matematik.json) -> single-subject *.ak{grade}.json
 - Lägger till banker och sätter id/label
 - Verifierar dubbletter
@@ -14,19 +14,33 @@ Exempel:
   python3 generators/banks_tool.py add --file public/banks/engelska.ak4.json --label "Engelska åk 4"
   python3 generators/banks_tool.py list
   python3 generators/banks_tool.py verify
+  python3 generators/banks_tool.py query --bank ma-ak3 "area=division a>40"
+  python3 generators/banks_tool.py query vaktmästaren
+  python3 generators/banks_tool.py query "type=dnd buckets=3"
+  python3 generators/banks_tool.py build            # alla banker enligt generators/banks.build.json
+  python3 generators/banks_tool.py convert build/svenska.ndjson public/banks/svenska.json
+  python3 generators/banks_tool.py merge public/banks/matematik.json public/banks/matematik.ak3.json --out build/matematik.merged.json
 """
 
-import argparse, json, os, re, sys
+import argparse, hashlib, json, os, pickle, re, shlex, sys
 from collections import Counter, defaultdict
 from datetime import datetime
 from typing import Dict, Any, List, Tuple
 
+from bank_facets import facets_path, is_sidecar, write_facets
+from bank_index import update_index_file
+from bank_io import iter_bank_records, normalize_single_subject, read_json, write_json
+from bank_offsets import offsets_fresh, offsets_path, read_offsets, write_offsets
+from bank_text import word_tokens
+from bank_trace import add_trace_arg, span, start_trace
+
 # Resolva vägar utifrån var detta skript ligger (…/generators/banks_tool.py)
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJ_ROOT = os.path.dirname(SCRIPT_DIR)              # en nivå upp från generators/
 PUBLIC_ROOT = os.path.join(PROJ_ROOT, "public")
 BANKS_DIR_DEF = os.path.join(PUBLIC_ROOT, "banks")   # absolut sökväg
 INDEX_FILE = "index.json"
+CACHE_DIR_DEF = os.path.join(PROJ_ROOT, ".cache")       # lokala cachar (query-index m.m.)
 
 # ---- ämneskoder för snygga id:n (sv-ak3, ma-ak3, en-ak4, no-ak5, so-ak5, etc.) ----
 SUBJECT_CODE = {
@@ -57,17 +71,6 @@ def default_label(subject: str, grade: Any) -> str:
     except:
         return s
 
-def read_json(path: str) -> Any:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def write_json(path: str, data: Any):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    tmp = path + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, path)
-
 def list_bank_files(banks_dir: str) -> List[str]:
     if not os.path.isdir(banks_dir):
         return []
@@ -75,7 +78,7 @@ def list_bank_files(banks_dir: str) -> List[str]:
     for name in os.listdir(banks_dir):
         if not name.endswith(".json"):
             continue
-        if name == INDEX_FILE:
+        if name == INDEX_FILE or is_sidecar(name):
             continue
         out.append(os.path.join(banks_dir, name))
     return sorted(out)
@@ -92,32 +95,6 @@ def parse_ak_filename(fname: str) -> Tuple[str, int]:
     grade = int(m.group(2))
     return (subject, grade)
 
-def normalize_single_subject(data: Dict[str, Any], fallback_subject: str = "", fallback_grade: Any = None) -> Dict[str, Any]:
-    """
-    Returnera single-subject struktur:
-    { version?, subject, grade, items:[], passages:[] }
-    """
-    if "subject" in data and "items" in data:
-        return {
-            "version": data.get("version", "1.0"),
-            "subject": data.get("subject") or fallback_subject or "svenska",
-            "grade": data.get("grade", fallback_grade),
-            "items": data.get("items", []),
-            "passages": data.get("passages", []),
-        }
-    # legacy: svensk/matte i samma/lika struktur
-    if "svenska" in data or "matematik" in data:
-        # den här hjälpen används endast under migrering, inte i index
-        raise ValueError("normalize_single_subject: fick legacy-format – migrera först.")
-    # minimal fallback
-    return {
-        "version": data.get("version", "1.0"),
-        "subject": fallback_subject or data.get("subject") or "svenska",
-        "grade": data.get("grade", fallback_grade),
-        "items": data.get("items", []),
-        "passages": data.get("passages", []),
-    }
-
 def resolve_banks_dir(p: str) -> str:
     """
     Om p är relativ, tolka den relativt projektroten (inte nuvarande cwd).
@@ -153,6 +130,7 @@ def cmd_index(args):
     banks_dir = resolve_banks_dir(args.banks_dir)
     files = list_bank_files(banks_dir)
     banks = []
+    facets_written = 0
     for p in files:
         try:
             data = read_json(p)
@@ -184,12 +162,21 @@ def cmd_index(args):
             # om p inte ligger under PUBLIC_ROOT, fallback till absolut från /public
             rel_path = "/banks/" + os.path.basename(p)
 
+        # facettfil bredvid banken (skrivs bara om när banken ändrats)
+        _, changed = write_facets(p, data)
+        facets_written += int(changed)
+        # offsetindex för id-uppslag utan att tolka hela banken
+        if changed or not offsets_fresh(p, read_offsets(p), full=True):
+            write_offsets(p)
+
         banks.append({
             "id": bank_id,
             "subject": subj.lower(),
             "grade": grade,
             "path": rel_path,
-            "label": label
+            "label": label,
+            "facets": facets_path(rel_path),
+            "offsets": offsets_path(rel_path)
         })
 
     # unika id – om krock, gör löpnummer
@@ -201,14 +188,18 @@ def cmd_index(args):
             if seen[b["id"]] > 1:
                 b["id"] = f'{b["id"]}-{counts[b["id"]]}'
 
-    idx = {
-        "version": "1.0",
-        "generatedAt": datetime.utcnow().isoformat() + "Z",
-        "banks": banks
-    }
+    def rebuild(idx):
+        # behåll övriga nycklar (t.ex. "entries" från create_bank) – byt bara banklistan
+        idx.update({
+            "version": "1.0",
+            "generatedAt": datetime.utcnow().isoformat() + "Z",
+            "banks": banks
+        })
+        return idx
+
     out_path = os.path.join(banks_dir, INDEX_FILE)
-    write_json(out_path, idx)
-    print("✅ Skrev", out_path, f"({len(banks)} banker)")
+    update_index_file(out_path, rebuild)
+    print("✅ Skrev", out_path, f"({len(banks)} banker, {facets_written} facettfiler uppdaterade)")
 
 def cmd_migrate_legacy(args):
     """
@@ -252,6 +243,8 @@ def cmd_migrate_legacy(args):
             "items": items,
             "passages": []
         }
+        if ma.get("hints"):
+            out["hints"] = ma["hints"]  # delade tips (make_matematik_bank --hint-refs)
         out_file = os.path.join(banks_dir, f"matematik.ak{grade}.json")
         write_json(out_file, out)
         wrote += 1
@@ -345,17 +338,280 @@ def cmd_verify(args):
     if not any_issue:
         print("✅ Inga dubbletter funna.")
 
+# ----------------- query (inverterat index) -----------------
+
+QUERY_INDEX_VERSION = 1
+_NUM_RE = re.compile(r"-?\d+")
+_TERM_RE = re.compile(r"^([A-Za-zåäöÅÄÖ_][\wåäöÅÄÖ]*)(!=|>=|<=|=|>|<|~)(.*)$")
+# Fält som inte ska in i fritextindexet (standardtexter/metadata)
+_NO_TEXT_KEYS = {"id", "hint", "explain", "hintRef", "topic", "difficulty", "type", "area", "questions"}
+
+def tokenize(s: Any) -> Tuple[str, ...]:
+    return word_tokens(s if isinstance(s, str) else str(s))
+
+def _collect_text(v: Any, out: List[str]):
+    if isinstance(v, str):
+        out.append(v)
+    elif isinstance(v, dict):
+        for k, x in v.items():
+            if k not in _NO_TEXT_KEYS:
+                _collect_text(x, out)
+    elif isinstance(v, list):
+        for x in v:
+            _collect_text(x, out)
+
+def query_fields(kind: str, rec: Dict[str, Any], passage: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    Platta fält för filterspråket. Listor/objekt blir sina längder
+    (buckets=3, options=4), och tal i frågetexten blir a/b/c.
+    """
+    f: Dict[str, Any] = {}
+    for k, v in rec.items():
+        if isinstance(v, (list, dict)):
+            f[k] = len(v)
+        else:
+            f[k] = v
+    f["kind"] = kind
+    if kind == "passage":
+        f["type"] = "passage"
+    else:
+        f["type"] = rec.get("type") or "mc"
+    if "tiles" not in f and "tokens" in f:
+        f["tiles"] = f["tokens"]
+    if passage is not None:
+        f["passage"] = passage.get("id")
+        f.setdefault("title", passage.get("title"))
+    nums = [int(x) for x in _NUM_RE.findall(str(rec.get("q") or ""))]
+    for name, n in zip(("a", "b", "c"), nums):
+        f[name] = n
+    if f.get("area") == "division" and len(nums) >= 2:
+        f["dividend"], f["divisor"] = nums[0], nums[1]
+    return f
+
+def build_query_index(data: Dict[str, Any], sha1: str) -> Dict[str, Any]:
+    docs: List[Dict[str, Any]] = []
+    postings: Dict[str, List[int]] = defaultdict(list)
+    for kind, rec, passage in iter_bank_records(data):
+        n = len(docs)
+        f = query_fields(kind, rec, passage)
+        docs.append(f)
+        keys = set()
+        for k, v in f.items():
+            if isinstance(v, str) and len(v) <= 64:
+                keys.add(f"{k}={v.lower()}")
+        texts: List[str] = []
+        _collect_text(rec, texts)
+        for t in texts:
+            keys.update(tokenize(t))
+        for k in keys:
+            postings[k].append(n)
+    return {"version": QUERY_INDEX_VERSION, "sha1": sha1, "docs": docs, "postings": dict(postings)}
+
+def load_query_index(path: str, cache_dir: str = None) -> Dict[str, Any]:
+    """
+    Läs bankens query-index. Indexet byggs en gång per innehåll (sha1 av filen)
+    och sparas i cache_dir/query/<sha1>.pickle – upprepade frågor slipper json-parsning.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    sha1 = hashlib.sha1(raw).hexdigest()
+    cache_path = os.path.join(cache_dir, "query", f"{sha1}.pickle") if cache_dir else None
+    if cache_path and os.path.isfile(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                idx = pickle.load(f)
+            if idx.get("version") == QUERY_INDEX_VERSION and idx.get("sha1") == sha1:
+                return idx
+        except Exception:
+            pass
+    idx = build_query_index(read_json(path), sha1)
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp = cache_path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(idx, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_path)
+    return idx
+
+def _as_number(v: Any):
+    if isinstance(v, bool):
+        return int(v)
+    if isinstance(v, (int, float)):
+        return v
+    try:
+        return float(str(v).strip())
+    except (TypeError, ValueError):
+        return None
+
+def parse_query(terms: List[str]) -> Tuple[List[str], List[Tuple[str, str, str]]]:
+    """
+    Dela upp en fråga i fritext-token och fältvillkor.
+      area=division   type!=dnd   a>40   buckets=3   q~vaktmäst   lisa
+    """
+    tokens: List[str] = []
+    preds: List[Tuple[str, str, str]] = []
+    for part in terms:
+        for term in shlex.split(part):
+            m = _TERM_RE.match(term)
+            if m:
+                preds.append((m.group(1), m.group(2), m.group(3)))
+            else:
+                tokens.extend(tokenize(term))
+    return tokens, preds
+
+def _match_pred(doc: Dict[str, Any], field: str, op: str, val: str) -> bool:
+    v = doc.get(field)
+    if v is None:
+        return op == "!="
+    if op == "~":
+        return val.lower() in str(v).lower()
+    if op in ("=", "!="):
+        num = _as_number(val)
+        dv = _as_number(v) if num is not None else None
+        eq = (dv == num) if (num is not None and dv is not None) else (str(v).lower() == val.lower())
+        return eq if op == "=" else not eq
+    a, b = _as_number(v), _as_number(val)
+    if a is None or b is None:
+        return False
+    return {">": a > b, ">=": a >= b, "<": a < b, "<=": a <= b}[op]
+
+def run_query(idx: Dict[str, Any], tokens: List[str], preds: List[Tuple[str, str, str]]) -> List[int]:
+    postings = idx["postings"]
+    lists = [postings.get(t, ()) for t in tokens]
+    rest = []
+    for field, op, val in preds:
+        # strängjämlikhet kan slås upp direkt i indexet
+        if op == "=" and _as_number(val) is None:
+            lists.append(postings.get(f"{field}={val.lower()}", ()))
+        else:
+            rest.append((field, op, val))
+    if lists:
+        lists.sort(key=len)
+        cand = set(lists[0])
+        for lst in lists[1:]:
+            if not cand:
+                break
+            cand.intersection_update(lst)
+        cand = sorted(cand)
+    else:
+        cand = range(len(idx["docs"]))
+    docs = idx["docs"]
+    return [n for n in cand if all(_match_pred(docs[n], *p) for p in rest)]
+
+def _bank_matches(p: str, wanted: List[str]) -> bool:
+    if not wanted:
+        return True
+    base = os.path.basename(p)
+    stem = base[:-len(".json")]
+    subj, grade = parse_ak_filename(p)
+    bid = f"{subject_code(subj)}-ak{grade}" if subj else None
+    return any(w in (base, stem, bid) for w in wanted)
+
+def cmd_query(args):
+    """
+    Sök i bankernas innehåll med filter + fritext. Exempel:
+      query --bank ma-ak3 "area=division a>40"
+      query vaktmästaren
+      query "type=dnd buckets=3"
+    """
+    banks_dir = resolve_banks_dir(args.banks_dir)
+    files = [p for p in list_bank_files(banks_dir) if _bank_matches(p, args.bank)]
+    if not files:
+        print("⚠️ Inga banker matchar", args.bank or banks_dir)
+        sys.exit(1)
+    tokens, preds = parse_query(args.terms)
+    cache_dir = None if args.no_cache else args.cache_dir
+    total = 0
+    shown = 0
+    for p in files:
+        try:
+            idx = load_query_index(p, cache_dir)
+        except Exception as e:
+            print(f"⚠️ Hoppar över {p}: {e}")
+            continue
+        hits = run_query(idx, tokens, preds)
+        total += len(hits)
+        if args.count:
+            print(f"- {os.path.basename(p)}: {len(hits)}")
+            continue
+        for n in hits:
+            if args.limit and shown >= args.limit:
+                break
+            shown += 1
+            d = idx["docs"][n]
+            if args.json:
+                print(json.dumps({"bank": os.path.basename(p), **d}, ensure_ascii=False))
+            else:
+                text = str(d.get("q") or d.get("title") or "")
+                print(f"{os.path.basename(p)}  {d.get('id')}  [{d.get('type')}/{d.get('area') or '-'}]  {text[:70]}")
+    if args.limit and total > shown and not args.count:
+        print(f"… (+{total - shown} fler, höj --limit)")
+    print(f"🔎 {total} träffar")
+
+# ----------------- build (manifest) -----------------
+
+def cmd_build(args):
+    """
+    Bygg alla banker enligt manifestet: generate → augment → verify → index,
+    oberoende banker parallellt, bara det som ändrats.
+    """
+    from bank_build import run_build
+    try:
+        rc = run_build(args.manifest, only=args.only, jobs=args.jobs, force=args.force, dry_run=args.dry_run)
+    except (OSError, ValueError) as e:
+        print("❌ Kunde inte läsa manifest:", e)
+        sys.exit(2)
+    sys.exit(rc)
+
+# ----------------- convert (json <-> ndjson) -----------------
+
+def cmd_convert(args):
+    from bank_ndjson import convert
+    if not os.path.isfile(args.src):
+        print("❌ Hittar inte fil:", args.src)
+        sys.exit(1)
+    try:
+        n_items, n_passages = convert(args.src, args.dst, compact=args.compact)
+    except (ValueError, json.JSONDecodeError) as e:
+        print("❌ Kunde inte konvertera:", e)
+        sys.exit(1)
+    print(f"✅ {args.src} → {args.dst} ({n_items} items, {n_passages} passager)")
+
+# ----------------- merge -----------------
+
+def cmd_merge(args):
+    from bank_merge import merge_banks, merge_report_path
+    missing = [p for p in args.inputs if not os.path.isfile(p)]
+    if missing:
+        print("❌ Hittar inte fil:", ", ".join(missing))
+        sys.exit(1)
+    if os.path.abspath(args.out) in {os.path.abspath(p) for p in args.inputs}:
+        print("❌ --out får inte vara en av indatafilerna")
+        sys.exit(1)
+    try:
+        rep = merge_banks(args.inputs, args.out, subject=args.subject, grade=args.grade)
+    except (ValueError, json.JSONDecodeError) as e:
+        print("❌ Kunde inte slå ihop:", e)
+        sys.exit(1)
+    for s in rep["inputs"]:
+        print(f"  • {os.path.basename(s['path'])}: {s['items']} items, {s['passages']} passager → "
+              f"{s['kept']} behållna, {s['duplicates']} dubbletter, {s['renamed']} omdöpta")
+    t = rep["totals"]
+    print(f"✅ {args.out}: {t['kept']} poster ({t['duplicates']} dubbletter borttagna, {t['renamed']} id:n omdöpta)")
+    print(f"ℹ️ Rapport: {merge_report_path(args.out)}")
+
 # ----------------- main -----------------
 
 def main():
     ap = argparse.ArgumentParser(description="Hantera banks: index, migrering, add, verify")
     ap.add_argument("--banks-dir", default=BANKS_DIR_DEF, help="Sökväg till banks/ (default: public/banks)")
+    add_trace_arg(ap)
 
     sub = ap.add_subparsers(dest="cmd")
 
     sub.add_parser("list", help="Lista banker (fil för fil)")
 
-    sub.add_parser("index", help="Bygg/uppdatera public/banks/index.json")
+    sub.add_parser("index", help="Bygg/uppdatera public/banks/index.json (+ <bank>.facets.json)")
 
     sp_mig = sub.add_parser("migrate-legacy", help="Migrera svenska.json & matematik.json → single-subject *.ak{grade}.json")
     sp_mig.add_argument("--grade", type=int, required=True, help="Årskurs att sätta (t.ex. 3)")
@@ -367,25 +623,62 @@ def main():
 
     sub.add_parser("verify", help="Verifiera dubbletter i alla banker")
 
+    sp_q = sub.add_parser("query", help="Sök i bankerna med fältfilter + fritext (cachat inverterat index)")
+    sp_q.add_argument("terms", nargs="+", help="Villkor som 'area=division', 'a>40', 'buckets=3', 'q~halv' eller fritext")
+    sp_q.add_argument("--bank", action="append", default=[], help="Begränsa till bank (id som ma-ak3 eller filnamn); kan upprepas")
+    sp_q.add_argument("--limit", type=int, default=50, help="Max antal rader att skriva ut (0 = alla)")
+    sp_q.add_argument("--count", action="store_true", help="Skriv bara antal träffar per bank")
+    sp_q.add_argument("--json", action="store_true", help="Skriv träffar som JSON-rader")
+    sp_q.add_argument("--cache-dir", default=CACHE_DIR_DEF, help="Katalog för index-cache (default: .cache)")
+    sp_q.add_argument("--no-cache", action="store_true", help="Bygg index i minnet utan att läsa/skriva cache")
+
+    sp_b = sub.add_parser("build", help="Bygg banker enligt manifest (generate → augment → verify → index)")
+    sp_b.add_argument("--manifest", default=os.path.join(SCRIPT_DIR, "banks.build.json"), help="Byggmanifest (default: generators/banks.build.json)")
+    sp_b.add_argument("--only", action="append", default=[], help="Bygg bara angiven bank (name i manifestet); kan upprepas")
+    sp_b.add_argument("--jobs", type=int, default=None, help="Antal parallella steg (default: antal CPU)")
+    sp_b.add_argument("--force", action="store_true", help="Bygg om allt även om inget ändrats")
+    sp_b.add_argument("--dry-run", action="store_true", help="Visa grafen utan att köra")
+
+    sp_c = sub.add_parser("convert", help="Konvertera bank mellan JSON och radformat (.ndjson)")
+    sp_c.add_argument("src", help="Källfil (.json eller .ndjson)")
+    sp_c.add_argument("dst", help="Målfil (.ndjson eller .json)")
+    sp_c.add_argument("--compact", action="store_true", help="Kompakt JSON utan indrag (ndjson → json)")
+
+    sp_m = sub.add_parser("merge", help="Slå ihop banker (strömmande, dedupe på innehållshash) + rapport")
+    sp_m.add_argument("inputs", nargs="+", help="Indatabanker (.json/.ndjson); vid dubbletter vinner den första")
+    sp_m.add_argument("--out", required=True, help="Utdatabank (.json); rapporten skrivs till <out>.merge.json")
+    sp_m.add_argument("--subject", default=None, help="Ämne i utdata (krävs om indata har olika ämnen)")
+    sp_m.add_argument("--grade", type=int, default=None, help="Årskurs i utdata (default: första indatans)")
+
     args = ap.parse_args()
 
     # Normalisera banks-dir en gång
     args.banks_dir = resolve_banks_dir(args.banks_dir)
     print(f"[banks_tool] banks_dir: {args.banks_dir}")
-
-    if args.cmd == "index":
-        cmd_index(args)
-    elif args.cmd == "migrate-legacy":
-        cmd_migrate_legacy(args)
-    elif args.cmd == "add":
-        cmd_add(args)
-    elif args.cmd == "verify":
-        cmd_verify(args)
-    elif args.cmd == "list":
-        cmd_list(args)
-    else:
-        ap.print_help()
-        sys.exit(1)
+    start_trace(args, name=f"banks_tool {args.cmd}")
+
+    with span(f"cmd:{args.cmd}"):
+        if args.cmd == "index":
+            cmd_index(args)
+        elif args.cmd == "migrate-legacy":
+            cmd_migrate_legacy(args)
+        elif args.cmd == "add":
+            cmd_add(args)
+        elif args.cmd == "verify":
+            cmd_verify(args)
+        elif args.cmd == "list":
+            cmd_list(args)
+        elif args.cmd == "query":
+            cmd_query(args)
+        elif args.cmd == "build":
+            cmd_build(args)
+        elif args.cmd == "convert":
+            cmd_convert(args)
+        elif args.cmd == "merge":
+            cmd_merge(args)
+        else:
+            ap.print_help()
+            sys.exit(1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_banks.py – mätningar på de riktiga bankerna i public/banks.
+
+  python3 generators/bench_banks.py codec            # load/dump per JSON-bakände
+  python3 generators/bench_banks.py codec --repeat 20 --json
+  python3 generators/bench_banks.py text             # textmotorn på svenska-bankerna
+  python3 generators/bench_banks.py scale            # syntetiska banker 10k/100k/1M genom hela kedjan
+  python3 generators/bench_banks.py scale --scales 10k,100k --subject svenska --json
+
+codec: för varje bank och bakände (stdlib, orjson, ujson – de som finns)
+mäts tolkning samt pretty- och compact-serialisering (median av --repeat
+körningar). Resultatet kontrolleras mot stdlib: samma innehåll och samma
+nyckelordning, och om pretty-utdata är byte-identisk.
+
+text: alla texter (frågor, alternativ, passager) i bankerna för --subject
+normaliseras och tokeniseras med bank_text (kall och varm cache) och med de
+gamla regex-varianterna, plus anti-repetitionens too_similar mot de 400
+senaste frågorna. Resultaten ska vara identiska.
+
+scale: för varje storlek byggs en syntetisk bank i en temporär banks-katalog
+genom den riktiga kedjan, ett steg per process:
+  build    create_bank-generatorerna + backfill + skrivning av bank och sidofiler
+  index    banks_tool index
+  verify   verify_banks <bank>
+Per steg mäts väggtid och max-RSS (os.wait4), per storlek också filstorlek.
+Syntetisk = generatorernas frågor utan unikhetsvakt: innehållsrymden räcker
+inte till 1M unika frågor, så frågor upprepas (med unika id:n). Resultaten
+jämförs mot budgetar (SCALE_BUDGETS eller --budgets FILE) och skalningen
+mellan storlekar mot --max-exponent: tid ∝ n^k, k ska vara ≈ 1 (linjär).
+Exit 1 om någon budget överskrids.
+"""
+import argparse, json, math, os, re, shutil, statistics, subprocess, sys, tempfile, time
+from typing import Any, Callable, Dict, List
+
+import bank_codec, bank_text
+from bank_facets import is_sidecar
+from bank_io import iter_bank_records, read_json
+from bank_memory import fmt_size, parse_size
+from bank_trace import add_trace_arg, span, start_trace
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+BANKS_DIR_DEF = os.path.join(PROJECT_ROOT, "public", "banks")
+
+def bank_files(banks_dir: str) -> List[str]:
+    out = []
+    for name in sorted(os.listdir(banks_dir)):
+        if name.endswith(".json") and name != "index.json" and not is_sidecar(name):
+            out.append(os.path.join(banks_dir, name))
+    return out
+
+def median_ms(fn: Callable[[], Any], repeat: int) -> float:
+    times = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000.0
+
+def same_ordered(a: Any, b: Any) -> bool:
+    """Lika innehåll OCH samma nyckelordning på alla nivåer."""
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return list(a) == list(b) and all(same_ordered(a[k], b[k]) for k in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(same_ordered(x, y) for x, y in zip(a, b))
+    return a == b
+
+# ----------------- codec -----------------
+
+def cmd_codec(args):
+    files = bank_files(args.banks_dir)
+    if not files:
+        print("Inga bankfiler hittades i", args.banks_dir)
+        sys.exit(1)
+    backends = [b for b in bank_codec.PREFERENCE if b in bank_codec.BACKENDS]
+    print(f"ℹ️ Bakändar: {', '.join(backends)} (standard: {bank_codec.BACKEND}), repeat={args.repeat}")
+    rows: List[Dict[str, Any]] = []
+    ok = True
+    prev = bank_codec.BACKEND
+    try:
+        for p in files:
+            with span("read", file=os.path.basename(p)) as sp:
+                with open(p, "rb") as f:
+                    raw = f.read()
+                sp.count = len(raw)
+                ref = json.loads(raw)
+                ref_pretty = json.dumps(ref, ensure_ascii=False, indent=2)
+            for name in backends:
+                with span("measure", file=os.path.basename(p), codec=name):
+                    bank_codec.use(name)
+                    data = bank_codec.loads(raw)
+                    pretty = bank_codec.dumps(data, pretty=True)
+                    compact = bank_codec.dumps(data, pretty=False)
+                    row = {
+                        "bank": os.path.basename(p),
+                        "bytes": len(raw),
+                        "codec": name,
+                        "loadMs": median_ms(lambda: bank_codec.loads(raw), args.repeat),
+                        "dumpPrettyMs": median_ms(lambda: bank_codec.dumps(data, pretty=True), args.repeat),
+                        "dumpCompactMs": median_ms(lambda: bank_codec.dumps(data, pretty=False), args.repeat),
+                        "sameContent": same_ordered(ref, data)
+                                       and same_ordered(ref, json.loads(pretty))
+                                       and same_ordered(ref, json.loads(compact)),
+                        "prettyIdentical": pretty == ref_pretty,
+                    }
+                    ok = ok and row["sameContent"]
+                    rows.append(row)
+    finally:
+        bank_codec.use(prev)
+
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        print(f"{'bank':26} {'kB':>6} {'codec':7} {'load ms':>8} {'pretty ms':>10} {'compact ms':>11}  innehåll  pretty=stdlib")
+        for r in rows:
+            print(f"{r['bank']:26} {r['bytes']/1024:6.0f} {r['codec']:7} {r['loadMs']:8.2f} {r['dumpPrettyMs']:10.2f} "
+                  f"{r['dumpCompactMs']:11.2f}  {'✅' if r['sameContent'] else '❌':8}  {'ja' if r['prettyIdentical'] else 'nej'}")
+        totals: Dict[str, List[float]] = {}
+        for r in rows:
+            totals.setdefault(r["codec"], [0.0, 0.0, 0.0])
+            t = totals[r["codec"]]
+            t[0] += r["loadMs"]; t[1] += r["dumpPrettyMs"]; t[2] += r["dumpCompactMs"]
+        base = totals.get("stdlib")
+        print("\nSumma över alla banker:")
+        for name, (l, d, c) in totals.items():
+            speed = f"  (load ×{base[0]/l:.1f}, pretty ×{base[1]/d:.1f})" if base and name != "stdlib" and l and d else ""
+            print(f"  • {name:7} load {l:7.2f} ms, pretty {d:7.2f} ms, compact {c:7.2f} ms{speed}")
+    if not ok:
+        print("❌ Någon bakände gav annat innehåll än stdlib.")
+        sys.exit(1)
+
+# ----------------- text -----------------
+
+_OLD_WS = r"\s+"
+_OLD_PUNCT = r"[\.,!?:;\-–—]"
+
+def old_normalize(s: str) -> str:
+    s = (s or "").lower()
+    s = re.sub(_OLD_WS, " ", s).strip()
+    return re.sub(_OLD_PUNCT, "", s)
+
+def old_tokens(s: str) -> List[str]:
+    return re.findall(r"\w+", (s or "").lower())
+
+def old_too_similar(q1: str, q2: str, threshold: float) -> bool:
+    return bank_text.jaccard(set(old_normalize(q1).split()), set(old_normalize(q2).split())) >= threshold
+
+def bank_texts(files: List[str], subject: str):
+    """-> (alla textsträngar, frågetexter i bankordning)"""
+    texts, questions = [], []
+    for p in files:
+        data = read_json(p)
+        subj = str(data.get("subject") or ("svenska" if "svenska" in data else "matematik" if "matematik" in data else ""))
+        if subj != subject:
+            continue
+        for kind, rec, _ in iter_bank_records(data):
+            for k in ("q", "title", "text"):
+                if isinstance(rec.get(k), str):
+                    texts.append(rec[k])
+            texts.extend(str(o) for o in rec.get("options") or [])
+            if kind != "passage" and isinstance(rec.get("q"), str):
+                questions.append(rec["q"])
+    return texts, questions
+
+def guard_pass(questions: List[str], similar: Callable[[str, str, float], bool], window: int = 400) -> int:
+    """Samma jämförelsemönster som UniqueCollector: varje fråga mot de window senaste."""
+    hits = 0
+    for i, q in enumerate(questions):
+        for prev in questions[max(0, i - window):i]:
+            if similar(prev, q, 0.72):
+                hits += 1
+                break
+    return hits
+
+def cmd_text(args):
+    with span("read", subject=args.subject) as sp:
+        texts, questions = bank_texts(bank_files(args.banks_dir), args.subject)
+        sp.count = len(texts)
+    if not texts:
+        print(f"Inga {args.subject}-texter hittades i", args.banks_dir)
+        sys.exit(1)
+    mb = sum(len(t.encode("utf-8")) for t in texts) / 1e6
+    print(f"ℹ️ {len(texts)} texter ({mb:.2f} MB), {len(questions)} frågor, repeat={args.repeat}")
+
+    def cold(fn):
+        def run():
+            bank_text.cache_clear()
+            for t in texts:
+                fn(t)
+        return run
+
+    def warm(fn):
+        def run():
+            for t in texts:
+                fn(t)
+        return run
+
+    with span("compare"):
+        ok = ([bank_text.normalize_text(t) for t in texts] == [old_normalize(t) for t in texts]
+              and [list(bank_text.word_tokens(t)) for t in texts] == [old_tokens(t) for t in texts])
+    with span("measure"):
+        rows = [
+            ("normalize", "regex", median_ms(warm(old_normalize), args.repeat)),
+            ("normalize", "bank_text kall", median_ms(cold(bank_text.normalize_text), args.repeat)),
+            ("normalize", "bank_text varm", median_ms(warm(bank_text.normalize_text), args.repeat)),
+            ("tokens", "regex", median_ms(warm(old_tokens), args.repeat)),
+            ("tokens", "bank_text kall", median_ms(cold(bank_text.word_tokens), args.repeat)),
+            ("tokens", "bank_text varm", median_ms(warm(bank_text.word_tokens), args.repeat)),
+        ]
+    g_old = guard_pass(questions, old_too_similar)
+    g_new = guard_pass(questions, bank_text.too_similar)
+    ok = ok and g_old == g_new
+    rows.append(("too_similar×400", "regex", median_ms(lambda: guard_pass(questions, old_too_similar), max(1, args.repeat // 5))))
+    bank_text.cache_clear()
+    rows.append(("too_similar×400", "bank_text", median_ms(lambda: guard_pass(questions, bank_text.too_similar), max(1, args.repeat // 5))))
+
+    if args.json:
+        print(json.dumps([{"op": op, "impl": impl, "ms": ms} for op, impl, ms in rows]
+                         + [{"identical": ok}], ensure_ascii=False, indent=2))
+    else:
+        base: Dict[str, float] = {}
+        print(f"{'operation':16} {'implementation':16} {'ms':>9} {'MB/s':>8}  ×regex")
+        for op, impl, ms in rows:
+            base.setdefault(op, ms)
+            rate = f"{mb / (ms / 1000):8.1f}" if not op.startswith("too_similar") and ms else f"{'-':>8}"
+            print(f"{op:16} {impl:16} {ms:9.2f} {rate}  {base[op] / ms if ms else 0:5.1f}")
+        info = bank_text.cache_info()["token_set"]
+        print(f"ℹ️ token_set-cache: {info.hits} träffar, {info.misses} missar; {g_new} frågor för lika någon av de 400 senaste")
+    if not ok:
+        print("❌ bank_text gav annat resultat än regex-varianterna.")
+        sys.exit(1)
+    print("✅ Identiska resultat.")
+
+# ----------------- scale -----------------
+
+# Budget per storlek (antal items): total väggtid i s, högsta RSS i något steg, bankfilens storlek
+SCALE_BUDGETS: Dict[str, Dict[str, Any]] = {
+    "10000": {"seconds": 10, "rss": "160M", "bytes": "8M"},
+    "100000": {"seconds": 60, "rss": "1G", "bytes": "80M"},
+    "1000000": {"seconds": 600, "rss": "6G", "bytes": "800M"},
+}
+SCALE_STAGES = ("build", "index", "verify")
+
+def parse_count(s: str) -> int:
+    """'10k' -> 10000, '1M' -> 1000000 (decimala)."""
+    m = re.match(r"^\s*(\d+(?:\.\d+)?)\s*([kKmM]?)\s*$", s)
+    if not m:
+        raise ValueError(f"ogiltigt antal: {s!r} (t.ex. 10k, 1M)")
+    return int(float(m.group(1)) * {"": 1, "k": 10**3, "m": 10**6}[m.group(2).lower()])
+
+def synth_bank(subject: str, n: int, seed: int = 1) -> Dict[str, Any]:
+    """n frågor ur create_bank-generatorerna (utan unikhetsvakt), löpnummer-id:n."""
+    import create_bank as cb
+    cb.RNG.seed(seed)
+    profile = cb.profile_for_level("np")
+    bank: Dict[str, Any] = {"subject": subject, "items": []}
+    if subject == "svenska":
+        gens = [cb.sv_gen_stavning, cb.sv_gen_grammatik, cb.sv_gen_ord, cb.sv_gen_context]
+        nid, npid = cb.znext_id([], "sv-"), cb.znext_id([], "sv-p-")
+        bank["passages"] = []
+        for k in range(n):
+            it = cb.sv_gen_dnd(profile) if k % 20 == 19 else cb.RNG.choice(gens)(profile)
+            it["id"] = nid()
+            bank["items"].append(it)
+        for _ in range(n // 100):
+            p = cb.sv_gen_passage(profile)
+            p["id"] = npid()
+            for i, q in enumerate(p["questions"], start=1):
+                q["id"] = f"{p['id']}-q{i}"
+            bank["passages"].append(p)
+    else:
+        gens = [cb.ma_mc_add, cb.ma_mc_sub, cb.ma_mc_mul, lambda: cb.ma_mc_div(profile),
+                cb.ma_mc_clock, cb.ma_mc_geo]
+        nid = cb.znext_id([], "ma-")
+        for k in range(n):
+            if k % 10 == 9:
+                ds = cb.make_bar_dataset()
+                it = cb.ma_bar_max(ds) if k % 20 == 9 else cb.ma_bar_compare(ds)
+            else:
+                it = cb.RNG.choice(gens)()
+            it["id"] = nid()
+            bank["items"].append(it)
+    bank["bankVersion"] = "1.0"
+    return bank
+
+def cmd_synth(args):
+    """Byggsteget i scale (körs i egen process så att RSS mäts för bara detta steg)."""
+    import create_bank as cb
+    with span("synth", subject=args.subject) as sp:
+        bank = synth_bank(args.subject, args.items, args.seed)
+        sp.count = args.items
+    bank["grade"] = args.grade
+    cb.write_bank(bank, args.out)
+
+def _measure(cmd: List[str], log_path: str) -> Dict[str, Any]:
+    """Kör cmd och returnera väggtid, max-RSS (byte) och exitkod för just den processen."""
+    with open(log_path, "ab") as log:
+        t0 = time.perf_counter()
+        p = subprocess.Popen(cmd, cwd=PROJECT_ROOT, stdout=log, stderr=subprocess.STDOUT)
+        _, status, ru = os.wait4(p.pid, 0)
+        dt = time.perf_counter() - t0
+    p.returncode = os.waitstatus_to_exitcode(status)
+    rss = ru.ru_maxrss if sys.platform == "darwin" else ru.ru_maxrss * 1024
+    return {"seconds": round(dt, 3), "rss": rss, "rc": p.returncode}
+
+def load_budgets(path: str = None) -> Dict[int, Dict[str, float]]:
+    raw = SCALE_BUDGETS
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    out = {}
+    for n, b in raw.items():
+        out[parse_count(str(n))] = {k: (parse_size(v) if k in ("rss", "bytes") else float(v)) for k, v in b.items()}
+    return out
+
+def _exponent(n1: int, v1: float, n2: int, v2: float) -> float:
+    if v1 <= 0 or v2 <= 0 or n1 == n2:
+        return 0.0
+    return math.log(v2 / v1) / math.log(n2 / n1)
+
+def cmd_scale(args):
+    try:
+        scales = [parse_count(s) for s in args.scales.split(",") if s.strip()]
+        budgets = load_budgets(args.budgets)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    work = tempfile.mkdtemp(prefix="bench-scale-", dir=args.work_dir)
+    py = sys.executable
+    results: List[Dict[str, Any]] = []
+    failures: List[str] = []
+    try:
+        for n in sorted(scales):
+            bdir = os.path.join(work, f"n{n}", "banks")
+            os.makedirs(bdir)
+            bank = os.path.join(bdir, f"{args.subject}.ak{args.grade}.json")
+            log = os.path.join(work, f"n{n}.log")
+            cmds = {
+                "build": [py, os.path.join(SCRIPT_DIR, "bench_banks.py"), "synth", "--subject", args.subject,
+                          "--items", str(n), "--grade", str(args.grade), "--seed", str(args.seed), "--out", bank],
+                "index": [py, os.path.join(SCRIPT_DIR, "banks_tool.py"), "--banks-dir", bdir, "index"],
+                "verify": [py, os.path.join(SCRIPT_DIR, "verify_banks.py"), bank],
+            }
+            row: Dict[str, Any] = {"items": n, "stages": {}}
+            print(f"▶️  {n} items …", flush=True)
+            for stage in SCALE_STAGES:
+                with span(stage, items=n):
+                    m = _measure(cmds[stage], log)
+                row["stages"][stage] = m
+                print(f"   {stage:7} {m['seconds']:9.2f} s  {fmt_size(m['rss']):>10}  exit {m['rc']}", flush=True)
+                if m["rc"] != 0:
+                    failures.append(f"{n}: steget {stage} avslutades med exit {m['rc']} (logg: {log})")
+                    break
+            row["seconds"] = round(sum(m["seconds"] for m in row["stages"].values()), 3)
+            row["rss"] = max(m["rss"] for m in row["stages"].values())
+            row["bytes"] = os.path.getsize(bank) if os.path.isfile(bank) else 0
+            row["sidecarBytes"] = sum(os.path.getsize(os.path.join(bdir, f)) for f in os.listdir(bdir)
+                                      if is_sidecar(f))
+            b = budgets.get(n, {})
+            for key, val in (("seconds", row["seconds"]), ("rss", row["rss"]), ("bytes", row["bytes"])):
+                if key in b and val > b[key]:
+                    shown = (lambda v: f"{v:.1f} s") if key == "seconds" else fmt_size
+                    failures.append(f"{n}: {key} {shown(val)} > budget {shown(b[key])}")
+            results.append(row)
+            if not args.keep:
+                shutil.rmtree(os.path.join(work, f"n{n}"), ignore_errors=True)
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+    # Skalning mellan närliggande storlekar
+    curve = []
+    for a, b in zip(results, results[1:]):
+        k_t = _exponent(a["items"], a["seconds"], b["items"], b["seconds"])
+        k_b = _exponent(a["items"], a["bytes"], b["items"], b["bytes"])
+        curve.append({"from": a["items"], "to": b["items"], "timeExponent": round(k_t, 3), "bytesExponent": round(k_b, 3)})
+        if k_t > args.max_exponent:
+            failures.append(f"{a['items']}→{b['items']}: tid ∝ n^{k_t:.2f} > n^{args.max_exponent} (superlinjär)")
+
+    if args.json:
+        print(json.dumps({"subject": args.subject, "results": results, "scaling": curve,
+                          "failures": failures}, ensure_ascii=False, indent=2))
+    else:
+        print(f"{'items':>9} {'build s':>9} {'index s':>9} {'verify s':>9} {'total s':>9} {'max RSS':>10} {'bank':>10} {'sidofiler':>10}")
+        for r in results:
+            st = r["stages"]
+            cols = [f"{st[s]['seconds']:9.2f}" if s in st else f"{'-':>9}" for s in SCALE_STAGES]
+            print(f"{r['items']:>9} {' '.join(cols)} {r['seconds']:9.2f} {fmt_size(r['rss']):>10} "
+                  f"{fmt_size(r['bytes']):>10} {fmt_size(r['sidecarBytes']):>10}")
+        for c in curve:
+            print(f"ℹ️ {c['from']}→{c['to']}: tid ∝ n^{c['timeExponent']:.2f}, storlek ∝ n^{c['bytesExponent']:.2f}")
+    if args.keep:
+        print(f"ℹ️ Byggkatalog sparad: {work}")
+    if failures:
+        for f in failures:
+            print("❌", f)
+        sys.exit(1)
+    print("✅ Inom budget.")
+
+# ----------------- main -----------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmarks på bankerna i public/banks")
+    ap.add_argument("--banks-dir", default=BANKS_DIR_DEF, help="Katalog med banker (default: public/banks)")
+    add_trace_arg(ap)
+    sub = ap.add_subparsers(dest="cmd")
+
+    sp_c = sub.add_parser("codec", help="Jämför JSON-bakändar (load/dump) på riktiga banker")
+    sp_c.add_argument("--repeat", type=int, default=10, help="Antal körningar per mätning (median)")
+    sp_c.add_argument("--json", action="store_true", help="Skriv resultat som JSON")
+
+    sp_t = sub.add_parser("text", help="Mät textnormalisering/tokenisering (bank_text) mot regex-varianterna")
+    sp_t.add_argument("--subject", default="svenska", help="Ämne vars banker mäts (default: svenska)")
+    sp_t.add_argument("--repeat", type=int, default=10, help="Antal körningar per mätning (median)")
+    sp_t.add_argument("--json", action="store_true", help="Skriv resultat som JSON")
+
+    sp_s = sub.add_parser("scale", help="Syntetiska banker (10k/100k/1M) genom build → index → verify, mot budgetar")
+    sp_s.add_argument("--scales", default="10k,100k,1M", help="Storlekar, kommaseparerade (default: 10k,100k,1M)")
+    sp_s.add_argument("--subject", choices=["svenska", "matematik"], default="matematik")
+    sp_s.add_argument("--grade", type=int, default=3)
+    sp_s.add_argument("--seed", type=int, default=1)
+    sp_s.add_argument("--budgets", default=None, help='JSON {"10k": {"seconds": 10, "rss": "160M", "bytes": "8M"}, …} (default: SCALE_BUDGETS)')
+    sp_s.add_argument("--max-exponent", type=float, default=1.25, help="Högsta tillåtna k i tid ∝ n^k mellan storlekar")
+    sp_s.add_argument("--work-dir", default=None, help="Katalog för temporära banker (default: systemets temp)")
+    sp_s.add_argument("--keep", action="store_true", help="Behåll byggda banker och loggar")
+    sp_s.add_argument("--json", action="store_true", help="Skriv resultat som JSON")
+
+    # internt: byggsteget i scale
+    sp_y = sub.add_parser("synth")
+    sp_y.add_argument("--subject", choices=["svenska", "matematik"], default="matematik")
+    sp_y.add_argument("--items", type=int, required=True)
+    sp_y.add_argument("--grade", type=int, default=3)
+    sp_y.add_argument("--seed", type=int, default=1)
+    sp_y.add_argument("--out", required=True)
+
+    args = ap.parse_args()
+    start_trace(args, name=f"bench_banks {args.cmd}")
+    if args.cmd == "codec":
+        cmd_codec(args)
+    elif args.cmd == "text":
+        cmd_text(args)
+    elif args.cmd == "scale":
+        cmd_scale(args)
+    elif args.cmd == "synth":
+        cmd_synth(args)
+    else:
+        ap.print_help()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+build_cache.py – innehållsadresserad byggcache för generatorerna.
+
+Varje generering får ett fingeravtryck av:
+  • skripthash (generatorn + hjälpmoduler den använder)
+  • argument (utom cache-flaggor)
+  • seed
+  • hash av ordlistor/mallar (lexikondata)
+  • hash av indatabanken (append-/augment-läge; för .ndjson sista
+    checkpoint + storlek + filens slut, så att append inte läser hela filen)
+
+Fingeravtrycket sparas i <bank>.build.json. Matchar det befintlig utfil hoppas
+genereringen över helt (inga filer skrivs om). Artefakterna lagras också i
+.cache/builds/<nyckel>/ så att en tidigare konfiguration kan återställas direkt.
+
+Utan --seed (eller med --no-cache) är genereringen inte deterministisk/önskad
+och cachen används inte – då hashas ingenting.
+"""
+import hashlib, json, os, shutil
+from typing import Any, Dict, Iterable, List, Optional
+
+import bank_codec
+from bank_io import sidecar_path
+from bank_ndjson import is_ndjson, last_checkpoint
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+CACHE_DIR_DEF = os.path.join(PROJECT_ROOT, ".cache", "builds")
+BUILD_VERSION = 1
+BUILD_SUFFIX = ".build.json"
+# Argument som inte påverkar utfilens innehåll
+IGNORED_ARGS = {"cache_dir", "no_cache", "update_index", "trace", "mem_report", "max_memory"}
+# Hjälpmoduler som påverkar utfilernas bytes. Enda listan: generatorernas
+# fingeravtryck och bank_build-stämpeln använder båda den.
+HELPER_FILES = ("bank_codec.py", "bank_facets.py", "bank_ids.py", "bank_io.py", "bank_text.py",
+                "bank_ndjson.py", "bank_offsets.py", "bank_plan.py", "bank_sampling.py", "build_cache.py")
+NDJSON_TAIL = 1 << 16
+
+def helper_files() -> List[str]:
+    return [os.path.join(SCRIPT_DIR, f) for f in HELPER_FILES]
+
+def build_record_path(bank_path: str) -> str:
+    return sidecar_path(bank_path, BUILD_SUFFIX)
+
+def sha1_file(path: Optional[str]) -> Optional[str]:
+    if not path or not os.path.isfile(path):
+        return None
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def sha1_json(obj: Any) -> str:
+    s = json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(s.encode("utf-8")).hexdigest()
+
+def bank_hash(path: Optional[str]) -> Optional[str]:
+    """
+    Fingeravtryck av en bankfil (indata och utfil). En .ndjson med checkpoint nycklas på
+    checkpointen, storleken och de sista 64 KiB (O(1) oavsett bankens storlek);
+    övriga filer hashas helt.
+    """
+    if not path or not os.path.isfile(path):
+        return None
+    if is_ndjson(path):
+        cp = last_checkpoint(path)
+        if cp is not None:
+            size = os.path.getsize(path)
+            with open(path, "rb") as f:
+                f.seek(max(0, size - NDJSON_TAIL))
+                tail = hashlib.sha1(f.read()).hexdigest()
+            return "ndjson:" + sha1_json({"checkpoint": cp, "bytes": size, "tail": tail})
+    return sha1_file(path)
+
+def lexicon_hash(*tables: Any) -> str:
+    """Hash av ordlistor/mallar som styr genereringen."""
+    return sha1_json(list(tables))
+
+def cache_args(args) -> Dict[str, Any]:
+    return {k: v for k, v in sorted(vars(args).items()) if k not in IGNORED_ARGS}
+
+class BuildCache:
+    """
+    Användning:
+        cache = BuildCache(out, script_files=[__file__], args=cache_args(args), seed=args.seed, ...)
+        state = cache.check()        # "fresh" | "restored" | None
+        if not state:
+            ... generera och skriv ...
+            cache.store([out, facets, sampling])
+    """
+    def __init__(self, out: str, *, script_files: Iterable[str], args: Dict[str, Any], seed: Any,
+                 lexicon: str = None, input_path: str = None, cache_dir: str = CACHE_DIR_DEF, enabled: bool = True):
+        self.out = str(out)
+        self.enabled = bool(enabled) and seed is not None
+        self.cache_dir = cache_dir or CACHE_DIR_DEF
+        self._spec = (list(script_files), args, seed, lexicon, input_path)
+        self._parts: Optional[Dict[str, Any]] = None
+        self._key: Optional[str] = None
+
+    @property
+    def parts(self) -> Dict[str, Any]:
+        # lat: avstängd cache (--no-cache, ingen seed) ska inte hasha något
+        if self._parts is None:
+            script_files, args, seed, lexicon, input_path = self._spec
+            self._parts = {
+                "version": BUILD_VERSION,
+                "scripts": {os.path.basename(p): sha1_file(p) for p in script_files},
+                "args": args,
+                "seed": seed,
+                "lexicon": lexicon,
+                "input": bank_hash(input_path) if input_path else None,
+            }
+        return self._parts
+
+    @property
+    def key(self) -> str:
+        if self._key is None:
+            self._key = sha1_json(self.parts)
+        return self._key
+
+    def _entry_dir(self) -> str:
+        return os.path.join(self.cache_dir, self.key[:2], self.key)
+
+    def _read_record(self) -> Dict[str, Any]:
+        try:
+            with open(build_record_path(self.out), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _write_record(self, out_sha1: str):
+        rec = {"key": self.key, "parts": self.parts, "output": {"sha1": out_sha1}}
+        bank_codec.dump_file(build_record_path(self.out), rec)
+
+    def check(self) -> Optional[str]:
+        """'fresh' om utfilen redan motsvarar fingeravtrycket, 'restored' om den
+        återställdes från cachen, annars None (generera)."""
+        if not self.enabled:
+            return None
+        rec = self._read_record()
+        if rec.get("key") == self.key and rec.get("output", {}).get("sha1") == bank_hash(self.out):
+            return "fresh"
+        entry = self._entry_dir()
+        manifest = os.path.join(entry, "manifest.json")
+        if not os.path.isfile(manifest):
+            return None
+        try:
+            with open(manifest, "r", encoding="utf-8") as f:
+                files = json.load(f)["files"]
+        except Exception:
+            return None
+        dest = os.path.dirname(os.path.abspath(self.out))
+        os.makedirs(dest, exist_ok=True)
+        for name in files:
+            src = os.path.join(entry, name)
+            if not os.path.isfile(src):
+                return None
+        for name in files:
+            tmp = os.path.join(dest, name + ".tmp")
+            shutil.copyfile(os.path.join(entry, name), tmp)
+            os.replace(tmp, os.path.join(dest, name))
+        self._write_record(bank_hash(self.out))
+        return "restored"
+
+    def store(self, files: List[str]):
+        """Spara artefakterna i cachen och skriv <bank>.build.json."""
+        if not self.enabled:
+            return
+        out_sha1 = bank_hash(self.out)
+        self._write_record(out_sha1)
+        entry = self._entry_dir()
+        os.makedirs(entry, exist_ok=True)
+        names = []
+        for p in files:
+            p = str(p)
+            if os.path.isfile(p):
+                shutil.copyfile(p, os.path.join(entry, os.path.basename(p)))
+                names.append(os.path.basename(p))
+        bank_codec.dump_file(os.path.join(entry, "manifest.json"),
+                             {"key": self.key, "files": names, "output": out_sha1})
+
+def add_cache_args(ap):
+    """Gemensamma CLI-flaggor för byggcachen."""
+    ap.add_argument("--no-cache", action="store_true", help="Generera alltid (ignorera byggcache)")
+    ap.add_argument("--cache-dir", default=CACHE_DIR_DEF, help="Katalog för byggcache (default: .cache/builds)")
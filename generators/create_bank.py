@@ -21,12 +21,26 @@ Exempel (matematik åk 3):
     --items 220 --diagrams 24 --level np \
     --out public/banks/matematik.ak3.json \
     --update-index --retune-division yes --max-dividend 50 --allow-nine no
+
+Med --seed används byggcachen (build_cache.py): samma skript, argument, seed och
+ordlistor som förra gången → filen skrivs inte om. --no-cache tvingar generering.
 """
 
-import json, random, argparse, os, re
+import random, argparse, os
 from pathlib import Path
 from typing import List, Dict, Any, Tuple
 
+from bank_facets import facets_path, write_facets
+from bank_ids import add_id_scheme_arg, assign_hash_ids, sig_item
+from bank_text import too_similar
+from bank_trace import accumulator, add_trace_arg, span, start_trace
+from bank_index import register_entry
+from bank_io import write_json
+from bank_offsets import offsets_path, write_offsets
+from bank_plan import QuotaScheduler, parse_sv_plan, plan_mix
+from bank_sampling import sampling_path, write_sampling
+from build_cache import BuildCache, add_cache_args, cache_args, helper_files, lexicon_hash
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 BANKS_DIR = PROJECT_ROOT / "public" / "banks"
 INDEX_PATH = BANKS_DIR / "index.json"
@@ -37,43 +51,6 @@ _MIN_DIFF = 0.72  # default Jaccard-tröskel för anti-repetition
 
 # ---------- anti-repetition / uniqueness helpers ----------
 
-def normalize_text(s: str) -> str:
-    s = (s or "")
-    s = s.lower()
-    s = re.sub(r"\s+", " ", s).strip()
-    s = re.sub(r"[\.,!?:;\-–—]", "", s)
-    return s
-
-def sig_item(it: dict) -> str:
-    """Signature used to avoid duplicates / near-duplicates."""
-    t = it.get("type") or "mc"
-    area = it.get("area") or ""
-    q = normalize_text(it.get("q") or "")
-    # for mc, include sorted options to reduce repeated permutations
-    if t in (None, "", "mc", "bar-max", "bar-compare"):
-        ops = [str(x) for x in (it.get("options") or [])]
-        ops = sorted([normalize_text(o) for o in ops])
-        return f"{t}|{area}|{q}|{'|'.join(ops)}"
-    # for dnd, include bucket labels
-    if t == "dnd":
-        b = [normalize_text(x.get('label','')) for x in (it.get('buckets') or [])]
-        return f"{t}|{area}|{q}|{'|'.join(b)}"
-    # charts: include labels
-    if t in ("bar-max","bar-compare"):
-        ch = it.get("chart") or {}
-        labs = [normalize_text(x) for x in (ch.get("labels") or [])]
-        return f"{t}|{area}|{q}|{'|'.join(labs)}"
-    return f"{t}|{area}|{q}"
-
-def jaccard(a: set, b: set) -> float:
-    if not a and not b: return 1.0
-    return len(a & b) / max(1, len(a | b))
-
-def too_similar(q1: str, q2: str, threshold: float=0.8) -> bool:
-    A = set(normalize_text(q1).split())
-    B = set(normalize_text(q2).split())
-    return jaccard(A,B) >= threshold
-
 class UniqueCollector:
     """Keeps signatures and questions to reduce repetitions."""
     def __init__(self, min_diff: float=0.75):
@@ -92,52 +69,100 @@ class UniqueCollector:
         self.questions.append(q)
         return True
 
-# -------------------- utils --------------------
-
-def ensure_dir(p: Path):
-    p.parent.mkdir(parents=True, exist_ok=True)
-
-def write_json(path: Path, data: dict):
-    ensure_dir(path)
-    tmp = path.with_suffix(path.suffix + ".tmp")
-    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-    tmp.replace(path)
+# Anpassad generatormix: mättade generatorer (inga nya unika frågor) väljs mer sällan
+SATURATION_STREAK = 200   # så många avslag i rad → generatorn räknas som uttömd
+MIN_SHARE = 0.05          # lägsta vikt (andel av grundvikten) för en generator som lever
+RATE_ALPHA = 0.05         # glidande medelvärde för godkännandegrad
+
+class AdaptiveMix:
+    """
+    Väljer generator viktat efter grundvikt × hur ofta den nyligen gett en ny
+    unik fråga. En generator med SATURATION_STREAK avslag i rad får vikt 0;
+    när alla är uttömda (exhausted) är det unika utrymmet slut och loopen kan
+    sluta direkt i stället för att bränna hela försöksbudgeten.
+    Allt räknas inkrementellt – O(antal generatorer) per försök.
+    Så länge inget avslag skett väljs precis som med RNG.random() mot grundvikterna.
+    """
+    def __init__(self, gens: Dict[str, Any], weights: Dict[str, float] = None, streak: int = SATURATION_STREAK):
+        self.gens = gens
+        self.names = list(gens)
+        self.base = {n: float((weights or {}).get(n, 1.0)) for n in self.names}
+        self.weight = dict(self.base)
+        self.total = sum(self.weight.values())
+        self.rate = {n: 1.0 for n in self.names}
+        self.tries = {n: 0 for n in self.names}
+        self.accepted = {n: 0 for n in self.names}
+        self.streak = {n: 0 for n in self.names}
+        self.streak_limit = streak
+        self.saturated: List[str] = []
+
+    @property
+    def exhausted(self) -> bool:
+        return self.total <= 0
+
+    def pick(self) -> str:
+        r = RNG.random() * self.total
+        last = None
+        for n in self.names:
+            w = self.weight[n]
+            if w <= 0:
+                continue
+            if r < w:
+                return n
+            r -= w
+            last = n
+        return last
+
+    def record(self, name: str, ok: bool):
+        self.tries[name] += 1
+        if ok:
+            self.accepted[name] += 1
+            self.streak[name] = 0
+        else:
+            self.streak[name] += 1
+        self.rate[name] += RATE_ALPHA * ((1.0 if ok else 0.0) - self.rate[name])
+        old = self.weight[name]
+        if self.streak[name] >= self.streak_limit:
+            new = 0.0
+            if old > 0:
+                self.saturated.append(name)
+        else:
+            new = self.base[name] * max(MIN_SHARE, self.rate[name])
+        self.weight[name] = new
+        self.total += new - old
+        if self.total < 1e-12:
+            self.total = 0.0
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {n: {"tries": self.tries[n], "accepted": self.accepted[n],
+                    "saturated": n in self.saturated} for n in self.names}
+
+    def report(self, label: str, made: int, target: int, attempts: int):
+        """Skriv varför loopen gav färre frågor än begärt."""
+        if made >= target:
+            return
+        why = ("unika frågor tog slut (alla generatorer mättade)" if self.exhausted
+               else f"försöksbudgeten ({attempts} försök) tog slut")
+        print(f"⚠️ {label}: {made} av {target} frågor – {why}.")
+        for n in self.names:
+            t, a = self.tries[n], self.accepted[n]
+            state = "mättad" if n in self.saturated else f"vikt {self.weight[n] / self.base[n]:.2f}"
+            print(f"   • {n}: {a}/{t} godkända ({(a / t * 100) if t else 0:.0f}%), {state}")
 
-def load_json(path: Path, default=None):
-    if not path.exists():
-        return default if default is not None else {}
-    try:
-        return json.loads(path.read_text(encoding="utf-8"))
-    except Exception:
-        return default if default is not None else {}
+# -------------------- utils --------------------
 
 def update_index(bank_id: str, label: str, path_rel: str, subject: str, grade: int, description: str):
-    idx = load_json(INDEX_PATH, default={"entries":[]})
-    entries = idx.get("entries") or idx.get("banks") or []
-    # ersätt existerande
-    updated = False
-    for e in entries:
-        if e.get("id") == bank_id:
-            e.update({
-                "label": label,
-                "path": path_rel,
-                "subject": subject,
-                "grade": grade,
-                "description": description
-            })
-            updated = True
-            break
-    if not updated:
-        entries.append({
-            "id": bank_id,
-            "label": label,
-            "path": path_rel,
-            "subject": subject,
-            "grade": grade,
-            "description": description
-        })
-    idx["entries"] = entries
-    write_json(INDEX_PATH, idx)
+    # låst + sammanslagen med parallella jobbs registreringar (se bank_index.py)
+    register_entry(str(INDEX_PATH), {
+        "id": bank_id,
+        "label": label,
+        "path": path_rel,
+        "subject": subject,
+        "grade": grade,
+        "description": description,
+        "facets": facets_path(path_rel),
+        "offsets": offsets_path(path_rel)
+    })
 
 def znext_id(items: List[dict], prefix: str) -> callable:
     """Returnerar gen() som ger nästa id som prefix + 3-siffror."""
@@ -300,48 +325,53 @@ def sv_gen_ord(profile)->dict:
 def sv_gen_dnd(profile)->dict:
     # 60% S/V/A, annars prepositioner
     if RNG.random()<0.6:
-        min_t,max_t = profile["dnd_tokens"]; tok_n = RNG.randint(min_t,max_t)
-        cats_count = RNG.randint(*profile["dnd_cats"])
-        categories = ["Substantiv","Verb","Adjektiv"][:cats_count]
-        tokens=[]; sol={}
-        per = max(2, tok_n//max(1,cats_count))
-        if "Substantiv" in categories:
-            subs = RNG.sample(GRAM_BANK["substantiv"], k=per); tokens+=subs; [sol.setdefault(w,"Substantiv") for w in subs]
-        if "Verb" in categories:
-            verbs = RNG.sample(GRAM_BANK["verb"], k=per); tokens+=verbs; [sol.setdefault(w,"Verb") for w in verbs]
-        if "Adjektiv" in categories:
-            adjs = RNG.sample(GRAM_BANK["adjektiv"], k=per); tokens+=adjs; [sol.setdefault(w,"Adjektiv") for w in adjs]
-        pool_extra = GRAM_BANK["substantiv"]+GRAM_BANK["verb"]+GRAM_BANK["adjektiv"]
-        while len(tokens)<tok_n:
-            w = RNG.choice(pool_extra)
-            if w not in sol:
-                sol[w]=RNG.choice(categories); tokens.append(w)
-        RNG.shuffle(tokens)
-        return dict(
-            id="", topic="svenska", area="grammatik", type="dnd",
-            q="Dra orden till rätt kategori.",
-            buckets=[{"label":c} for c in categories],
-            tiles=tokens, solution=sol,
-            hint="Substantiv = namn. Verb = gör/är. Adjektiv = beskriver.",
-            explain="Testa 'en/ett' (substantiv), 'att' (verb). Adjektiv beskriver egenskap.",
-            difficulty=profile["difficulty"]
-        )
-    else:
-        min_t,max_t = profile["dnd_tokens"]; tok_n = RNG.randint(min_t,max_t)
-        pres_n = max(3, tok_n//2)
-        pres = RNG.sample(GRAM_BANK["preposition"], k=min(pres_n, len(GRAM_BANK["preposition"])))
-        not_pres_pool = GRAM_BANK["substantiv"] + GRAM_BANK["verb"] + GRAM_BANK["adjektiv"] + GRAM_BANK["pronomen"]
-        not_pres = RNG.sample(not_pres_pool, k=tok_n - len(pres))
-        tokens = pres + not_pres; RNG.shuffle(tokens)
-        sol = { **{w:"Preposition" for w in pres}, **{w:"Inte preposition" for w in not_pres} }
-        return dict(
-            id="", topic="svenska", area="grammatik", type="dnd",
-            q="Dra prepositionerna till 'Preposition' och övriga ord till 'Inte preposition'.",
-            buckets=[{"label":"Preposition"},{"label":"Inte preposition"}],
-            tiles=tokens, solution=sol,
-            hint=HINTS_SV["preposition"], explain=HINTS_SV["preposition"],
-            difficulty=profile["difficulty"]
-        )
+        return sv_gen_dnd_ordklasser(profile)
+    return sv_gen_dnd_prepositioner(profile)
+
+def sv_gen_dnd_ordklasser(profile)->dict:
+    min_t,max_t = profile["dnd_tokens"]; tok_n = RNG.randint(min_t,max_t)
+    cats_count = RNG.randint(*profile["dnd_cats"])
+    categories = ["Substantiv","Verb","Adjektiv"][:cats_count]
+    tokens=[]; sol={}
+    per = max(2, tok_n//max(1,cats_count))
+    if "Substantiv" in categories:
+        subs = RNG.sample(GRAM_BANK["substantiv"], k=per); tokens+=subs; [sol.setdefault(w,"Substantiv") for w in subs]
+    if "Verb" in categories:
+        verbs = RNG.sample(GRAM_BANK["verb"], k=per); tokens+=verbs; [sol.setdefault(w,"Verb") for w in verbs]
+    if "Adjektiv" in categories:
+        adjs = RNG.sample(GRAM_BANK["adjektiv"], k=per); tokens+=adjs; [sol.setdefault(w,"Adjektiv") for w in adjs]
+    pool_extra = GRAM_BANK["substantiv"]+GRAM_BANK["verb"]+GRAM_BANK["adjektiv"]
+    while len(tokens)<tok_n:
+        w = RNG.choice(pool_extra)
+        if w not in sol:
+            sol[w]=RNG.choice(categories); tokens.append(w)
+    RNG.shuffle(tokens)
+    return dict(
+        id="", topic="svenska", area="grammatik", type="dnd",
+        q="Dra orden till rätt kategori.",
+        buckets=[{"label":c} for c in categories],
+        tiles=tokens, solution=sol,
+        hint="Substantiv = namn. Verb = gör/är. Adjektiv = beskriver.",
+        explain="Testa 'en/ett' (substantiv), 'att' (verb). Adjektiv beskriver egenskap.",
+        difficulty=profile["difficulty"]
+    )
+
+def sv_gen_dnd_prepositioner(profile)->dict:
+    min_t,max_t = profile["dnd_tokens"]; tok_n = RNG.randint(min_t,max_t)
+    pres_n = max(3, tok_n//2)
+    pres = RNG.sample(GRAM_BANK["preposition"], k=min(pres_n, len(GRAM_BANK["preposition"])))
+    not_pres_pool = GRAM_BANK["substantiv"] + GRAM_BANK["verb"] + GRAM_BANK["adjektiv"] + GRAM_BANK["pronomen"]
+    not_pres = RNG.sample(not_pres_pool, k=tok_n - len(pres))
+    tokens = pres + not_pres; RNG.shuffle(tokens)
+    sol = { **{w:"Preposition" for w in pres}, **{w:"Inte preposition" for w in not_pres} }
+    return dict(
+        id="", topic="svenska", area="grammatik", type="dnd",
+        q="Dra prepositionerna till 'Preposition' och övriga ord till 'Inte preposition'.",
+        buckets=[{"label":"Preposition"},{"label":"Inte preposition"}],
+        tiles=tokens, solution=sol,
+        hint=HINTS_SV["preposition"], explain=HINTS_SV["preposition"],
+        difficulty=profile["difficulty"]
+    )
 
 PASSAGES = [
     {
@@ -568,6 +598,21 @@ def ma_bar_compare(ds)->dict:
 
 # -------------------- builders --------------------
 
+# Områdessannolikheter för MC-generatorerna (speglar trösklarna i build_svenska
+# och det likformiga valet i build_matematik). Används för samplingsindexet.
+SV_MC_MIX = {"stavning": 0.25, "grammatik": 0.50, "ordförståelse": 0.25}
+MA_MC_MIX = {a: 1/6 for a in ("addition","subtraktion","multiplikation","division","klockan","geometri")}
+
+def generator_mix(subject:str, args)->Dict[str,float]:
+    """Förväntat antal frågor per område enligt generatorernas sannolikheter."""
+    if subject == "svenska":
+        mix = {a: p*args.items for a,p in SV_MC_MIX.items()}
+        mix["grammatik"] += args.dnd
+    else:
+        mix = {a: p*args.items for a,p in MA_MC_MIX.items()}
+        mix["diagram"] = float(args.diagrams)
+    return mix
+
 def build_svenska(profile:dict, items:int, dnd:int, passages:int)->dict:
     bank = {"subject":"svenska","items":[],"passages":[]}
     nid = znext_id(bank["items"], "sv-")
@@ -575,69 +620,156 @@ def build_svenska(profile:dict, items:int, dnd:int, passages:int)->dict:
 
     # MC items (with uniqueness guard)
     uc = UniqueCollector(min_diff=_MIN_DIFF)
+    unique = accumulator("unique")
+    mix = AdaptiveMix({
+        "stavning": sv_gen_stavning,
+        "grammatik": sv_gen_grammatik,
+        "ord": sv_gen_ord,
+        "context": sv_gen_context,
+    })
     attempts = 0
+    made = 0
     target = max(0, items)
-    while len([x for x in bank["items"] if x.get("type","mc") != "dnd"]) < target and attempts < target*10:
-        attempts += 1
-        r = RNG.random()
-        if r < 0.25:
-            it = sv_gen_stavning(profile)
-        elif r < 0.50:
-            it = sv_gen_grammatik(profile)
-        elif r < 0.75:
-            it = sv_gen_ord(profile)
-        else:
-            it = sv_gen_context(profile)
-        if uc.accept(it):
-            it["id"] = nid()
-            bank["items"].append(it)
+    with span("generate:mc", subject="svenska") as sp:
+        while made < target and attempts < target*10 and not mix.exhausted:
+            attempts += 1
+            name = mix.pick()
+            it = mix.gens[name](profile)
+            with unique:
+                ok = uc.accept(it)
+            mix.record(name, ok)
+            if ok:
+                it["id"] = nid()
+                bank["items"].append(it)
+                made += 1
+        sp.count = made
+        sp.args.update(attempts=attempts, saturated=list(mix.saturated))
+        unique.flush(accepted=made, rejected=attempts - made)
+    mix.report("svenska MC", made, target, attempts)
 
     # DnD
-    for _ in range(max(0, dnd)):
-        it = sv_gen_dnd(profile)
-        # lightweight uniqueness: avoid identical category sets and same tokens
-        s = sig_item(it)
-        if any(sig_item(x)==s for x in bank["items"] if x.get("type")=="dnd"):
-            continue
-        it["id"] = nid()
-        bank["items"].append(it)
+    with span("generate:dnd", subject="svenska") as sp:
+        dnd_sigs = set()
+        for _ in range(max(0, dnd)):
+            it = sv_gen_dnd(profile)
+            # lightweight uniqueness: avoid identical category sets and same tokens
+            s = sig_item(it)
+            if s in dnd_sigs:
+                continue
+            dnd_sigs.add(s)
+            it["id"] = nid()
+            bank["items"].append(it)
+        sp.count = len(dnd_sigs)
 
     # Passages
-    for _ in range(max(0, passages)):
-        p = sv_gen_passage(profile)
-        p["id"] = npid()
-        for i, q in enumerate(p["questions"], start=1):
-            q["id"] = f"{p['id']}-q{i}"
-        bank["passages"].append(p)
+    with span("generate:passages", subject="svenska") as sp:
+        for _ in range(max(0, passages)):
+            p = sv_gen_passage(profile)
+            p["id"] = npid()
+            for i, q in enumerate(p["questions"], start=1):
+                q["id"] = f"{p['id']}-q{i}"
+            bank["passages"].append(p)
+        sp.count = len(bank["passages"])
 
     return bank
 
+def build_svenska_planned(profile:dict, quotas:Dict[str,int])->dict:
+    """Som build_svenska men med exakta kvoter per område (--plan), växelvis schemalagda."""
+    bank = {"subject":"svenska","items":[],"passages":[]}
+    nid = znext_id(bank["items"], "sv-")
+    npid = znext_id(bank["passages"], "sv-p-")
+    gens = {
+        "stavning": sv_gen_stavning,
+        "grammatik": sv_gen_grammatik,
+        "ordförståelse": sv_gen_ord,
+        "context": sv_gen_context,
+        "dnd-ordklasser": sv_gen_dnd_ordklasser,
+        "dnd-prepositioner": sv_gen_dnd_prepositioner,
+        "passages": sv_gen_passage,
+    }
+    uc = UniqueCollector(min_diff=_MIN_DIFF)
+    unique = accumulator("unique")
+    dnd_sigs = set()
+    sched = QuotaScheduler(quotas, streak=SATURATION_STREAK)
+    budget = sum(sched.quotas.values()) * 10
+    attempts = 0
+    with span("generate:plan", subject="svenska") as sp:
+        while not sched.finished and attempts < budget:
+            attempts += 1
+            area = sched.next()
+            it = gens[area](profile)
+            if area == "passages":
+                it["id"] = npid()
+                for i, q in enumerate(it["questions"], start=1):
+                    q["id"] = f"{it['id']}-q{i}"
+                bank["passages"].append(it)
+                sched.record(area, True)
+                continue
+            if area.startswith("dnd-"):
+                s = sig_item(it)
+                ok = s not in dnd_sigs
+                if ok:
+                    dnd_sigs.add(s)
+            else:
+                with unique:
+                    ok = uc.accept(it)
+            sched.record(area, ok)
+            if ok:
+                it["id"] = nid()
+                bank["items"].append(it)
+        sp.count = len(bank["items"]) + len(bank["passages"])
+        sp.args.update(attempts=attempts, quotas=sched.quotas, exhausted=list(sched.exhausted))
+        unique.flush()
+    sched.report("svenska --plan")
+    return bank
+
 def build_matematik(profile:dict, items:int, diagrams:int)->dict:
     bank = {"subject":"matematik","items":[]}
     nid = znext_id(bank["items"], "ma-")
 
-    gens = [ma_mc_add, ma_mc_sub, ma_mc_mul, lambda: ma_mc_div(profile),
-            ma_mc_clock, ma_mc_geo]
+    mix = AdaptiveMix({
+        "addition": ma_mc_add,
+        "subtraktion": ma_mc_sub,
+        "multiplikation": ma_mc_mul,
+        "division": lambda: ma_mc_div(profile),
+        "klockan": ma_mc_clock,
+        "geometri": ma_mc_geo,
+    })
     uc = UniqueCollector(min_diff=_MIN_DIFF)
+    unique = accumulator("unique")
     attempts = 0
+    made = 0
     target = max(0, items)
-    while len(bank["items"]) < target and attempts < target*10:
-        attempts += 1
-        it = RNG.choice(gens)()
-        if uc.accept(it):
+    with span("generate:mc", subject="matematik") as sp:
+        while made < target and attempts < target*10 and not mix.exhausted:
+            attempts += 1
+            name = mix.pick()
+            it = mix.gens[name]()
+            with unique:
+                ok = uc.accept(it)
+            mix.record(name, ok)
+            if ok:
+                it["id"] = nid()
+                bank["items"].append(it)
+                made += 1
+        sp.count = made
+        sp.args.update(attempts=attempts, saturated=list(mix.saturated))
+        unique.flush(accepted=made, rejected=attempts - made)
+    mix.report("matematik MC", made, target, attempts)
+
+    with span("generate:diagram", subject="matematik") as sp:
+        for k in range(max(0, diagrams)):
+            ds = make_bar_dataset()
+            it = ma_bar_max(ds) if k%2==0 else ma_bar_compare(ds)
             it["id"] = nid()
             bank["items"].append(it)
-
-    for k in range(max(0, diagrams)):
-        ds = make_bar_dataset()
-        it = ma_bar_max(ds) if k%2==0 else ma_bar_compare(ds)
-        it["id"] = nid()
-        bank["items"].append(it)
+        sp.count = max(0, diagrams)
 
     return bank
 
-def backfill(bank:dict):
-    """Säkerställ hint/explain/correct mm."""
+def backfill(bank:dict, start:Tuple[int,int]=(0,0)) -> int:
+    """Säkerställ hint/explain/correct mm. för poster från start = (item, passage).
+    Returnerar antal genomgångna poster."""
     def fix_mc(item:dict):
         opts = item.get("options")
         c = item.get("correct", 0)
@@ -645,39 +777,82 @@ def backfill(bank:dict):
             if not isinstance(c,int) or c<0 or c>=len(opts):
                 item["correct"] = 0
 
-    if "items" in bank:
-        for it in bank["items"]:
-            it.setdefault("type", it.get("type") or "mc")
-            it.setdefault("topic", bank.get("subject"))
-            it.setdefault("difficulty", "np")
-            if it["type"] in (None,"","mc","bar-max","bar-compare"):
-                fix_mc(it)
-            it.setdefault("hint", it.get("explain") or "Titta noga på frågan och alternativen.")
-            it.setdefault("explain", it.get("hint"))
-            # DnD: normalisera tokens → tiles
-            if it["type"] == "dnd":
-                if "tiles" not in it and "tokens" in it:
-                    it["tiles"] = it["tokens"]
-                if "buckets" not in it:
-                    it["buckets"] = [{"label":"A"},{"label":"B"}]
-                if "solution" not in it:
-                    # skapa neutral lösning (alla i första bucket) om saknas
-                    sol = {}
-                    for w in it.get("tiles", []):
-                        sol[w] = it["buckets"][0]["label"]
-                    it["solution"] = sol
-
-    if "passages" in bank:
-        for p in bank["passages"]:
-            for q in p.get("questions", []):
-                q.setdefault("topic", bank.get("subject"))
-                q.setdefault("difficulty", "np")
-                fix_mc(q)
-                q.setdefault("hint", "Läs texten noga och matcha nyckelord.")
-                q.setdefault("explain", "Läs texten noga och matcha nyckelord.")
+    items = bank.get("items") or []
+    passages = bank.get("passages") or []
+    for i in range(start[0], len(items)):
+        it = items[i]
+        it.setdefault("type", it.get("type") or "mc")
+        it.setdefault("topic", bank.get("subject"))
+        it.setdefault("difficulty", "np")
+        if it["type"] in (None,"","mc","bar-max","bar-compare"):
+            fix_mc(it)
+        it.setdefault("hint", it.get("explain") or "Titta noga på frågan och alternativen.")
+        it.setdefault("explain", it.get("hint"))
+        # DnD: normalisera tokens → tiles
+        if it["type"] == "dnd":
+            if "tiles" not in it and "tokens" in it:
+                it["tiles"] = it["tokens"]
+            if "buckets" not in it:
+                it["buckets"] = [{"label":"A"},{"label":"B"}]
+            if "solution" not in it:
+                # skapa neutral lösning (alla i första bucket) om saknas
+                sol = {}
+                for w in it.get("tiles", []):
+                    sol[w] = it["buckets"][0]["label"]
+                it["solution"] = sol
+
+    for i in range(start[1], len(passages)):
+        for q in passages[i].get("questions", []):
+            q.setdefault("topic", bank.get("subject"))
+            q.setdefault("difficulty", "np")
+            fix_mc(q)
+            q.setdefault("hint", "Läs texten noga och matcha nyckelord.")
+            q.setdefault("explain", "Läs texten noga och matcha nyckelord.")
+    return (len(items) - start[0]) + (len(passages) - start[1])
 
 # -------------------- main --------------------
 
+def build_and_write(args, out:Path):
+    profile = profile_for_level(args.level)
+    # sätt global tröskel för anti-repetition från CLI
+    global _MIN_DIFF
+    _MIN_DIFF = args.min_diff
+    # överstyr matte-hårda parametrar från CLI
+    profile["div_max_dividend"] = min(profile["div_max_dividend"], args.max_dividend)
+    profile["allow_nine"] = (args.allow_nine == "yes")
+
+    mixes = {"generator": generator_mix(args.subject, args)}
+    if args.subject == "svenska" and args.plan:
+        quotas = parse_sv_plan(args.plan, args.items, args.dnd, args.passages)
+        bank = build_svenska_planned(profile, quotas)
+        mixes = {"plan": plan_mix(quotas)}
+    elif args.subject == "svenska":
+        bank = build_svenska(profile, args.items, args.dnd, args.passages)
+    else:
+        bank = build_matematik(profile, args.items, args.diagrams)
+
+    bank["bankVersion"] = "1.0"
+    # För konsekvent form (single-subject bank)
+    bank = {"subject": args.subject, **bank}
+    write_bank(bank, out, args.id_scheme, mixes=mixes)
+
+def write_bank(bank:dict, out:Path, id_scheme:str="seq", mixes:Dict[str,Any]=None):
+    """Backfill, ev. hash-id, och skriv banken med facett-, sampling- och offsetfiler."""
+    # backfill säkerhet (banken byggs alltid från början, så ingen markör behövs)
+    with span("backfill") as sp:
+        sp.count = backfill(bank)
+    if id_scheme == "hash":
+        with span("ids", scheme="hash") as sp:
+            dropped = assign_hash_ids(bank)
+            sp.count = dropped
+        if dropped:
+            print(f"ℹ️ {dropped} dubbletter borttagna (samma innehållshash).")
+
+    write_json(out, bank)
+    write_facets(str(out), bank)
+    write_sampling(str(out), bank, mixes=mixes)
+    write_offsets(str(out))
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--subject", required=True, choices=["svenska","matematik"])
@@ -690,6 +865,7 @@ def main():
     # svenska
     ap.add_argument("--dnd", type=int, default=8, help="Antal drag&drop (svenska)")
     ap.add_argument("--passages", type=int, default=6, help="Antal läsförståelse-passager (svenska)")
+    ap.add_argument("--plan", type=str, default="", help="Exakta kvoter (svenska), t.ex. 'stavning=40,grammatik=40,ordförståelse=30,context=30,dnd-ordklasser=5,dnd-prepositioner=3,passages=6'")
     # matte
     ap.add_argument("--diagrams", type=int, default=16, help="Antal diagramfrågor (matematik)")
     ap.add_argument("--retune-division", choices=["yes","no"], default="yes")
@@ -701,34 +877,39 @@ def main():
     # allmänt
     ap.add_argument("--seed", type=int, default=None)
     ap.add_argument("--out", required=True)
+    add_id_scheme_arg(ap)
     ap.add_argument("--update-index", action="store_true")
+    add_cache_args(ap)
+    add_trace_arg(ap)
     args = ap.parse_args()
+    if args.plan:
+        try:
+            parse_sv_plan(args.plan, args.items, args.dnd, args.passages)
+        except ValueError as e:
+            ap.error(str(e))
+    start_trace(args)
 
     if args.seed is not None:
         RNG.seed(args.seed)
 
-    profile = profile_for_level(args.level)
-    # sätt global tröskel för anti-repetition från CLI
-    global _MIN_DIFF
-    _MIN_DIFF = args.min_diff
-    # överstyr matte-hårda parametrar från CLI
-    profile["div_max_dividend"] = min(profile["div_max_dividend"], args.max_dividend)
-    profile["allow_nine"] = (args.allow_nine == "yes")
-
-    if args.subject == "svenska":
-        bank = build_svenska(profile, args.items, args.dnd, args.passages)
-    else:
-        bank = build_matematik(profile, args.items, args.diagrams)
-
-    bank["bankVersion"] = "1.0"
-    # För konsekvent form (single-subject bank)
-    bank = {"subject": args.subject, **bank}
-
-    # backfill säkerhet
-    backfill(bank)
-
     out = (PROJECT_ROOT / args.out) if not os.path.isabs(args.out) else Path(args.out)
-    write_json(out, bank)
+    cache = BuildCache(
+        out,
+        script_files=[__file__, *helper_files()],
+        args=cache_args(args), seed=args.seed,
+        lexicon=lexicon_hash(HINTS_SV, GRAM_BANK, STAVNING_PAIRS, ORD_SYNONYM, ORD_MOTSATS,
+                             PASSAGES, NAMES, PLACES, OBJECTS, ACTIONS, HINTS_MA),
+        cache_dir=args.cache_dir, enabled=not args.no_cache,
+    )
+    with span("cache") as sp:
+        state = cache.check()
+        sp.args["state"] = state or "miss"
+    if state:
+        print("♻️ Oförändrad – samma fingeravtryck som befintlig fil." if state == "fresh"
+              else "♻️ Återställd från byggcache.")
+    else:
+        build_and_write(args, out)
+        cache.store([out, facets_path(str(out)), sampling_path(str(out)), offsets_path(str(out))])
 
     if args.update_index:
         # index vill ha path relativt /public/banks
@@ -741,12 +922,14 @@ def main():
             rel = p[ix+len("/public/banks/"):] if ix!=-1 else out.name
         update_index(args.bank_id, args.label, rel, args.subject, args.grade, args.desc)
 
-    print("✅ Ny bank skapad:")
+    print("✅ Ny bank skapad:" if not state else "✅ Bank klar:")
     print(f"  • Subject: {args.subject}")
     print(f"  • Label:   {args.label}")
     print(f"  • File:    {out}")
+    print(f"  • Facets:  {facets_path(str(out))}")
     if args.update_index:
         print(f"  • index.json uppdaterad med id '{args.bank_id}' → path '{rel}'")
     print("Tips: kör generators/verify_banks.py för att dubbelkolla banken.")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+difficulty_features.py – numeriska svårighetsdrag och poäng per fråga.
+
+src/lib/difficulty.js kan bara välja på etiketten difficulty (easy/np/hard).
+Det här verktyget räknar fram drag för varje fråga och skriver tillbaka en
+kompakt poäng "dscore" (0–1, två decimaler) så att klienten kan välja
+finkornigt utan att räkna något själv.
+
+Drag (alla skalade till 0–1):
+  matematik: mag (talens storlek), carry (minnessiffror/växlingar),
+             table (hur svår multiplikationstabellen är), dividend, close
+             (hur nära distraktorerna ligger rätt svar)
+  svenska:   wlen (ordlängd), plen (passagens längd), dsim (hur lika
+             distraktorerna är rätt svar)
+
+Dragen räknas fram fråga för fråga (vanlig Python-loop, extract_rows) och
+samlas i rader; poängen är ett viktat medel per rad (score_row).
+
+Kör:
+  python3 generators/difficulty_features.py public/banks/matematik.ak3.json
+  python3 generators/difficulty_features.py public/banks/*.ak3.json --features --dry-run
+"""
+import argparse, math, os, re, sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from bank_facets import write_facets
+from bank_io import iter_bank_records, read_json, write_json
+from bank_offsets import write_offsets
+from bank_trace import add_trace_arg, span, start_trace
+
+FEATURES = ("mag", "carry", "table", "dividend", "close", "wlen", "plen", "dsim")
+# Vikter i poängen; drag som saknas för en fråga räknas inte med
+WEIGHTS = {"mag": 1.0, "carry": 1.5, "table": 1.5, "dividend": 1.0, "close": 1.0,
+           "wlen": 1.0, "plen": 1.0, "dsim": 1.5}
+# Svårighet per multiplikationstabell (2, 5 och 10 är lätta, 6–9 svåra)
+TABLE_HARDNESS = {0: 0.0, 1: 0.0, 2: 0.1, 10: 0.1, 5: 0.2, 3: 0.5, 4: 0.5, 6: 0.8, 7: 1.0, 8: 0.9, 9: 0.8}
+
+MATH_RE = re.compile(r"(\d+)\s*([+\-−×x*·÷:/])\s*(\d+)")
+OPS = {"+": "+", "-": "-", "−": "-", "×": "*", "x": "*", "*": "*", "·": "*", "÷": "/", ":": "/", "/": "/"}
+TIME_RE = re.compile(r"^(\d{1,2})[:.](\d{2})$")
+WORD_RE = re.compile(r"[A-Za-zÅÄÖåäöÉéÜü]+")
+
+# ----------------- drag per fråga -----------------
+
+def _clip(x: float) -> float:
+    return 0.0 if x < 0 else 1.0 if x > 1 else x
+
+def _num(v: Any) -> Optional[float]:
+    if isinstance(v, bool):
+        return None
+    if isinstance(v, (int, float)):
+        return float(v)
+    s = str(v).strip().replace("−", "-")
+    m = TIME_RE.match(s)
+    if m:
+        return int(m.group(1)) * 60 + int(m.group(2))
+    try:
+        return float(s.replace(",", "."))
+    except ValueError:
+        return None
+
+def carries(a: int, b: int) -> int:
+    n, c = 0, 0
+    while a or b:
+        s = a % 10 + b % 10 + c
+        c = int(s >= 10)
+        n += c
+        a //= 10; b //= 10
+    return n
+
+def borrows(a: int, b: int) -> int:
+    n, br = 0, 0
+    while a or b:
+        d = a % 10 - br - b % 10
+        br = int(d < 0)
+        n += br
+        a //= 10; b //= 10
+    return n
+
+def closeness(options: List[Any], correct: Any) -> Optional[float]:
+    """Medel av exp(-|d-c|/skala) över distraktorerna (1 = mycket nära)."""
+    if not isinstance(options, list) or not isinstance(correct, int) or not 0 <= correct < len(options):
+        return None
+    c = _num(options[correct])
+    if c is None:
+        return None
+    scale = max(1.0, abs(c) * 0.2)
+    vals = []
+    for i, o in enumerate(options):
+        if i == correct:
+            continue
+        d = _num(o)
+        if d is None:
+            return None
+        vals.append(math.exp(-abs(d - c) / scale))
+    return sum(vals) / len(vals) if vals else None
+
+def _bigrams(s: str) -> set:
+    s = f" {s.lower().strip()} "
+    return {s[i:i + 2] for i in range(len(s) - 1)}
+
+def text_similarity(a: str, b: str) -> float:
+    """Dice-koefficient på teckenbigram."""
+    x, y = _bigrams(a), _bigrams(b)
+    return 2 * len(x & y) / (len(x) + len(y)) if x and y else 0.0
+
+def distractor_similarity(options: List[Any], correct: Any) -> Optional[float]:
+    if not isinstance(options, list) or not isinstance(correct, int) or not 0 <= correct < len(options):
+        return None
+    c = str(options[correct])
+    sims = [text_similarity(c, str(o)) for i, o in enumerate(options) if i != correct]
+    return sum(sims) / len(sims) if sims else None
+
+def math_features(rec: Dict[str, Any]) -> Dict[str, float]:
+    f: Dict[str, float] = {}
+    cl = closeness(rec.get("options"), rec.get("correct"))
+    if cl is not None:
+        f["close"] = cl
+    chart = rec.get("chart") or {}
+    values = [v for v in (chart.get("values") or []) if isinstance(v, (int, float))]
+    if values:
+        f["mag"] = _clip(math.log10(max(values) + 1) / 3)
+    m = MATH_RE.search(str(rec.get("q") or ""))
+    if not m:
+        return f
+    a, op, b = int(m.group(1)), OPS[m.group(2)], int(m.group(3))
+    f["mag"] = _clip(math.log10(max(a, b) + 1) / 3)
+    if op == "+":
+        f["carry"] = _clip(carries(a, b) / 2)
+    elif op == "-":
+        f["carry"] = _clip(borrows(a, b) / 2)
+    elif op == "*":
+        f["table"] = max(TABLE_HARDNESS.get(a, 1.0), TABLE_HARDNESS.get(b, 1.0))
+    elif op == "/":
+        f["table"] = TABLE_HARDNESS.get(b, 1.0)
+        f["dividend"] = _clip(a / 100)
+    return f
+
+def svenska_features(rec: Dict[str, Any], passage: Dict[str, Any] = None) -> Dict[str, float]:
+    f: Dict[str, float] = {}
+    opts, c = rec.get("options"), rec.get("correct")
+    if isinstance(opts, list) and isinstance(c, int) and 0 <= c < len(opts):
+        words = WORD_RE.findall(str(opts[c]))
+    else:
+        words = WORD_RE.findall(" ".join(str(t) for t in (rec.get("tiles") or [])) or str(rec.get("q") or ""))
+    if words:
+        f["wlen"] = _clip((sum(len(w) for w in words) / len(words) - 3) / 7)
+    if passage is not None:
+        f["plen"] = _clip(len(str(passage.get("text") or "").split()) / 150)
+    ds = distractor_similarity(opts, c)
+    if ds is not None:
+        f["dsim"] = ds
+    return f
+
+def subject_of(data: Dict[str, Any], rec: Dict[str, Any]) -> str:
+    s = (rec.get("topic") or data.get("subject") or "").lower()
+    if s:
+        return s
+    return "matematik" if "matematik" in data else "svenska"
+
+# ----------------- poäng -----------------
+
+def extract_rows(data: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[List[float]]]:
+    """
+    -> (poster, rader), en post i taget. Varje rad har 2*len(FEATURES) tal:
+    värde och närvaro (0/1) per drag, i FEATURES-ordning.
+    """
+    recs, rows = [], []
+    for kind, rec, passage in iter_bank_records(data):
+        if kind == "passage":
+            continue
+        subj = subject_of(data, rec)
+        f = math_features(rec) if subj == "matematik" else svenska_features(rec, passage)
+        if not f:
+            continue
+        recs.append(rec)
+        rows.append([f.get(k, 0.0) for k in FEATURES] + [1.0 if k in f else 0.0 for k in FEATURES])
+    return recs, rows
+
+def score_row(row: List[float]) -> float:
+    """Viktat medel av närvarande drag, avrundat till två decimaler."""
+    k = len(FEATURES)
+    num = sum(row[i] * row[k + i] * WEIGHTS[f] for i, f in enumerate(FEATURES))
+    den = sum(row[k + i] * WEIGHTS[f] for i, f in enumerate(FEATURES))
+    return round(num / den, 2)
+
+def score_bank(data: Dict[str, Any], features: bool = False) -> int:
+    """Sätt dscore (och ev. dfeat) på alla frågor med minst ett drag. Returnerar antal."""
+    with span("features") as sp:
+        recs, rows = extract_rows(data)
+        sp.count = len(recs)
+    k = len(FEATURES)
+    with span("score") as sp:
+        for rec, row in zip(recs, rows):
+            rec["dscore"] = score_row(row)
+            if features:
+                rec["dfeat"] = {f: round(row[i], 2) for i, f in enumerate(FEATURES) if row[k + i]}
+            else:
+                rec.pop("dfeat", None)
+        sp.count = len(recs)
+    return len(recs)
+
+# ----------------- main -----------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Räkna svårighetsdrag och skriv dscore (0–1) på varje fråga")
+    ap.add_argument("banks", nargs="+", help="Bankfiler (.json)")
+    ap.add_argument("--features", action="store_true", help="Skriv även dragen som dfeat per fråga")
+    ap.add_argument("--dry-run", action="store_true", help="Skriv bara statistik, ändra inga filer")
+    add_trace_arg(ap)
+    args = ap.parse_args()
+    start_trace(args)
+
+    for p in args.banks:
+        if not os.path.isfile(p):
+            print("⚠️ Hittar inte fil:", p)
+            sys.exit(1)
+        data = read_json(p, copy=args.dry_run)
+        n = score_bank(data, features=args.features)
+        scores = [rec["dscore"] for _, rec, _ in iter_bank_records(data) if "dscore" in rec]
+        if scores:
+            s = sorted(scores)
+            q = lambda f: s[min(len(s) - 1, int(f * len(s)))]
+            print(f"✅ {os.path.basename(p)}: {n} frågor poängsatta "
+                  f"(min {s[0]:.2f}, median {q(0.5):.2f}, p90 {q(0.9):.2f}, max {s[-1]:.2f})")
+        else:
+            print(f"ℹ️ {os.path.basename(p)}: inga frågor med mätbara drag")
+        if args.dry_run or not n:
+            continue
+        write_json(p, data)
+        write_facets(p, data)
+        write_offsets(p)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+exam_sets.py – förberäknar balanserade provomgångar utifrån en blueprint.
+
+Provläget i appen drar frågor på klienten och kan inte garantera NP-lik
+täckning av områden. Det här verktyget läser en bank + en blueprint och
+skriver <bank>.exams.json med färdiga omgångar som kompakta id-listor.
+Samma seed ger samma omgångar.
+
+Blueprint (JSON):
+  {
+    "size": 20,                                   # antal fristående frågor per omgång
+    "areas": {"addition": 3, "subtraktion": 3, "division": 3, "diagram": 4},
+    "types": {"bar-max": 1, "bar-compare": 1},    # antal per typ
+    "difficulty": {"np": 0.7, "easy": 0.15, "hard": 0.15},   # andelar av size
+    "passages": 1,                                # antal hela läsförståelse-passager
+    "sets": 1000,                                 # hur många omgångar
+    "maxExposure": 100,                           # högst i så många omgångar per fråga/passage (null = ingen gräns)
+    "disjoint": false                             # true = ingen fråga i mer än en omgång (maxExposure 1)
+  }
+
+Lösaren är girig: frågorna grupperas i celler (område, typ, svårighet) och
+varje plats fylls från den cell som minskar flest öppna kvoter. Inom en cell
+tas minst använda frågan först, så exponeringen sprids jämnt mellan omgångar.
+Lika bra celler väljs med vikt efter antal kvarvarande frågor, så att fria
+platser inte tömmer små celler som andra kvoter behöver.
+En fråga som nått maxExposure tas inte mer; räcker banken då inte till en hel
+omgång slutar lösaren där.
+
+Kvoter som banken inte kan bära (kvot × sets > antal frågor × maxExposure)
+varnas för innan lösningen, och efteråt listas varje kvot som inte uppfylldes
+med antal omgångar och saknade frågor (också i rapporten, "unmet").
+
+Kör:
+  python3 generators/exam_sets.py \
+    --bank public/banks/matematik.ak3.json \
+    --blueprint generators/blueprints/matematik.ak3.json \
+    --seed 3
+"""
+import argparse, hashlib, json, os, random, sys
+from collections import Counter, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import bank_codec
+from bank_facets import iter_bank_records
+from bank_io import sidecar_path
+from bank_trace import add_trace_arg, span, start_trace
+
+EXAMS_VERSION = 1
+EXAMS_SUFFIX = ".exams.json"
+
+def exams_path(bank_path: str) -> str:
+    return sidecar_path(bank_path, EXAMS_SUFFIX)
+
+def load_blueprint(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        bp = json.load(f)
+    bp.setdefault("size", 20)
+    bp.setdefault("areas", {})
+    bp.setdefault("types", {})
+    bp.setdefault("difficulty", {})
+    bp.setdefault("passages", 0)
+    bp.setdefault("sets", 100)
+    bp.setdefault("maxExposure", None)
+    bp.setdefault("disjoint", False)
+    return bp
+
+DIMS = ("area", "type", "difficulty")
+
+def exposure_cap(bp: Dict[str, Any]) -> Optional[int]:
+    if bp["disjoint"]:
+        return 1
+    return int(bp["maxExposure"]) if bp.get("maxExposure") else None
+
+def difficulty_quotas(mix: Dict[str, float], size: int) -> Dict[str, int]:
+    """Andelar -> heltal som summerar till size (största rest först)."""
+    if not mix:
+        return {}
+    total = sum(max(0.0, float(v)) for v in mix.values()) or 1.0
+    raw = {k: size * max(0.0, float(v)) / total for k, v in mix.items()}
+    out = {k: int(v) for k, v in raw.items()}
+    rest = size - sum(out.values())
+    for k in sorted(raw, key=lambda k: raw[k] - out[k], reverse=True)[:max(0, rest)]:
+        out[k] += 1
+    return out
+
+def _cell_key(it: Dict[str, Any]) -> Tuple[str, str, str]:
+    return (it.get("area") or "okänd", it.get("type") or "mc", it.get("difficulty") or "np")
+
+def quota_shortfalls(items: List[Dict[str, Any]], passages: List[Dict[str, Any]],
+                     bp: Dict[str, Any]) -> List[str]:
+    """Kvoter som banken inte räcker till för alla omgångar med exponeringsgränsen."""
+    sets, cap = int(bp["sets"]), exposure_cap(bp)
+    supply = [Counter(), Counter(), Counter()]
+    for it in items:
+        if it.get("id"):
+            for dim, val in enumerate(_cell_key(it)):
+                supply[dim][val] += 1
+    quotas = [bp["areas"], bp["types"], difficulty_quotas(bp["difficulty"], int(bp["size"]))]
+    out = []
+    for dim, q in enumerate(quotas):
+        for val, n in q.items():
+            n, have = int(n), supply[dim][val]
+            if n > have or (cap and n * sets > have * cap):
+                out.append(f"{DIMS[dim]} {val}: kvot {n} × {sets} omgångar, banken har {have} frågor"
+                           + (f" × max exponering {cap}" if cap else ""))
+    npas, have = int(bp["passages"]), sum(1 for p in passages if p.get("id"))
+    if npas and (npas > have or (cap and npas * sets > have * cap)):
+        out.append(f"passager: {npas} × {sets} omgångar, banken har {have}"
+                   + (f" × max exponering {cap}" if cap else ""))
+    return out
+
+class ExamSolver:
+    """Girig kvotlösare över celler (område, typ, svårighet)."""
+    def __init__(self, items: List[Dict[str, Any]], passages: List[Dict[str, Any]], bp: Dict[str, Any], rng: random.Random):
+        self.bp = bp
+        self.size = int(bp["size"])
+        self.quotas = {
+            0: {k: int(v) for k, v in bp["areas"].items()},
+            1: {k: int(v) for k, v in bp["types"].items()},
+            2: difficulty_quotas(bp["difficulty"], self.size),
+        }
+        self.disjoint = bool(bp["disjoint"])
+        self.cap = exposure_cap(bp)
+        cells: Dict[Tuple[str, str, str], List[str]] = {}
+        for it in items:
+            if it.get("id"):
+                cells.setdefault(_cell_key(it), []).append(it["id"])
+        # deque per cell: vänster = minst använd; använda roteras till höger
+        self.cells: Dict[Tuple[str, str, str], deque] = {}
+        for key in sorted(cells):
+            ids = cells[key]
+            rng.shuffle(ids)
+            self.cells[key] = deque(ids)
+        pids = [p["id"] for p in passages if p.get("id")]
+        rng.shuffle(pids)
+        self.passages = deque(pids)
+        self.rng = rng
+        self.usage: Counter = Counter()
+
+    def _score(self, key: Tuple[str, str, str], need: Dict[int, Counter]) -> int:
+        s = 0
+        for dim, val in enumerate(key):
+            q = self.quotas[dim]
+            if not q:
+                continue
+            if need[dim][val] > 0:
+                s += 2
+            elif val in q or any(n > 0 for n in need[dim].values()):
+                # kvoten för värdet är redan fylld, eller platsen behövs till annat
+                s -= 1
+        return s
+
+    def _take(self, key: Tuple[str, str, str], chosen: set):
+        dq = self.cells[key]
+        if not dq:
+            return None
+        if self.disjoint:
+            return dq.popleft()
+        for _ in range(len(dq)):
+            cand = dq[0]
+            if self.cap and self.usage[cand] >= self.cap:
+                dq.popleft()  # uttjänt: lämnar cellen för gott
+                continue
+            dq.rotate(-1)
+            if cand not in chosen:
+                return cand
+        return None
+
+    def next_set(self) -> Dict[str, Any]:
+        need = {dim: Counter(q) for dim, q in self.quotas.items()}
+        chosen: List[str] = []
+        chosen_set: set = set()
+        blocked: set = set()
+        while len(chosen) < self.size:
+            best, best_score = [], None
+            for key, dq in self.cells.items():
+                if not dq or key in blocked:
+                    continue
+                sc = self._score(key, need)
+                if best_score is None or sc > best_score:
+                    best, best_score = [key], sc
+                elif sc == best_score:
+                    best.append(key)
+            if not best:
+                break
+            # lika bra celler: vikta efter kvarvarande frågor så att små celler inte töms av fria platser
+            key = self.rng.choices(best, weights=[len(self.cells[k]) for k in best])[0]
+            iid = self._take(key, chosen_set)
+            if iid is None:
+                blocked.add(key)
+                continue
+            chosen.append(iid)
+            chosen_set.add(iid)
+            for dim, val in enumerate(key):
+                need[dim][val] -= 1
+        pas: List[str] = []
+        for _ in range(int(self.bp["passages"])):
+            if not self.passages:
+                break
+            pid = self.passages.popleft()
+            if pid in pas:
+                self.passages.appendleft(pid)
+                break
+            pas.append(pid)
+            if not self.disjoint and (not self.cap or self.usage[pid] + 1 < self.cap):
+                self.passages.append(pid)
+        for iid in chosen + pas:
+            self.usage[iid] += 1
+        unmet = {f"{DIMS[dim]}:{val}": n for dim, q in need.items() for val, n in q.items() if n > 0}
+        return {"items": chosen, "passages": pas, "_unmet": unmet}
+
+def solve(bank: Dict[str, Any], bp: Dict[str, Any], seed: int = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    items = [rec for kind, rec, _ in iter_bank_records(bank) if kind == "item"]
+    passages = [rec for kind, rec, _ in iter_bank_records(bank) if kind == "passage"]
+    solver = ExamSolver(items, passages, bp, random.Random(seed))
+    sets: List[Dict[str, Any]] = []
+    exact = 0
+    unmet: Dict[str, Dict[str, int]] = {}
+    for _ in range(int(bp["sets"])):
+        s = solver.next_set()
+        if len(s["items"]) < solver.size or len(s["passages"]) < int(bp["passages"]):
+            break  # banken räcker inte till fler kompletta omgångar
+        miss = s.pop("_unmet")
+        exact += int(not miss)
+        for key, n in miss.items():
+            u = unmet.setdefault(key, {"sets": 0, "missing": 0})
+            u["sets"] += 1
+            u["missing"] += n
+        sets.append(s)
+    used = solver.usage
+    report = {
+        "requested": int(bp["sets"]),
+        "produced": len(sets),
+        "allQuotasMet": exact,
+        "unmet": dict(sorted(unmet.items())),
+        "shortfalls": quota_shortfalls(items, passages, bp),
+        "itemsUsed": sum(1 for it in items if used[it.get("id")]),
+        "itemsTotal": len(items),
+        "maxExposure": max(used.values()) if used else 0,
+        "exposureCap": solver.cap,
+    }
+    return sets, report
+
+def main():
+    ap = argparse.ArgumentParser(description="Förberäkna balanserade provomgångar (blueprint → <bank>.exams.json)")
+    ap.add_argument("--bank", required=True, help="Bankfil (.json)")
+    ap.add_argument("--blueprint", required=True, help="Blueprint (.json), se skriptets docstring")
+    ap.add_argument("--sets", type=int, default=None, help="Överstyr blueprintens 'sets'")
+    ap.add_argument("--max-exposure", type=int, default=None, help="Överstyr blueprintens 'maxExposure' (0 = ingen gräns)")
+    ap.add_argument("--seed", type=int, default=0, help="Seed för reproducerbara omgångar (default 0)")
+    ap.add_argument("--out", default=None, help="Utfil (default: <bank>.exams.json)")
+    add_trace_arg(ap)
+    args = ap.parse_args()
+    start_trace(args)
+
+    if not os.path.isfile(args.bank):
+        print("❌ Hittar inte fil:", args.bank)
+        sys.exit(1)
+    bp = load_blueprint(args.blueprint)
+    if args.sets is not None:
+        bp["sets"] = args.sets
+    if args.max_exposure is not None:
+        bp["maxExposure"] = args.max_exposure or None
+    quota_sum = sum(int(v) for v in bp["areas"].values())
+    if quota_sum > int(bp["size"]):
+        print(f"⚠️ Områdeskvoterna ({quota_sum}) är fler än size ({bp['size']}) – alla kan inte uppfyllas.")
+
+    with span("read", file=os.path.basename(args.bank)) as sp:
+        with open(args.bank, "rb") as f:
+            raw = f.read()
+        sp.count = len(raw)
+        bank = bank_codec.loads(raw)
+    with span("solve", sets=bp["sets"]) as sp:
+        sets, report = solve(bank, bp, args.seed)
+        sp.count = report["produced"]
+
+    out = args.out or exams_path(args.bank)
+    doc = {
+        "version": EXAMS_VERSION,
+        "bank": os.path.basename(args.bank),
+        "sha1": hashlib.sha1(raw).hexdigest(),
+        "seed": args.seed,
+        "blueprint": bp,
+        "report": report,
+        "sets": sets,
+    }
+    bank_codec.dump_file(out, doc, pretty=False)
+
+    for s in report["shortfalls"]:
+        print(f"⚠️ Banken räcker inte till kvoten – {s}")
+    print(f"✅ Skrev {out}: {report['produced']}/{report['requested']} omgångar "
+          f"({report['allQuotasMet']} med alla kvoter uppfyllda)")
+    cap = report["exposureCap"]
+    print(f"  • Frågor använda: {report['itemsUsed']}/{report['itemsTotal']}, max exponering: {report['maxExposure']}"
+          + (f" (gräns {cap})" if cap else ""))
+    for key, u in report["unmet"].items():
+        dim, _, val = key.partition(":")
+        print(f"⚠️ Kvot ej uppfylld – {dim} {val}: i {u['sets']}/{report['produced']} omgångar "
+              f"({u['missing']} frågor saknas totalt)")
+    if report["produced"] < report["requested"]:
+        print("⚠️ Banken räckte inte till alla omgångar (exponeringsgräns, disjoint eller för få passager/frågor).")
+
+if __name__ == "__main__":
+    main()
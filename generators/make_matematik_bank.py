@@ -16,12 +16,31 @@ python3 generators/make_matematik_bank.py \
 Byt ut items helt:
   ... --replace
 
+Radformat (append i O(nya frågor), se bank_ndjson.py):
+  ... --out build/matematik.ndjson
+
 Behåll gammal fördelning på MC-frågor men lägg till NP-uppgifter:
   --plan "addition=30,subtraktion=30,multiplikation=30,division=30,taluppfattning=20,geometri=10,klockan=5,mätning=5,problem=0"
+
+Strategitips: generatorerna skickar sina tal (operander) direkt till
+strategy_for(område, a, b, ledtråd), som är memoiserad – samma (område, tal)
+ger samma sträng-objekt. Med --hint-refs skrivs varje tips en gång i bankens
+"hints"-tabell och frågorna får "hintRef" i stället för hint/explain
+(se bank_io.ref_hints; appen och verify_banks slår upp referensen).
 """
-import json, random, re, argparse
+import random, re, argparse
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
+
+from bank_facets import facets_path, write_facets
+from bank_ids import add_id_scheme_arg, assign_hash_ids
+from bank_trace import add_trace_arg, span, start_trace
+from bank_io import read_legacy_bank, ref_hints, write_json
+from bank_ndjson import append_ndjson, content_hashes, is_ndjson, last_checkpoint, write_ndjson
+from bank_offsets import offsets_path, write_offsets
+from bank_sampling import sampling_path, write_sampling
+from build_cache import BuildCache, add_cache_args, cache_args, helper_files, lexicon_hash
 
 AREAS = [
     "addition","subtraktion","multiplikation","division",
@@ -60,16 +79,7 @@ def parse_plan(plan: str, total: int) -> Dict[str,int]:
     return out
 
 def read_existing(path: Path) -> dict:
-    if not path.exists():
-        return {"bankVersion":"1.0","matematik":{"items":[]}}
-    try:
-        data = json.loads(path.read_text(encoding="utf-8"))
-    except Exception:
-        data = {}
-    if "bankVersion" not in data: data["bankVersion"] = "1.0"
-    if "matematik" not in data: data["matematik"] = {"items":[]}
-    if "items" not in data["matematik"]: data["matematik"]["items"] = []
-    return data
+    return read_legacy_bank(path, "matematik")
 
 def next_id(items: List[dict]) -> int:
     mx = 0
@@ -121,11 +131,24 @@ def tallinje(start: int, slut: int, steg: int) -> str:
         if limit <= 0: break
     return "  →  ".join(map(str, pts))
 
-def build_math_strategy(area: str, prompt: str) -> str:
+# Ordledtrådar i frågetexten som väljer strategi (utöver talen)
+STRATEGY_CUES = ("tiotal", "störst", "halv", "kvart", "hörn", "har ", "får ")
+
+def strategy_cues(prompt: str) -> Tuple[str, ...]:
+    """Ledtrådarna som finns i frågetexten."""
     txt = prompt.lower()
-    nums = list(map(int, re.findall(r"-?\d+", txt)))
+    return tuple(c for c in STRATEGY_CUES if c in txt)
+
+def build_math_strategy(area: str, prompt: str) -> str:
+    """Strategi ur frågetexten (för frågor utan strukturerade operander)."""
+    nums = list(map(int, re.findall(r"-?\d+", prompt.lower())))
     a = nums[0] if len(nums) > 0 else None
     b = nums[1] if len(nums) > 1 else None
+    return strategy_for(area, a, b, strategy_cues(prompt))
+
+@lru_cache(maxsize=None)
+def strategy_for(area: str, a: Optional[int] = None, b: Optional[int] = None, cues: Tuple[str, ...] = ()) -> str:
+    """Tipstext för (område, operander, ledtrådar); cachad så att samma tips delas som objekt."""
     ar = area.lower()
 
     if "addition" in ar:
@@ -172,25 +195,25 @@ f"🎯 Gör en tia:\n• {big} + {till_tio} = {big + till_tio}\n• Lägg på re
         return "🎯 “Hur många grupper?”. Använd en tabell du kan och närma dig."
 
     if "taluppfattning" in ar:
-        if "tiotal" in txt and a is not None:
+        if "tiotal" in cues and a is not None:
             return (f"🎯 Dela upp i tiotal/ental:\n• {a} = {a//10} tiotal och {a%10} ental.")
-        if "störst" in txt:
+        if "störst" in cues:
             return "🎯 Jämför först tiotalen. Om lika – jämför entalen."
         return "🎯 Dela upp tal i tiotal/ental. Resonera på tiotal först."
 
     if "klockan" in ar:
-        if "halv" in txt: return "🎯 “Halv tre” = 30 min innan tre → …:30."
-        if "kvart" in txt: return "🎯 Kvart = 15 min. 'Kvart över X'=X:15, 'Kvart i X'=(X−1):45."
+        if "halv" in cues: return "🎯 “Halv tre” = 30 min innan tre → …:30."
+        if "kvart" in cues: return "🎯 Kvart = 15 min. 'Kvart över X'=X:15, 'Kvart i X'=(X−1):45."
         return "🎯 60 min per varv. Halv = :30, kvart = :15 eller :45."
 
     if "mätning" in ar:
         return "🎯 Prefix: 1 m = 100 cm, 1 km = 1000 m, 1 kg = 1000 g."
 
     if "geometri" in ar:
-        if "hörn" in txt: return "🎯 Räkna hörn. Kvadrat har 4 hörn och 4 lika sidor."
+        if "hörn" in cues: return "🎯 Räkna hörn. Kvadrat har 4 hörn och 4 lika sidor."
         return "🎯 Titta på antal sidor/hörn och om sidorna är lika långa."
 
-    if "problem" in ar or "har " in txt or "får " in txt:
+    if "problem" in ar or "har " in cues or "får " in cues:
         return "🎯 Mini-ekvation: start ± förändring = svar. Rita hoppen mentalt."
 
     return "🎯 Dela upp i enkla steg: sikta på 10/100, dubbla/halvera, överslag."
@@ -202,56 +225,62 @@ def gen_addition() -> Dict:
     q = f"{a} + {b} ="; correct = a + b
     pool = [str(correct + d) for d in [-10,-2,-1,1,2,10] if correct + d >= 0]
     opts, ci = unique_options_with_correct(str(correct), pool)
-    return {"area":"addition","q":q,"options":opts,"correct":ci}
+    return {"area":"addition","q":q,"options":opts,"correct":ci,"_ops":(a, b, ())}
 
 def gen_subtraktion() -> Dict:
     a = random.randint(8, 99); b = random.randint(2, min(20, a-1))
     q = f"{a} − {b} ="; correct = a - b
     pool = [str(correct + d) for d in [-10,-2,-1,1,2,10] if correct + d >= 0]
     opts, ci = unique_options_with_correct(str(correct), pool)
-    return {"area":"subtraktion","q":q,"options":opts,"correct":ci}
+    return {"area":"subtraktion","q":q,"options":opts,"correct":ci,"_ops":(a, b, ())}
 
 def gen_multiplikation() -> Dict:
     a = random.randint(2, 9); b = random.randint(2, 9)
     q = f"{a} × {b} ="; correct = a * b
     pool = [str(correct + d) for d in [-10,-2,-1,1,2,10] if correct + d >= 0]
     opts, ci = unique_options_with_correct(str(correct), pool)
-    return {"area":"multiplikation","q":q,"options":opts,"correct":ci}
+    return {"area":"multiplikation","q":q,"options":opts,"correct":ci,"_ops":(a, b, ())}
 
 def gen_division() -> Dict:
     b = random.randint(2, 9); mult = random.randint(2, 10); a = b * mult
     q = f"{a} ÷ {b} ="; correct = mult
     pool = [str(correct + d) for d in [-2,-1,1,2] if correct + d > 0]
     opts, ci = unique_options_with_correct(str(correct), pool)
-    return {"area":"division","q":q,"options":opts,"correct":ci}
+    return {"area":"division","q":q,"options":opts,"correct":ci,"_ops":(a, b, ())}
 
 def gen_taluppfattning() -> Dict:
     n = random.randint(11, 99)
     if random.random() < 0.5:
         q = f"Hur många tiotal i {n}?"; correct_text = str(n // 10)
         pool = [str(n//10 + d) for d in [-1,1,2,-2] if n//10 + d >= 0]
+        ops = (n, None, ("tiotal",))
     else:
         a, b = sorted(random.sample(range(30, 60), 2))
         q = "Vilket tal är störst?"; correct_text = str(max(a,b))
         pool = [str(x) for x in {a,b,a-1,a+1,b-1,b+1} if str(x) != correct_text]
+        ops = (None, None, ("störst",))
     opts, ci = unique_options_with_correct(correct_text, pool)
-    return {"area":"taluppfattning","q":q,"options":opts,"correct":ci}
+    return {"area":"taluppfattning","q":q,"options":opts,"correct":ci,"_ops":ops}
 
 def gen_geometri() -> Dict:
     if random.random() < 0.5:
         q = "Hur många hörn har en kvadrat?"; correct_text = "4"; pool = ["2","3","5","6"]
+        ops = (None, None, ("hörn",))
     else:
         q = "Vilken figur har alla sidor lika långa?"; correct_text = "Kvadrat"; pool = ["Rektangel","Triangel","Romb"]
+        ops = (None, None, ())
     opts, ci = unique_options_with_correct(correct_text, pool)
-    return {"area":"geometri","q":q,"options":opts,"correct":ci}
+    return {"area":"geometri","q":q,"options":opts,"correct":ci,"_ops":ops}
 
 def gen_klockan() -> Dict:
     if random.random() < 0.5:
         q = "Halv tre i digital tid:"; correct_text = "02:30"; pool = ["03:30","15:30","14:30"]
+        ops = (None, None, ("halv",))
     else:
         q = "Kvart i fem i digital tid:"; correct_text = "16:45"; pool = ["05:15","17:15","17:45"]
+        ops = (None, None, ("kvart",))
     opts, ci = unique_options_with_correct(correct_text, pool)
-    return {"area":"klockan","q":q,"options":opts,"correct":ci}
+    return {"area":"klockan","q":q,"options":opts,"correct":ci,"_ops":ops}
 
 def gen_mätning() -> Dict:
     if random.random() < 0.5:
@@ -259,7 +288,7 @@ def gen_mätning() -> Dict:
     else:
         q = "1 kg = ___ g"; correct_text = "1000"; pool = ["100","10","500"]
     opts, ci = unique_options_with_correct(correct_text, pool)
-    return {"area":"mätning","q":q,"options":opts,"correct":ci}
+    return {"area":"mätning","q":q,"options":opts,"correct":ci,"_ops":(None, None, ())}
 
 def gen_problem() -> Dict:
     a = random.randint(5, 20); b = random.randint(3, 15)
@@ -269,7 +298,7 @@ def gen_problem() -> Dict:
         q = f"Ali har {a} äpplen och ger bort {b}. Hur många har han kvar?"; correct = a - b
     pool = [str(correct + d) for d in [-2,-1,1,2,5] if correct + d >= 0]
     opts, ci = unique_options_with_correct(str(correct), pool)
-    return {"area":"problem","q":q,"options":opts,"correct":ci}
+    return {"area":"problem","q":q,"options":opts,"correct":ci,"_ops":(a, b, ())}
 
 GEN_BY_AREA = {
     "addition": gen_addition,
@@ -414,63 +443,134 @@ def gen_chance_matrix_np() -> Dict:
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--out", required=True, help="Sökväg till matematik.json")
+    ap.add_argument("--out", required=True, help="Sökväg till matematik.json (eller .ndjson för radformat)")
     ap.add_argument("--items", type=int, default=200, help="Antal MC-frågor (vanliga) att skapa")
     ap.add_argument("--plan", type=str, default="", help="Fördelning för MC, t.ex. 'addition=40,subtraktion=40,...'")
     ap.add_argument("--seed", type=int, default=None)
     ap.add_argument("--replace", action="store_true", help="Skriv över items helt (annars append)")
+    add_id_scheme_arg(ap)
+    ap.add_argument("--hint-refs", action="store_true",
+                    help="Lägg identiska tips en gång i bankens \"hints\"-tabell och referera med hintRef (bara .json)")
 
     # nya NP-typer (antal per körning)
     ap.add_argument("--table", type=int, default=0, help="Antal table-fill uppgifter")
     ap.add_argument("--pie", type=int, default=0, help="Antal pie-assign uppgifter")
     ap.add_argument("--chance", type=int, default=0, help="Antal chance-matrix uppgifter")
 
+    add_cache_args(ap)
+    add_trace_arg(ap)
     args = ap.parse_args()
+    start_trace(args)
     if args.seed is not None:
         random.seed(args.seed)
 
     out = Path(args.out)
-    data = read_existing(out)
-    items = data["matematik"]["items"]
-
-    if args.replace:
-        items = []
+    if args.hint_refs and is_ndjson(out):
+        ap.error("--hint-refs stöds bara för .json-utdata")
+    cache = BuildCache(
+        out,
+        script_files=[__file__, *helper_files()],
+        args=cache_args(args), seed=args.seed,
+        lexicon=lexicon_hash(AREAS),
+        input_path=None if args.replace else str(out),
+        cache_dir=args.cache_dir, enabled=not args.no_cache,
+    )
+    with span("cache") as sp:
+        state = cache.check()
+        sp.args["state"] = state or "miss"
+    if state:
+        print("♻️ Oförändrad – samma fingeravtryck som befintlig fil." if state == "fresh"
+              else "♻️ Återställd från byggcache.", out)
+        return
+
+    # NDJSON + append: läs bara sista checkpoint och skriv bara nya rader
+    with span("id-scan") as sp:
+        append_lines = is_ndjson(out) and out.exists() and not args.replace
+        if append_lines:
+            cp = last_checkpoint(str(out))
+            nid = (cp or {}).get("next", {}).get("item") \
+                or next_id([{"id": i} for i in content_hashes(str(out))["items"]])
+            data = {"bankVersion": "1.0", "matematik": {"items": []}}
+            items = []
+        else:
+            data = read_existing(out)
+            items = data["matematik"]["items"]
+            if args.replace:
+                items = []
+            nid = next_id(items)
+        sp.args["next"] = nid
 
     # 1) Generera MC-frågor enligt plan
     plan = parse_plan(args.plan, args.items)
-    nid = next_id(items)
     created = []
 
-    for area, count in plan.items():
-        gen = GEN_BY_AREA.get(area)
-        if not gen or count <= 0: continue
-        for _ in range(count):
-            q = gen()
-            q["id"] = f"ma-{nid:03d}"
-            nid += 1
-            # hint/explain (icke-avslöjande) för matte
-            q["hint"] = build_math_strategy(q["area"], q["q"])
-            q["explain"] = q["hint"]
-            # difficulty lämnas tom/implicit (filtreras med np via specialtyper)
-            created.append(q)
+    with span("generate:mc", subject="matematik") as sp:
+        for area, count in plan.items():
+            gen = GEN_BY_AREA.get(area)
+            if not gen or count <= 0: continue
+            for _ in range(count):
+                q = gen()
+                q["id"] = f"ma-{nid:03d}"
+                nid += 1
+                # hint/explain (icke-avslöjande) för matte – ur operanderna när generatorn lämnar dem
+                ops = q.pop("_ops", None)
+                q["hint"] = strategy_for(q["area"], *ops) if ops else build_math_strategy(q["area"], q["q"])
+                q["explain"] = q["hint"]
+                # difficulty lämnas tom/implicit (filtreras med np via specialtyper)
+                created.append(q)
+        sp.count = len(created)
 
     # 2) Lägg till NP-typer enligt flaggor
-    for _ in range(max(0, args.table)):
-        q = gen_table_fill_np(); q["id"] = f"ma-{nid:03d}"; nid += 1; created.append(q)
-    for _ in range(max(0, args.pie)):
-        q = gen_pie_assign_np(); q["id"] = f"ma-{nid:03d}"; nid += 1; created.append(q)
-    for _ in range(max(0, args.chance)):
-        q = gen_chance_matrix_np(); q["id"] = f"ma-{nid:03d}"; nid += 1; created.append(q)
+    with span("generate:np", subject="matematik") as sp:
+        for _ in range(max(0, args.table)):
+            q = gen_table_fill_np(); q["id"] = f"ma-{nid:03d}"; nid += 1; created.append(q)
+        for _ in range(max(0, args.pie)):
+            q = gen_pie_assign_np(); q["id"] = f"ma-{nid:03d}"; nid += 1; created.append(q)
+        for _ in range(max(0, args.chance)):
+            q = gen_chance_matrix_np(); q["id"] = f"ma-{nid:03d}"; nid += 1; created.append(q)
+        sp.count = max(0, args.table) + max(0, args.pie) + max(0, args.chance)
 
     # 3) Spara
     items.extend(created)
     data["matematik"]["items"] = items
+    if args.id_scheme == "hash":
+        # dubbletter (även mot redan skrivna NDJSON-rader, via hash-sidofilen) tas bort
+        with span("ids", scheme="hash") as sp:
+            old = content_hashes(str(out)) if append_lines else None
+            dropped = assign_hash_ids(data, new=created, existing=old)
+            kept = {id(x) for x in items}
+            created = [x for x in created if id(x) in kept]
+            sp.count = dropped
+        if dropped:
+            print(f"ℹ️ {dropped} dubbletter borttagna (samma innehållshash).")
+
+    if args.hint_refs:
+        with span("hint-refs") as sp:
+            refs = sp.count = ref_hints(data, items)
+        print(f"ℹ️ {len(data['hints'])} unika tips i hints-tabellen ({refs} poster refererar).")
 
     out.parent.mkdir(parents=True, exist_ok=True)
-    out.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    if is_ndjson(out):
+        # sidofiler skrivs för den publicerade JSON-filen (banks_tool convert + index)
+        if append_lines:
+            append_ndjson(str(out), items=created, next_ids={"item": nid})
+        else:
+            write_ndjson(str(out), data, next_ids={"item": nid})
+        cache.store([out])
+    else:
+        write_json(out, data)
+        write_facets(str(out), data)
+        mix = {a: float(n) for a, n in plan.items() if n > 0}
+        for area, n in (("tabell-diagram", args.table), ("diagram", args.pie), ("sannolikhet", args.chance)):
+            if n > 0:
+                mix[area] = mix.get(area, 0.0) + n
+        write_sampling(str(out), data, mixes={"plan": mix})
+        write_offsets(str(out))
+        cache.store([out, facets_path(str(out)), sampling_path(str(out)), offsets_path(str(out))])
 
     print(f"✅ Klart! La till {len(created)} frågor i {out}")
-    print(f"Nästa lediga id blir: ma-{nid:03d}")
+    if args.id_scheme == "seq":
+        print(f"Nästa lediga id blir: ma-{nid:03d}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -15,25 +15,37 @@ python3 generators/make_svenska_bank.py \
 
 Byt ut helt:
   ... --replace
+
+Exakta kvoter per område (se bank_plan.py), genererade växelvis:
+  ... --plan "stavning=50,grammatik=50,ordförståelse=40,dnd-ordklasser=8,dnd-prepositioner=4,passages=6"
+
+Radformat (append i O(nya poster), se bank_ndjson.py):
+  ... --out build/svenska.ndjson
+
+Backfill (hint/explain/topic/difficulty) körs bara för poster efter bankens
+backfill-markör (bank_io.backfill_start), så append tar tid efter antalet nya
+poster. Hela banken gås igenom om BACKFILL_VERSION ändrats eller banken
+omsorterats så att markören inte stämmer. Poster som redigerats för hand
+före markören upptäcks inte – kör då med --full-backfill.
 """
-import json, random, re, argparse
+import random, re, argparse
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Tuple
+
+from bank_facets import facets_path, write_facets
+from bank_ids import add_id_scheme_arg, assign_hash_ids
+from bank_trace import add_trace_arg, span, start_trace
+from bank_io import backfill_start, mark_backfilled, read_legacy_bank, write_json
+from bank_ndjson import append_ndjson, content_hashes, is_ndjson, last_checkpoint, write_ndjson
+from bank_offsets import offsets_path, write_offsets
+from bank_plan import SV_DND_AREAS, QuotaScheduler, parse_sv_plan, plan_mix
+from bank_sampling import sampling_path, write_sampling
+from build_cache import BuildCache, add_cache_args, cache_args, helper_files, lexicon_hash
 
 # ------------------------- IO helpers -------------------------
 
 def read_existing(path: Path) -> dict:
-    if not path.exists():
-        return {"bankVersion":"1.0","svenska":{"items":[],"passages":[]}}
-    try:
-        data = json.loads(path.read_text(encoding="utf-8"))
-    except Exception:
-        data = {}
-    if "bankVersion" not in data: data["bankVersion"] = "1.0"
-    if "svenska" not in data: data["svenska"] = {"items":[],"passages":[]}
-    if "items" not in data["svenska"]: data["svenska"]["items"] = []
-    if "passages" not in data["svenska"]: data["svenska"]["passages"] = []
-    return data
+    return read_legacy_bank(path, "svenska", passages=True)
 
 def next_item_id(items: List[dict]) -> int:
     mx = 0
@@ -150,15 +162,20 @@ def explain_for(item: dict) -> str:
 
 # ------------------------- Backfill (fixa befintliga poster) -------------------------
 
-def backfill_bank_fields(data: dict, level_profile: dict) -> None:
-    """Säkerställ att ALLA items och passagefrågor har hint/explain/topic/difficulty.
-    Modifierar data in-place.
+# Höj när backfill_bank_fields ändras, så att befintliga poster gås igenom igen
+BACKFILL_VERSION = 1
+
+def backfill_bank_fields(data: dict, level_profile: dict, start: Tuple[int, int] = (0, 0)) -> int:
+    """Säkerställ att items och passagefrågor har hint/explain/topic/difficulty.
+    Modifierar data in-place. start = (första item, första passage) att gå igenom
+    (se bank_io.backfill_start); default alla. Returnerar antal genomgångna poster.
     """
     diff = level_profile.get("difficulty", "np")
 
     # Items (frågor utanför passager)
     items = data.get("svenska", {}).get("items", [])
-    for it in items:
+    for i in range(start[0], len(items)):
+        it = items[i]
         # topic/difficulty default
         it.setdefault("topic", "svenska")
         it.setdefault("difficulty", diff)
@@ -179,8 +196,8 @@ def backfill_bank_fields(data: dict, level_profile: dict) -> None:
 
     # Passager och deras frågor
     passages = data.get("svenska", {}).get("passages", [])
-    for p in passages:
-        qs = p.get("questions", [])
+    for i in range(start[1], len(passages)):
+        qs = passages[i].get("questions", [])
         for q in qs:
             # topic/difficulty
             q.setdefault("topic", "svenska")
@@ -196,6 +213,7 @@ def backfill_bank_fields(data: dict, level_profile: dict) -> None:
                 q["hint"] = HINTS.get("läs", "Läs noga och jämför nyckelord i texten.")
             if not q.get("explain"):
                 q["explain"] = HINTS.get("läs", "Läs noga och jämför nyckelord i texten.")
+    return (len(items) - start[0]) + (len(passages) - start[1])
 
 # ------------------------- MC Generators -------------------------
 
@@ -534,6 +552,20 @@ def gen_passage(level_profile) -> dict:
     }
 # ------------------------- MAIN build -------------------------
 
+# Områdessannolikheter i make_mc_item (används för samplingsindexet)
+MC_MIX = {"stavning": 0.34, "grammatik": 0.34, "ordförståelse": 0.32}
+
+# Områden för --plan (make_svenska_bank har ingen context-generator)
+PLAN_AREAS = ("stavning", "grammatik", "ordförståelse") + SV_DND_AREAS + ("passages",)
+PLAN_GENS = {
+    "stavning": gen_stavning,
+    "grammatik": gen_grammatik,
+    "ordförståelse": gen_ordforstaelse,
+    "dnd-ordklasser": dnd_substantiv_verb_adjektiv,
+    "dnd-prepositioner": dnd_prepositioner,
+    "passages": gen_passage,
+}
+
 def make_mc_item(level_profile) -> dict:
     r = random.random()
     if r < 0.34:
@@ -545,14 +577,27 @@ def make_mc_item(level_profile) -> dict:
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--out", required=True, help="Sökväg till svenska.json")
+    ap.add_argument("--out", required=True, help="Sökväg till svenska.json (eller .ndjson för radformat)")
     ap.add_argument("--items", type=int, default=120, help="Antal MC-frågor")
     ap.add_argument("--dnd", type=int, default=8, help="Antal drag & drop-uppgifter")
     ap.add_argument("--passages", type=int, default=6, help="Antal läsförståelse-passager")
     ap.add_argument("--level", type=str, default="np", choices=["easy","np","hard"], help="Svårighetsnivå")
     ap.add_argument("--seed", type=int, default=None)
     ap.add_argument("--replace", action="store_true", help="Skriv över items/passages helt")
+    ap.add_argument("--plan", type=str, default="", help="Exakta kvoter, t.ex. 'stavning=50,grammatik=50,ordförståelse=40,dnd-ordklasser=8,dnd-prepositioner=4,passages=6'")
+    ap.add_argument("--full-backfill", action="store_true",
+                    help="Backfyll alla poster, inte bara de efter backfill-markören "
+                         "(krävs efter handredigering av befintliga poster)")
+    add_id_scheme_arg(ap)
+    add_cache_args(ap)
+    add_trace_arg(ap)
     args = ap.parse_args()
+    if args.plan:
+        try:
+            quotas = parse_sv_plan(args.plan, args.items, args.dnd, args.passages, areas=PLAN_AREAS)
+        except ValueError as e:
+            ap.error(str(e))
+    start_trace(args)
 
     if args.seed is not None:
         random.seed(args.seed)
@@ -560,47 +605,108 @@ def main():
     level_profile = profile_for_level(args.level)
 
     out = Path(args.out)
-    data = read_existing(out)
-    items = data["svenska"]["items"]
-    passages = data["svenska"]["passages"]
-
-    if args.replace:
-        items = []
-        passages = []
-
-    nid_item = next_item_id(items)
-    nid_pass = next_passage_id(passages)
+    cache = BuildCache(
+        out,
+        script_files=[__file__, *helper_files()],
+        args=cache_args(args), seed=args.seed,
+        lexicon=lexicon_hash(HINTS, STAVNING_PAIRS, GRAM_BANK, ORD_SYNONYM, ORD_MOTSATS,
+                             PASSAGE_TEMPLATES, PASSAGE_HARD_EXTRAS),
+        input_path=None if args.replace else str(out),
+        cache_dir=args.cache_dir, enabled=not args.no_cache,
+    )
+    with span("cache") as sp:
+        state = cache.check()
+        sp.args["state"] = state or "miss"
+    if state:
+        print("♻️ Oförändrad – samma fingeravtryck som befintlig fil." if state == "fresh"
+              else "♻️ Återställd från byggcache.", out)
+        return
+
+    # NDJSON + append: läs bara sista checkpoint och skriv bara nya rader
+    with span("id-scan") as sp:
+        append_lines = is_ndjson(out) and out.exists() and not args.replace
+        if append_lines:
+            nxt = (last_checkpoint(str(out)) or {}).get("next", {})
+            if "item" not in nxt or "passage" not in nxt:
+                old = content_hashes(str(out))
+                nxt = {"item": next_item_id([{"id": i} for i in old["items"]]),
+                       "passage": next_passage_id([{"id": i} for i in old["passages"]])}
+            data = {"bankVersion": "1.0", "svenska": {"items": [], "passages": []}}
+            items, passages = [], []
+            nid_item, nid_pass = nxt["item"], nxt["passage"]
+        else:
+            data = read_existing(out)
+            items = data["svenska"]["items"]
+            passages = data["svenska"]["passages"]
+            if args.replace:
+                items = []
+                passages = []
+            nid_item = next_item_id(items)
+            nid_pass = next_passage_id(passages)
+        sp.args["next"] = {"item": nid_item, "passage": nid_pass}
 
     created_items = []
     created_passages = []
 
-    # 1) MC
-    for _ in range(max(0, args.items)):
-        q = make_mc_item(level_profile)
-        q["id"] = f"sv-{nid_item:03d}"
-        nid_item += 1
+    def finish_mc(q):
         # hint/explain säkerställs
         q.setdefault("hint", explain_for(q))
         q.setdefault("explain", explain_for(q))
         q.setdefault("topic","svenska")
-        created_items.append(q)
-
-    # 2) DnD
-    for _ in range(max(0, args.dnd)):
-        q = gen_dnd(level_profile)
-        q["id"] = f"sv-{nid_item:03d}"
-        nid_item += 1
-        created_items.append(q)
-
-    # 3) Läsförståelse
-    for _ in range(max(0, args.passages)):
-        p = gen_passage(level_profile)
-        p["id"] = f"sv-p-{nid_pass:03d}"
-        # sätt unika id på underfrågor
-        for i, subq in enumerate(p["questions"], start=1):
-            subq["id"] = f"{p['id']}-q{i}"
-        nid_pass += 1
-        created_passages.append(p)
+
+    if args.plan:
+        # Exakta kvoter, områdena växelvis så att alla fylls i samma takt
+        sched = QuotaScheduler(quotas)
+        with span("generate:plan", subject="svenska") as sp:
+            while not sched.finished:
+                area = sched.next()
+                q = PLAN_GENS[area](level_profile)
+                if area == "passages":
+                    q["id"] = f"sv-p-{nid_pass:03d}"
+                    for i, subq in enumerate(q["questions"], start=1):
+                        subq["id"] = f"{q['id']}-q{i}"
+                    nid_pass += 1
+                    created_passages.append(q)
+                else:
+                    q["id"] = f"sv-{nid_item:03d}"
+                    nid_item += 1
+                    if area not in SV_DND_AREAS:
+                        finish_mc(q)
+                    created_items.append(q)
+                sched.record(area)
+            sp.count = len(created_items) + len(created_passages)
+            sp.args["quotas"] = sched.quotas
+    else:
+        # 1) MC
+        with span("generate:mc", subject="svenska") as sp:
+            for _ in range(max(0, args.items)):
+                q = make_mc_item(level_profile)
+                q["id"] = f"sv-{nid_item:03d}"
+                nid_item += 1
+                finish_mc(q)
+                created_items.append(q)
+            sp.count = len(created_items)
+
+        # 2) DnD
+        with span("generate:dnd", subject="svenska") as sp:
+            for _ in range(max(0, args.dnd)):
+                q = gen_dnd(level_profile)
+                q["id"] = f"sv-{nid_item:03d}"
+                nid_item += 1
+                created_items.append(q)
+            sp.count = args.dnd
+
+        # 3) Läsförståelse
+        with span("generate:passages", subject="svenska") as sp:
+            for _ in range(max(0, args.passages)):
+                p = gen_passage(level_profile)
+                p["id"] = f"sv-p-{nid_pass:03d}"
+                # sätt unika id på underfrågor
+                for i, subq in enumerate(p["questions"], start=1):
+                    subq["id"] = f"{p['id']}-q{i}"
+                nid_pass += 1
+                created_passages.append(p)
+            sp.count = len(created_passages)
 
     # 4) Spara/skriv
     items.extend(created_items)
@@ -608,16 +714,51 @@ def main():
     data["svenska"]["items"] = items
     data["svenska"]["passages"] = passages
 
-    # Backfyll alla poster så validatorn blir nöjd och appen har tips/förklaringar
-    backfill_bank_fields(data, level_profile)
+    # Backfyll nya poster (efter markören) så validatorn blir nöjd och appen har tips/förklaringar
+    with span("backfill") as sp:
+        start = backfill_start(data["svenska"], BACKFILL_VERSION, full=args.full_backfill)
+        sp.count = backfill_bank_fields(data, level_profile, start)
+        sp.args["start"] = list(start)
+    if args.id_scheme == "hash":
+        # hash-id efter backfill; dubbletter (även mot redan skrivna NDJSON-rader, via hash-sidofilen) tas bort
+        with span("ids", scheme="hash") as sp:
+            old = content_hashes(str(out)) if append_lines else None
+            dropped = assign_hash_ids(data, new=created_items + created_passages, existing=old)
+            kept = {id(x) for x in items + passages}
+            created_items = [x for x in created_items if id(x) in kept]
+            created_passages = [x for x in created_passages if id(x) in kept]
+            sp.count = dropped
+        if dropped:
+            print(f"ℹ️ {dropped} dubbletter borttagna (samma innehållshash).")
 
     out.parent.mkdir(parents=True, exist_ok=True)
-    out.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    if is_ndjson(out):
+        # sidofiler skrivs för den publicerade JSON-filen (banks_tool convert + index)
+        nxt = {"item": nid_item, "passage": nid_pass}
+        if append_lines:
+            append_ndjson(str(out), items=created_items, passages=created_passages, next_ids=nxt)
+        else:
+            write_ndjson(str(out), data, next_ids=nxt)
+        cache.store([out])
+    else:
+        mark_backfilled(data["svenska"], BACKFILL_VERSION)
+        write_json(out, data)
+        write_facets(str(out), data)
+        if args.plan:
+            mixes = {"plan": plan_mix(quotas)}
+        else:
+            mix = {a: p * args.items for a, p in MC_MIX.items()}
+            mix["grammatik"] += args.dnd
+            mixes = {"generator": mix}
+        write_sampling(str(out), data, mixes=mixes)
+        write_offsets(str(out))
+        cache.store([out, facets_path(str(out)), sampling_path(str(out)), offsets_path(str(out))])
 
     print(f"✅ Klart! La till {len(created_items)} items och {len(created_passages)} passager i {out}")
     print(f"Nivå: {level_profile['difficulty']}")
-    print(f"Nästa lediga item-id blir: sv-{nid_item:03d}")
-    print(f"Nästa lediga passage-id blir: sv-p-{nid_pass:03d}")
+    if args.id_scheme == "seq":
+        print(f"Nästa lediga item-id blir: sv-{nid_item:03d}")
+        print(f"Nästa lediga passage-id blir: sv-p-{nid_pass:03d}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,32 +1,176 @@
 #!/usr/bin/env python3
-import json, sys
-from pathlib import Path
-
-def main(path):
-    data = json.loads(Path(path).read_text(encoding="utf-8"))
-    ok = 0; bad = 0
-    for p in data.get("svenska",{}).get("passages",[]):
-        text = (p.get("title","") + " " + p.get("text","")).lower()
-        for q in p.get("questions", []):
-            opts = q.get("options",[])
-            ci = q.get("correct",0)
-            correct = (opts[ci] if 0 <= ci < len(opts) else "")
-            # Heuristik: för plats/aktivitet/sak bör korrekt ord förekomma i texten
-            lookup = q.get("q","").lower()
-            require_in_text = any(k in lookup for k in ["var utspelar","vad gör","vad blir viktigt"])
-            if require_in_text:
-                if correct.lower() in text:
-                    ok += 1
-                else:
-                    bad += 1
-                    print(f"[WARN] '{p.get('id')}' fråga '{q.get('q')}' saknar korrekt '{correct}' i texten.")
-            else:
-                ok += 1
-    print(f"Klart. OK: {ok}, Varningar: {bad}")
-    return 0
+# -*- coding: utf-8 -*-
+"""
+Kontrollerar att läsförståelsefrågor går att besvara ur passagens text.
+
+Fungerar på alla banker (single-subject och legacy). Utan argument kontrolleras
+varje bank i public/banks/index.json, parallellt.
+
+Varje passage tokeniseras en gång till ett index (tokenmängd + positioner per
+token). Per fråga kontrolleras sedan i O(antal token):
+  • svar i text  – faktafrågor (var/vad/vem/vilken …) ska ha rätt svar i texten
+  • nyckelord    – frågan ska dela minst ett innehållsord med texten
+  • tvetydighet  – flera svarsalternativ som alla står i texten gör faktafrågan tvetydig
+
+Exempel:
+  python3 generators/validate_svenska_bank.py public/banks/svenska.json
+  python3 generators/validate_svenska_bank.py                 # alla banker i index.json
+  python3 generators/validate_svenska_bank.py --jobs 4 --strict
+
+Exit-kod 0, eller 1 med --strict om någon varning hittades.
+"""
+import argparse, os, sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from bank_io import iter_bank_records, read_json
+from bank_text import word_tokens
+from bank_trace import add_trace_arg, span, start_trace
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BANKS_DIR = os.path.join(PROJECT_ROOT, "public", "banks")
+INDEX_PATH = os.path.join(BANKS_DIR, "index.json")
+
+# Faktafrågor – svaret ska stå i texten. Varför/hur-frågor kräver slutsatser.
+LITERAL_STARTS = ("var ", "vad ", "vem ", "vilken ", "vilket ", "vilka ",
+                  "where ", "what ", "who ", "which ")
+STOPWORDS = frozenset("""
+i på av och att det som en ett är var vad vem vilken vilket vilka med till för om
+den de han hon hen man sig sin sina gör gjorde blir blev hur varför när
+texten berättelsen personen utspelar viktigt viktig plats rum ägde hände sa
+the a an is are was were of in on at to and what where who which does did do
+""".split())
+
+def tokenize(s: str) -> Tuple[str, ...]:
+    return word_tokens(str(s or ""))
+
+def stem(tok: str) -> str:
+    # grov ordstam: böjningar som bakade/bakar/baka ska matcha varandra
+    return tok[:5] if len(tok) > 5 else tok
+
+class PassageIndex:
+    """Token, positioner och stammar för en passage – byggs en gång."""
+    def __init__(self, passage: Dict[str, Any]):
+        self.tokens = tokenize(f"{passage.get('title', '')} {passage.get('text', '')}")
+        self.positions: Dict[str, List[int]] = {}
+        for i, t in enumerate(self.tokens):
+            self.positions.setdefault(t, []).append(i)
+        self.stems = {stem(t) for t in self.tokens}
+
+    def has_phrase(self, toks: Tuple[str, ...]) -> bool:
+        if not toks:
+            return False
+        toks_n = len(toks)
+        for i in self.positions.get(toks[0], ()):
+            if self.tokens[i:i + toks_n] == toks:
+                return True
+        return False
+
+    def has_all_stems(self, toks: Tuple[str, ...]) -> bool:
+        content = [t for t in toks if t not in STOPWORDS] or toks
+        return bool(content) and all(stem(t) in self.stems for t in content)
+
+    def present(self, answer: str) -> bool:
+        toks = tokenize(answer)
+        return self.has_phrase(toks) or self.has_all_stems(toks)
+
+def is_literal(question: str) -> bool:
+    return str(question or "").strip().lower().startswith(LITERAL_STARTS)
+
+def check_question(idx: PassageIndex, pid: str, q: Dict[str, Any]) -> List[str]:
+    out = []
+    qtext = str(q.get("q") or "")
+    qid = q.get("id") or qtext
+    opts = q.get("options") or []
+    ci = q.get("correct", 0)
+    correct = str(opts[ci]) if isinstance(ci, int) and 0 <= ci < len(opts) else ""
+
+    keywords = [t for t in tokenize(qtext) if t not in STOPWORDS]
+    if keywords and not any(stem(t) in idx.stems for t in keywords):
+        out.append(f"'{pid}' fråga '{qtext}' delar inga nyckelord med texten.")
+
+    if is_literal(qtext) and correct:
+        if not idx.present(correct):
+            out.append(f"'{pid}' fråga '{qtext}' saknar korrekt '{correct}' i texten.")
+        else:
+            also = [str(o) for i, o in enumerate(opts) if i != ci and idx.has_phrase(tokenize(o))]
+            if also:
+                out.append(f"'{pid}' fråga '{qid}' kan vara tvetydig: även {also} står i texten.")
+    return out
+
+def check_bank(path: str) -> Tuple[str, int, int, List[str]]:
+    """-> (sökväg, antal kontrollerade frågor, antal frågor med varning, varningar)"""
+    data = read_json(path)
+    checked = flagged = 0
+    warnings: List[str] = []
+    cur, idx = None, None
+    for kind, rec, passage in iter_bank_records(data):
+        if kind != "question":
+            continue
+        if passage is not cur:
+            # frågorna kommer i följd per passage – ett index per passage
+            cur, idx = passage, PassageIndex(passage)
+        checked += 1
+        w = check_question(idx, passage.get("id"), rec)
+        flagged += bool(w)
+        warnings.extend(w)
+    return path, checked, flagged, warnings
+
+def resolve_path(rel: str) -> str:
+    if os.path.isabs(rel) and os.path.exists(rel):
+        return rel
+    if rel.startswith("/banks/"):
+        return os.path.join(BANKS_DIR, rel[len("/banks/"):])
+    if rel.startswith("public/banks/"):
+        return os.path.join(PROJECT_ROOT, rel)
+    return os.path.join(BANKS_DIR, rel.lstrip("/"))
+
+def indexed_banks(index_path: str = INDEX_PATH) -> List[str]:
+    idx = read_json(index_path, default={})
+    seen, out = set(), []
+    for e in (idx.get("entries") or []) + (idx.get("banks") or []):
+        p = resolve_path(e.get("path") or e.get("file") or "")
+        if p and p not in seen and os.path.isfile(p):
+            seen.add(p)
+            out.append(p)
+    return out
+
+def main(argv: List[str] = None) -> int:
+    ap = argparse.ArgumentParser(description="Kontrollera läsförståelsefrågor mot passagernas text")
+    ap.add_argument("paths", nargs="*", help="Bankfiler (default: alla banker i public/banks/index.json)")
+    ap.add_argument("--jobs", type=int, default=None, help="Antal parallella processer (default: antal CPU)")
+    ap.add_argument("--strict", action="store_true", help="Exit 1 om någon varning hittas")
+    add_trace_arg(ap)
+    args = ap.parse_args(argv)
+    start_trace(args)
+
+    paths = args.paths or indexed_banks()
+    if not paths:
+        print("ℹ️ Inga banker att kontrollera.")
+        return 0
+    missing = [p for p in paths if not os.path.isfile(p)]
+    if missing:
+        print("❌ Hittar inte fil:", ", ".join(missing))
+        return 1
+
+    with span("check", banks=len(paths), jobs=args.jobs or os.cpu_count()) as sp:
+        if len(paths) == 1 or args.jobs == 1:
+            results = [check_bank(p) for p in paths]
+        else:
+            with ProcessPoolExecutor(max_workers=args.jobs) as ex:
+                results = list(ex.map(check_bank, paths))
+        sp.count = sum(r[1] for r in results)
+
+    total_ok = total_bad = 0
+    for path, checked, flagged, warnings in results:
+        if len(paths) > 1:
+            print(f"🔎 {os.path.basename(path)}: {checked} passagefrågor")
+        for w in warnings:
+            print(f"[WARN] {w}")
+        total_bad += len(warnings)
+        total_ok += checked - flagged
+    print(f"Klart. OK: {total_ok}, Varningar: {total_bad}")
+    return 1 if args.strict and total_bad else 0
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Använd: validate_svenska_passages.py <path till svenska.json>")
-        sys.exit(1)
-    sys.exit(main(sys.argv[1]))
\ No newline at end of file
+    sys.exit(main())
@@ -4,6 +4,18 @@
 Verifierar frågebanker för nya formatet.
 - Läser public/banks/index.json om den finns och validerar varje bank.
 - Fallback: validera public/banks/svenska.json och public/banks/matematik.json.
+- Med filer som argument valideras bara de: verify_banks.py public/banks/matematik.ak3.json
+- --trace FILE skriver spår per fas (se bank_trace.py)
+- --mem-report / --max-memory SIZE mäter minne per fas (se bank_memory.py)
+- --stream läser varje bank post för post från disk (bank_stream.py) i stället för
+  hela filen: minnet hålls konstant oavsett bankstorlek (bara id:n sparas för
+  dubblettkontrollen). Samma utskrift, samma fel/varningar och samma exitkod.
+- --sample RATE (t.ex. 0.05) för snabba kontroller före commit: billiga
+  strukturkontroller på allt, dyra diagram-/svarskontroller på ett stratifierat
+  stickprov plus allt som ändrats sedan senaste --full; rapporten ger
+  konfidensintervall (Wilson) för felandelen. Se DeepChecks.
+- --full kontrollerar allt (som utan flagga) och sparar läget i .cache/verify
+  som --sample jämför mot. --full är kontrollen före publicering.
 
 Kollar bl.a.:
   • Unika id:n (items, passages och passage-frågor)
@@ -15,24 +27,33 @@ Kollar bl.a.:
 
 Exit code 1 om kritiska fel upptäcks, annars 0.
 """
-import json, sys, os, math
+import hashlib, json, sys, os, math
+from bisect import insort
 from collections import Counter, defaultdict
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
+
+from bank_io import HINTS_KEY, LEGACY_SECTIONS, collect_ids, expand_hint_ref, forget, read_json, write_json
+from bank_text import phrase_position, word_tokens
+from bank_memory import parse_size
+from bank_stream import SECTION, iter_bank_stream
+from bank_trace import TRACE, span
 
 # Projektroten = mappen ovanför generators/
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 BANKS_DIR = os.path.join(PROJECT_ROOT, 'public', 'banks')
 INDEX_PATH = os.path.join(BANKS_DIR, 'index.json')
+STATE_DIR = os.path.join(PROJECT_ROOT, '.cache', 'verify')
+STATE_VERSION = 1
 
 OK = 0
 FAIL = 1
+SHOW_ISSUES = 30
+LEGACY_RANK = {k: i for i, k in enumerate(LEGACY_SECTIONS)}
+# Typer med dyra kontroller (diagramkonsistens + härledning av rätt svar), se --sample
+DEEP_TYPES = ('bar-max', 'bar-compare')
 
 # ---------- Hjälp ----------
 
-def load_json(path:str):
-    with open(path, encoding='utf-8') as f:
-        return json.load(f)
-
 def is_str(x):
     return isinstance(x, str) and x.strip() != ''
 
@@ -52,35 +73,6 @@ def resolve_path(rel: str) -> str:
     # Vanlig relativ mot BANKS_DIR
     return os.path.join(BANKS_DIR, rel)
 
-# ---------- Basvalidering ----------
-
-def collect_ids_single(bank:Dict[str,Any]) -> List[str]:
-    """Samla alla id:n för en single-subject-bank { subject, items, passages }."""
-    ids: List[str] = []
-    for it in bank.get('items', []) or []:
-        if isinstance(it, dict) and 'id' in it:
-            ids.append(it['id'])
-    for p in bank.get('passages', []) or []:
-        if isinstance(p, dict):
-            if 'id' in p: ids.append(p['id'])
-            for q in p.get('questions', []) or []:
-                if 'id' in q: ids.append(q['id'])
-    return ids
-
-def collect_ids_legacy(bank:Dict[str,Any]) -> List[str]:
-    """Samla id:n för legacy-formatet { svenska:{items,passages}, matematik:{items} }"""
-    ids: List[str] = []
-    if 'svenska' in bank:
-        sv = bank['svenska']
-        ids += [x['id'] for x in sv.get('items', []) if 'id' in x]
-        for p in sv.get('passages', []) or []:
-            if 'id' in p: ids.append(p['id'])
-            ids += [q['id'] for q in p.get('questions', []) if 'id' in q]
-    if 'matematik' in bank:
-        ma = bank['matematik']
-        ids += [x['id'] for x in ma.get('items', []) if 'id' in x]
-    return ids
-
 # ---------- Typ-specifika kontroller ----------
 
 def check_mc(item:Dict[str,Any], issues:List[str]):
@@ -132,8 +124,14 @@ def check_chart(item:Dict[str,Any], issues:List[str]):
             if not all(is_str(o) and o.strip('-').isdigit() for o in opts):
                 issues.append(f"{item.get('id')}: options ska vara heltal (strängar) för bar-compare")
         # Försök gissa vilka två labels som jämförs via frågetexten
-        qtext = (item.get('q') or '').lower()
-        pair = [i for i,l in enumerate(labels) if l.lower() in qtext]
+        qtoks = word_tokens(item.get('q') or '')
+        # Hela ord, i den ordning de nämns ("Mån" får inte matcha "många")
+        found = []
+        for i,l in enumerate(labels):
+            pos = phrase_position(qtoks, word_tokens(str(l)))
+            if pos >= 0:
+                found.append((pos, i))
+        pair = [i for _, i in sorted(found)]
         if len(pair) >= 2:
             i, j = pair[0], pair[1]
             diff = abs(values[i] - values[j])
@@ -163,12 +161,17 @@ def check_dnd(item:Dict[str,Any], issues:List[str]):
         issues.append(f"{item.get('id')}: dnd saknar buckets (minst 2)")
 
 
-def check_other_types(item:Dict[str,Any], issues:List[str]):
+def check_type(item:Dict[str,Any], issues:List[str], deep:bool=True) -> bool:
+    """Typkontroller. deep=False hoppar över de dyra (DEEP_TYPES). -> True om en dyr kontroll hittade fel."""
     t = item.get('type')
+    failed = False
     if t in (None, '', 'mc'):  # standard MC
         check_mc(item, issues)
-    elif t in ('bar-max','bar-compare'):
-        check_chart(item, issues)
+    elif t in DEEP_TYPES:
+        if deep:
+            n = len(issues)
+            check_chart(item, issues)
+            failed = len(issues) > n
         check_mc(item, issues)  # har fortfarande options/correct
     elif t == 'dnd':
         check_dnd(item, issues)
@@ -185,7 +188,9 @@ def check_other_types(item:Dict[str,Any], issues:List[str]):
             issues.append(f"{item.get('id')}: chance-matrix saknar matrix/question")
     else:
         issues.append(f"{item.get('id')}: okänd type '{t}'")
+    return failed
 
+def check_hints(item:Dict[str,Any], issues:List[str]):
     # Hint/Explain – varna om saknas (ej kritiskt)
     if not is_str(item.get('hint')):
         issues.append(f"⚠️ {item.get('id')}: saknar hint (rekommenderas)")
@@ -193,94 +198,458 @@ def check_other_types(item:Dict[str,Any], issues:List[str]):
         # vissa interaktiva kan sakna explain
         issues.append(f"⚠️ {item.get('id')}: saknar explain (rekommenderas)")
 
+# ---------- Stickprov (--sample) ----------
+
+class DeepMode:
+    """rate=None: alla dyra kontroller. record=True (--full): spara läget för --sample."""
+    def __init__(self, rate:Optional[float]=None, record:bool=False, state_dir:str=None):
+        self.rate = rate
+        self.record = record
+        self.state_dir = state_dir or STATE_DIR
+
+def wilson(k:int, n:int, z:float=1.96) -> Tuple[float,float]:
+    """Wilson-intervall för andelen k/n (95 % med z=1.96)."""
+    if n <= 0:
+        return 0.0, 1.0
+    p = k / n
+    d = 1 + z*z/n
+    c = (p + z*z/(2*n)) / d
+    h = z * math.sqrt(p*(1-p)/n + z*z/(4*n*n)) / d
+    return max(0.0, c - h), min(1.0, c + h)
+
+def _unit(x:Any) -> float:
+    """Stabilt tal i [0,1) ur en sträng (samma stickprov vid varje körning)."""
+    return int(hashlib.sha1(str(x).encode('utf-8')).hexdigest()[:8], 16) / 2**32
+
+def record_hash(item:Dict[str,Any]) -> str:
+    """Innehållet som de dyra kontrollerna läser (utan tipsfälten)."""
+    body = {k: v for k, v in item.items() if k not in ('hint', 'explain', 'hintRef')}
+    return hashlib.sha1(json.dumps(body, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+def file_sha1(path:str) -> str:
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+class DeepChecks:
+    """
+    Väljer vilka poster som får de dyra kontrollerna (DEEP_TYPES: diagrammets
+    konsistens och härledning av rätt svar) och för statistik över stickprovet.
+
+    Utan läge (standard) eller med --full kontrolleras allt. Med --sample RATE:
+      • billiga strukturkontroller körs på alla poster som vanligt
+      • dyra kontroller på ett stratifierat stickprov: varje stratum
+        (typ/område, passagefrågor för sig) får andelen RATE, minst en post;
+        urvalet avgörs av id:ts hash och är detsamma vid varje körning
+      • poster som är nya/ändrade sedan senaste --full (eller som hade fel då)
+        kontrolleras alltid, men räknas inte in i stickprovets felandel
+    --full sparar <STATE_DIR>/<bank>.json med hash per felfri DEEP_TYPES-post.
+    """
+    def __init__(self, path:str, mode:Optional[DeepMode]):
+        self.path = path
+        self.mode = mode or DeepMode()
+        self.sampling = self.mode.rate is not None
+        self.strata: Dict[Tuple[str,str], List[int]] = {}  # -> [antal, i stickprov, fel i stickprov]
+        self.changed = 0
+        self.changed_failed = 0
+        self.hashes: Dict[str, str] = {}
+        self.known: Dict[str, str] = {}
+        self.same_file = False
+        self.has_state = False
+        if self.sampling:
+            st = read_json(self.state_path(), default={})
+            if isinstance(st, dict) and st.get('version') == STATE_VERSION:
+                self.has_state = True
+                self.known = st.get('items') or {}
+                self.same_file = st.get('sha1') == file_sha1(path)
+
+    def state_path(self) -> str:
+        key = hashlib.sha1(os.path.abspath(self.path).encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.mode.state_dir, f"{os.path.basename(self.path)}.{key}.json")
+
+    def _changed(self, item:Dict[str,Any]) -> bool:
+        known = self.known.get(str(item.get('id')))
+        if known is None:
+            return True
+        return not self.same_file and known != record_hash(item)
+
+    def check_type(self, item:Dict[str,Any], issues:List[str], in_passage:bool=False):
+        t = item.get('type')
+        if t not in DEEP_TYPES:
+            check_type(item, issues)
+            return
+        stratum = ('passage' if in_passage else t, str(item.get('area') or ''))
+        st = self.strata.setdefault(stratum, [0, 0, 0])
+        st[0] += 1
+        picked = changed = False
+        if self.sampling:
+            picked = st[0] == 1 or _unit(item.get('id')) < self.mode.rate
+            changed = not picked and self._changed(item)
+        n = len(issues)
+        failed = check_type(item, issues, deep=not self.sampling or picked or changed)
+        if picked:
+            st[1] += 1
+            st[2] += int(failed)
+        if changed:
+            self.changed += 1
+            self.changed_failed += int(failed)
+        if self.mode.record and 'id' in item and not any(not m.startswith('⚠️') for m in issues[n:]):
+            self.hashes[str(item['id'])] = record_hash(item)
+
+    def finish(self):
+        if self.mode.record:
+            write_json(self.state_path(), {"version": STATE_VERSION, "path": os.path.abspath(self.path),
+                                           "sha1": file_sha1(self.path), "items": self.hashes})
+            print(f"ℹ️ Verifieringsläge sparat för --sample: {len(self.hashes)} felfria diagramfrågor.")
+        if self.sampling:
+            self.report()
+
+    def report(self):
+        total = sum(st[0] for st in self.strata.values())
+        n = sum(st[1] for st in self.strata.values())
+        k = sum(st[2] for st in self.strata.values())
+        if not total:
+            print("ℹ️ Stickprov: inga frågor med dyra kontroller i banken.")
+            return
+        lo, hi = wilson(k, n)
+        print(f"ℹ️ Stickprov {self.mode.rate:.0%}: dyra kontroller på {n}/{total} diagramfrågor i {len(self.strata)} strata, "
+              f"{k} fel → felandel {k/max(n,1):.2%} (95 % Wilson {lo:.2%}–{hi:.2%}, ≈ {lo*total:.0f}–{hi*total:.0f} av {total})")
+        for (t, area), (pop, m, f) in sorted(self.strata.items()):
+            slo, shi = wilson(f, m)
+            print(f"   • {t}/{area or '–'}: {m}/{pop}, {f} fel (95 %: {slo:.1%}–{shi:.1%})")
+        if not self.has_state:
+            print("   ℹ️ Inget läge från en --full-körning – alla diagramfrågor utanför stickprovet räknas som ändrade.")
+        if self.changed:
+            print(f"   • + {self.changed} nya/ändrade sedan senaste --full, alla kontrollerade ({self.changed_failed} med fel)")
+        print("   ⚠️ Stickprov är ingen publiceringskontroll – kör --full före publicering.")
+
 # ---------- Validera en bank ----------
 
-def validate_bank(path:str, meta:Dict[str,Any]=None) -> Tuple[int,int]:
+class IssueLog:
+    """
+    Räknar kritiska fel och varningar men sparar bara de SHOW_ISSUES första
+    (i postordning, seq) av varje sort – det är de som skrivs ut.
+    """
+    def __init__(self):
+        self.crit: List[Tuple[tuple, str]] = []
+        self.warn: List[Tuple[tuple, str]] = []
+        self.n_crit = 0
+        self.n_warn = 0
+
+    def add(self, seq: tuple, msg: str):
+        # kritiska är de utan "⚠️"
+        if msg.startswith('⚠️'):
+            self.n_warn += 1
+            shown = self.warn
+        else:
+            self.n_crit += 1
+            shown = self.crit
+        if len(shown) < SHOW_ISSUES or seq < shown[-1][0]:
+            insort(shown, (seq, msg))
+            del shown[SHOW_ISSUES:]
+
+    def report(self) -> Tuple[int, int]:
+        """Skriv ut och returnera (kritisk 0/1, antal varningar)."""
+        if not self.n_crit and not self.n_warn:
+            print("✅ Inga typfel hittade i frågor.")
+            return 0, 0
+        for _, m in self.crit:
+            print("  •", m)
+        if self.n_crit > SHOW_ISSUES:
+            print(f"  • (+{self.n_crit-SHOW_ISSUES} fler kritiska)")
+        for _, m in self.warn:
+            print("  •", m)
+        if self.n_warn > SHOW_ISSUES:
+            print(f"  • (+{self.n_warn-SHOW_ISSUES} fler varningar)")
+        return int(self.n_crit > 0), self.n_warn
+
+class IdLog:
+    """Id → första förekomst (ordningsnyckel); dubbletter i samma ordning som Counter(collect_ids)."""
+    def __init__(self):
+        self.first: Dict[Any, tuple] = {}
+        self.dups: Dict[Any, tuple] = {}
+        self.n = 0
+
+    def add(self, rec: Any, key: tuple):
+        if not isinstance(rec, dict) or 'id' not in rec:
+            return
+        self.n += 1
+        _id = rec['id']
+        first = self.first.setdefault(_id, key)
+        if first is not key:
+            self.dups.setdefault(_id, first)
+
+    def duplicates(self) -> List[Any]:
+        return sorted(self.dups, key=self.dups.get)
+
+
+def validate_bank(path:str, meta:Dict[str,Any]=None, mode:"DeepMode"=None) -> Tuple[int,int]:
     """Returnerar (critical_errors, warnings)."""
-    data = load_json(path)
-    critical = 0
-    warnings = 0
-
-    # Hitta format
-    is_single = 'items' in data or 'subject' in data
-
-    # Samla id:n och kolla dubbletter
-    if is_single:
-        ids = collect_ids_single(data)
-        subject = data.get('subject') or (meta or {}).get('subject') or 'okänt'
-        name = (meta or {}).get('label') or os.path.basename(path)
-        print(f"🔎 {name} — ämne: {subject} — items={len(data.get('items',[]) or [])}, passages={len(data.get('passages',[]) or [])}")
-    else:
-        ids = collect_ids_legacy(data)
-        print(f"🔎 Legacy-bank: {os.path.basename(path)} — totalt id:n={len(ids)}")
+    with span("verify", file=os.path.basename(path)) as sp:
+        deep = DeepChecks(path, mode)
+        data = read_json(path)
+        critical = 0
+        warnings = 0
+
+        # Hitta format
+        is_single = 'items' in data or 'subject' in data
+
+        # Samla id:n och kolla dubbletter
+        if is_single:
+            ids = collect_ids(data)
+            subject = data.get('subject') or (meta or {}).get('subject') or 'okänt'
+            name = (meta or {}).get('label') or os.path.basename(path)
+            print(f"🔎 {name} — ämne: {subject} — items={len(data.get('items',[]) or [])}, passages={len(data.get('passages',[]) or [])}")
+        else:
+            ids = collect_ids(data)
+            print(f"🔎 Legacy-bank: {os.path.basename(path)} — totalt id:n={len(ids)}")
+
+        sp.count = len(ids)
+        dup = [k for k,v in Counter(ids).items() if v>1]
+        if dup:
+            print("❌ Dubblett-id:", dup[:10], "…")
+            critical += 1
+        else:
+            print("✅ Inga dubblett-id.")
+
+        hints = data.get(HINTS_KEY) or {}
+
+        # Gå igenom frågor och kör typkontroller (passagefrågor på plats –
+        # ingen kontroll läser passagens titel/text)
+        def iter_items(d):
+            if 'items' in d:
+                for it in d['items'] or []:
+                    yield it, False
+            if 'passages' in d:
+                for p in d['passages'] or []:
+                    for q in p.get('questions', []) or []:
+                        yield q, True
+
+        def run_on_bank(d):
+            nonlocal critical, warnings
+            issues: List[str] = []
+            count = 0
+            for it, in_passage in iter_items(d):
+                count += 1
+                it, ok = expand_hint_ref(it, hints)
+                if not ok:
+                    issues.append(f"{it.get('id')}: hintRef '{it.get('hintRef')}' saknas i hints-tabellen")
+                deep.check_type(it, issues, in_passage)
+                check_hints(it, issues)
+            # skriv ut issues och summera nivå
+            log = IssueLog()
+            for i, m in enumerate(issues):
+                log.add((i,), m)
+            c, w = log.report()
+            critical += c
+            warnings += w
+
+        if is_single:
+            run_on_bank(data)
+        else:
+            # legacy: kör på svenska + matematik om de finns
+            if 'svenska' in data:
+                print("  – Validerar svenska…")
+                run_on_bank(data['svenska'])
+            if 'matematik' in data:
+                print("  – Validerar matematik…")
+                run_on_bank(data['matematik'])
+
+        deep.finish()
+        # engångsläsning – håll inte banken kvar i bank_io-cachen
+        forget(path)
+        return critical, warnings
 
-    dup = [k for k,v in Counter(ids).items() if v>1]
-    if dup:
-        print("❌ Dubblett-id:", dup[:10], "…")
-        critical += 1
-    else:
-        print("✅ Inga dubblett-id.")
-
-    # Gå igenom frågor och kör typkontroller
-    def iter_items(d):
-        if 'items' in d:
-            for it in d['items'] or []:
-                yield it
-        if 'passages' in d:
-            for p in d['passages'] or []:
-                for q in p.get('questions', []) or []:
-                    qq = dict(q)
-                    qq.setdefault('title', p.get('title'))
-                    qq.setdefault('text', p.get('text'))
-                    yield qq
-
-    def run_on_bank(d):
-        nonlocal critical, warnings
-        issues: List[str] = []
-        count = 0
-        for it in iter_items(d):
-            count += 1
-            check_other_types(it, issues)
-        # skriv ut issues och summera nivå
-        if issues:
-            # kritiska är de utan "⚠️"
-            crit_local = [m for m in issues if not m.startswith('⚠️')]
-            warn_local = [m for m in issues if m.startswith('⚠️')]
-            for m in crit_local[:30]:
-                print("  •", m)
-            if len(crit_local) > 30:
-                print(f"  • (+{len(crit_local)-30} fler kritiska)")
-            for m in warn_local[:30]:
-                print("  •", m)
-            if len(warn_local) > 30:
-                print(f"  • (+{len(warn_local)-30} fler varningar)")
-            critical += int(len(crit_local) > 0)
-            warnings += len(warn_local)
+# ---------- Huvud ----------
+
+def validate_bank_stream(path:str, meta:Dict[str,Any]=None, mode:"DeepMode"=None) -> Tuple[int,int]:
+    """
+    Som validate_bank men post för post från disk (bank_stream). Poster
+    kontrolleras på plats utan kopia och släpps direkt; kvar i minnet finns
+    id:n, antal och de utskrivna meddelandena. Står "hints"-tabellen efter
+    posterna i filen sparas hintRef-posternas tipsfält och kontrolleras på slutet.
+    """
+    with span("verify", file=os.path.basename(path), mode="stream") as sp:
+        deep = DeepChecks(path, mode)
+        critical = 0
+        warnings = 0
+        top: Dict[str, Any] = {}
+        counts: Dict[Optional[str], List[int]] = defaultdict(lambda: [0, 0])
+        ids = {None: IdLog(), 'legacy': IdLog()}
+        logs: Dict[Optional[str], IssueLog] = defaultdict(IssueLog)
+        deferred: List[Tuple[Optional[str], tuple, Dict[str, Any]]] = []
+        hints: Optional[Dict[str, str]] = None
+
+        def check(sec, seq, it):
+            log = logs[sec]
+            issues: List[str] = []
+            in_passage = seq[0] == 1
+            ref = it.get('hintRef')
+            if ref is not None:
+                if hints is None:
+                    # tabellen kommer senare i filen – spara bara det check_hints behöver
+                    deep.check_type(it, issues, in_passage)
+                    for n, m in enumerate(issues):
+                        log.add(seq + (1, n), m)
+                    deferred.append((sec, seq, {k: it[k] for k in ('id', 'type', 'hint', 'explain', 'hintRef') if k in it}))
+                    return
+                text = hints.get(ref)
+                if text is None:
+                    log.add(seq + (0, 0), f"{it.get('id')}: hintRef '{ref}' saknas i hints-tabellen")
+                else:
+                    it.setdefault('hint', text)
+                    it.setdefault('explain', text)
+            deep.check_type(it, issues, in_passage)
+            n0 = len(issues)
+            check_hints(it, issues)
+            for n, m in enumerate(issues):
+                log.add(seq + ((1, n) if n < n0 else (2, n)), m)
+
+        for sec, kind, val in iter_bank_stream(path):
+            rank = LEGACY_RANK.get(sec, 0)
+            idlog = ids['legacy' if sec else None]
+            if kind == 'meta':
+                key, value = val
+                if sec is None:
+                    top[key] = value
+                    if key == HINTS_KEY:
+                        hints = value or {}
+                continue
+            if sec is None:
+                top.setdefault(kind + 's', [])
+            n = counts[sec][kind == 'passage']
+            counts[sec][kind == 'passage'] += 1
+            if kind == 'item':
+                idlog.add(val, (rank, 0, n))
+                check(sec, (0, n), val)
+                continue
+            idlog.add(val, (rank, 1, n, 0))
+            for k, q in enumerate(val.get('questions', []) or [], start=1):
+                idlog.add(q, (rank, 1, n, k))
+                check(sec, (1, n, k), q)
+
+        table = hints or {}
+        for sec, seq, it in deferred:
+            log = logs[sec]
+            text = table.get(it['hintRef'])
+            if text is None:
+                log.add(seq + (0, 0), f"{it.get('id')}: hintRef '{it['hintRef']}' saknas i hints-tabellen")
+            else:
+                it.setdefault('hint', text)
+                it.setdefault('explain', text)
+            issues: List[str] = []
+            check_hints(it, issues)
+            for n, m in enumerate(issues):
+                log.add(seq + (2, n), m)
+
+        # Samma formatval som validate_bank (toppnycklarna avgör)
+        is_single = 'items' in top or 'subject' in top
+        legacy = ('items' not in top and 'passages' not in top
+                  and any(top.get(k) is SECTION for k in LEGACY_SECTIONS))
+        idlog = ids['legacy' if legacy else None]
+        if is_single:
+            subject = top.get('subject') or (meta or {}).get('subject') or 'okänt'
+            name = (meta or {}).get('label') or os.path.basename(path)
+            n_items, n_pass = counts[None]
+            if not isinstance(top.get('items'), list):
+                n_items = len(top.get('items', []) or [])
+            if not isinstance(top.get('passages'), list):
+                n_pass = len(top.get('passages', []) or [])
+            print(f"🔎 {name} — ämne: {subject} — items={n_items}, passages={n_pass}")
         else:
-            print("✅ Inga typfel hittade i frågor.")
+            print(f"🔎 Legacy-bank: {os.path.basename(path)} — totalt id:n={idlog.n}")
 
-    if is_single:
-        run_on_bank(data)
-    else:
-        # legacy: kör på svenska + matematik om de finns
-        if 'svenska' in data:
-            print("  – Validerar svenska…")
-            run_on_bank(data['svenska'])
-        if 'matematik' in data:
-            print("  – Validerar matematik…")
-            run_on_bank(data['matematik'])
+        sp.count = idlog.n
+        dup = idlog.duplicates()
+        if dup:
+            print("❌ Dubblett-id:", dup[:10], "…")
+            critical += 1
+        else:
+            print("✅ Inga dubblett-id.")
 
-    return critical, warnings
+        def report(sec):
+            nonlocal critical, warnings
+            c, w = logs[sec].report()
+            critical += c
+            warnings += w
 
-# ---------- Huvud ----------
+        if is_single:
+            report(None)
+        else:
+            # legacy: kör på svenska + matematik om de finns
+            if 'svenska' in top:
+                print("  – Validerar svenska…")
+                report('svenska')
+            if 'matematik' in top:
+                print("  – Validerar matematik…")
+                report('matematik')
+
+        deep.finish()
+        return critical, warnings
 
 def main():
     total_crit = 0
     total_warn = 0
 
+    argv = sys.argv[1:]
+    if '--trace' in argv:
+        i = argv.index('--trace')
+        if i + 1 < len(argv):
+            TRACE.start(argv[i + 1])
+        del argv[i:i + 2]
+    budget = None
+    if '--max-memory' in argv:
+        i = argv.index('--max-memory')
+        try:
+            budget = parse_size(argv[i + 1] if i + 1 < len(argv) else "")
+        except ValueError as e:
+            print(f"❌ --max-memory: {e}")
+            sys.exit(FAIL)
+        del argv[i:i + 2]
+    mem_report = '--mem-report' in argv
+    if mem_report:
+        argv.remove('--mem-report')
+    if budget or mem_report:
+        TRACE.start_memory(budget, mem_report)
+    validate = validate_bank
+    if '--stream' in argv:
+        argv.remove('--stream')
+        validate = validate_bank_stream
+    rate = None
+    if '--sample' in argv:
+        i = argv.index('--sample')
+        try:
+            rate = float(argv[i + 1] if i + 1 < len(argv) else "")
+        except ValueError:
+            rate = -1.0
+        if not 0 < rate <= 1:
+            print("❌ --sample: ange en andel i (0, 1], t.ex. --sample 0.05")
+            sys.exit(FAIL)
+        del argv[i:i + 2]
+    full = '--full' in argv
+    if full:
+        argv.remove('--full')
+    mode = DeepMode(rate=None if full else rate, record=full)
+
+    # Explicita bankfiler som argument (t.ex. från banks_tool build)
+    paths = [a for a in argv if not a.startswith('-')]
+    if paths:
+        for p in paths:
+            if not os.path.exists(p):
+                print(f"❌ Hittar inte bankfil: {p}")
+                total_crit += 1
+                continue
+            c,w = validate(p, mode=mode)
+            total_crit += c; total_warn += w
+        rc = FAIL if total_crit>0 else OK
+        print(f"🏁 Klar. Kritiska fel: {total_crit}, varningar: {total_warn}. Exit={rc}")
+        sys.exit(rc)
+
     index_path = INDEX_PATH
     if os.path.exists(index_path):
-        idx = load_json(index_path)
+        idx = read_json(index_path)
         entries = idx.get('entries') or idx.get('banks') or []
         if not isinstance(entries, list) or not entries:
             print(f"⚠️ index.json saknar entries/banks – kör fallback.")
@@ -298,7 +667,7 @@ def main():
                     print(f"❌ Hittar inte bankfil: {rel} (tolkad: {p or '—'})")
                     total_crit += 1
                     continue
-                c,w = validate_bank(p, meta=e)
+                c,w = validate(p, meta=e, mode=mode)
                 total_crit += c; total_warn += w
             print()
             rc = FAIL if total_crit>0 else OK
@@ -310,12 +679,12 @@ def main():
     ma = os.path.join(BANKS_DIR,'matematik.json')
     if os.path.exists(sv):
         print("📖 Validerar legacy svenska.json …\n")
-        c,w = validate_bank(sv)
+        c,w = validate(sv, mode=mode)
         total_crit += c; total_warn += w
         print()
     if os.path.exists(ma):
         print("🧮 Validerar legacy matematik.json …\n")
-        c,w = validate_bank(ma)
+        c,w = validate(ma, mode=mode)
         total_crit += c; total_warn += w
         print()
 
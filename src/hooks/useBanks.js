@@ -50,7 +50,7 @@ export default function useBanks(){
           },
           'ma-ak3': {
             meta: { id: 'ma-ak3', subject: 'matematik', grade: 3, path: '/banks/matematik.json', label: 'Matematik åk 3' },
-            data: { subject: 'matematik', grade: 3, items: ma?.matematik?.items || [], passages: [] }
+            data: { subject: 'matematik', grade: 3, items: ma?.matematik?.items || [], passages: [], hints: ma?.hints }
           }
         }
       }
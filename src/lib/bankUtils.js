@@ -6,6 +6,7 @@
  *  - Nya single-subject banker: {subject, grade, items, passages?}
  *  - (Fallback) gamla formatet: {svenska:{items,passages?}} eller {matematik:{items}}
  *    -> då behöver du ange subjectHint ('svenska' | 'matematik').
+ * Delade tips (hintRef + bankens "hints"-tabell) slås upp till hint/explain.
  */
 export function normalizeBank(raw, subjectHint) {
   if (!raw) return null;
@@ -15,7 +16,7 @@ export function normalizeBank(raw, subjectHint) {
     return {
       subject: raw.subject,
       grade: raw.grade ?? null,
-      items: raw.items || [],
+      items: resolveHintRefs(raw.items || [], raw.hints),
       passages: raw.passages || []
     };
   }
@@ -27,11 +28,25 @@ export function normalizeBank(raw, subjectHint) {
     return {
       subject: subjectHint || 'svenska',
       grade: null,
-      items: part.items || [],
+      items: resolveHintRefs(part.items || [], raw.hints),
       passages: part.passages || []
     };
   }
 
   // Okänt format
   return null;
+}
+
+/**
+ * Ersätter hintRef med hint/explain ur tabellen (make_matematik_bank --hint-refs).
+ * Frågor utan hintRef returneras oförändrade.
+ */
+export function resolveHintRefs(items, hints) {
+  if (!hints) return items;
+  return items.map(it => {
+    const text = it && it.hintRef != null ? hints[it.hintRef] : undefined;
+    if (text === undefined) return it;
+    const { hintRef, ...rest } = it;
+    return { hint: text, explain: text, ...rest };
+  });
 }
\ No newline at end of file